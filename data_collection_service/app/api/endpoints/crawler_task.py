@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from data_collection_service.app.api.models.APIResponseModel import ResponseModel, ErrorResponseModel
 from data_collection_service.app.api.models.TaskModel import TaskCreateRequest
-from data_collection_service.app.db.session import get_db
+from data_collection_service.app.db.async_session import get_async_db
 from data_collection_service.app.services.task_service import TaskService
 
 router = APIRouter()
@@ -13,7 +13,7 @@ router = APIRouter()
 async def create_crawler_task(
         request: Request,
         payload: TaskCreateRequest,  # Pydantic 模型自动做参数校验
-        db: Session = Depends(get_db)  # 自动获取并管理 MySQL 连接
+        db: AsyncSession = Depends(get_async_db)  # 自动获取并管理 MySQL 异步连接
 ):
     """
     **用途**: 供前台或外部品牌方调用，将长耗时爬虫任务异步化。
@@ -1,16 +1,19 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.mysql import insert
 from datetime import datetime
 from asynch.connection import Connection
 
 from data_collection_service.app.api.models.APIResponseModel import ResponseModel, ErrorResponseModel
 from data_collection_service.crawlers.utils.extract_uid import extract_target_id_from_url
-from data_collection_service.app.db.session import get_db
+from data_collection_service.app.db.async_session import get_async_db
 from data_collection_service.app.db.models import CrawlerTarget
+from data_collection_service.app.db.due_index import target_due_index
+from data_collection_service.app.db.target_repository import fetch_target_schedule
 from data_collection_service.app.services.data_proxy_service import DataProxyService
 from data_collection_service.app.db.clickhouse import get_ch_client
 from data_collection_service.app.services.query_service import QueryService
+from data_collection_service.app.services.scheduler_service import scheduler_daemon
 
 
 router = APIRouter()
@@ -24,7 +27,7 @@ async def register_crawler_target(
         target_id: str,  # 例如: '123456'(UID) 或 'BV1xx'(BV号)
         platform_type: int = 3,
         interval_minutes: int = 1440,  # 24小时
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     """
     供业务方调用：将任何维度的抓取目标注册到时序总表中。
@@ -48,15 +51,28 @@ async def register_crawler_target(
             cron_interval_minutes=interval_minutes
         )
 
-        db.execute(stmt)
-        db.commit()
+        await db.execute(stmt)
+        await db.commit()
+        # 同步到期索引：调度器亚秒级即可取到这个目标
+        await target_due_index.add(await fetch_target_schedule(platform_type, uid, resource_type, [target_id]))
 
         return ResponseModel(code=200, data={"target_id": target_id, "status": "registered & scheduled"})
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
+@router.get("/inner/scheduler/capacity", response_model=ResponseModel)
+async def get_scheduler_capacity(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    内部接口：按当前 (含自适应调整后的) 调度节奏预估每日任务量与上游请求量，用于评估爬虫容量
+    """
+    return ResponseModel(
+        code=200,
+        router=request.url.path,
+        data=await scheduler_daemon.project_daily_volume(db)
+    )
+
 @router.get("/inner/tools/parse_profile_url")
 async def parse_profile_url(request: Request,platform: str, url: str):
     """
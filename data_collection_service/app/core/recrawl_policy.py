@@ -0,0 +1,94 @@
+import os
+import time
+from typing import Optional
+
+# 调度间隔量化阶梯 (分钟)：计算出的间隔向下取整到最近的一档，同一档的目标可以按档合并处理
+INTERVAL_LADDER = (60, 120, 240, 360, 720, 1440, 2880, 4320, 10080)
+
+# 参与自适应调度的资源维度 -> 观测的变化指标 (对应 VideoActivity 中的字段)
+# 其余维度 (用户画像/关系/投稿列表/视频下载) 仍按 cron_interval_minutes 固定周期调度
+ADAPTIVE_METRICS = {
+    "scrape_and_store_video_info": "views",
+    "scrape_and_store_video_comments": "replies",
+}
+
+
+class VideoActivity:
+    """视频的发布时间与最近两次详情快照 (快照时间秒级时间戳 + 播放数 + 评论数)"""
+    __slots__ = ("pubdate_ts", "last_at", "prev_at", "views", "replies")
+
+    def __init__(self, pubdate_ts: int, snaps: list[tuple[float, int, int]]):
+        """:param snaps: [(snapshot_ts, views_count, replys_count), ...]，按时间从新到旧"""
+        self.pubdate_ts = pubdate_ts
+        self.last_at = snaps[0][0] if snaps else None
+        self.prev_at = snaps[1][0] if len(snaps) > 1 else None
+        self.views = tuple(s[1] for s in snaps[:2])
+        self.replies = tuple(s[2] for s in snaps[:2])
+
+    def relative_rate(self, metric: str) -> Optional[float]:
+        """指标在最近两次快照之间的相对变化速率 (每分钟)，快照不足两次时返回 None"""
+        values = getattr(self, metric)
+        if len(values) < 2 or not self.prev_at or self.last_at <= self.prev_at:
+            return None
+        minutes = (self.last_at - self.prev_at) / 60
+        return abs(values[0] - values[1]) / max(values[1], 1) / minutes
+
+
+def quantize_interval(minutes: float) -> int:
+    """向下取整到量化阶梯 (宁可多采一次，也不拉长计算出的间隔)"""
+    chosen = INTERVAL_LADDER[0]
+    for step in INTERVAL_LADDER:
+        if step > minutes:
+            break
+        chosen = step
+    return chosen
+
+
+class RecrawlPolicy:
+    """
+    自适应重采集策略：根据视频年龄与快照间的指标变化计算下次采集间隔
+    1. 年龄衰减：间隔 = 基础间隔 * 2^(发布时长 / RECRAWL_AGE_DOUBLING_HOURS)，老视频自然降频 (不超过上限)
+    2. 变化速率：有两次快照时，取使两次采集间相对变化约为 RECRAWL_TARGET_CHANGE 的间隔，
+       并限制在年龄衰减结果的 [1/RECRAWL_MAX_ADJUST, RECRAWL_MAX_ADJUST] 倍之内 (突然爆火的老视频会被拉回高频)
+    3. 结果量化到 INTERVAL_LADDER，并夹在 [RECRAWL_MIN_INTERVAL, RECRAWL_MAX_INTERVAL] 之间
+    """
+
+    def __init__(self):
+        self.min_interval = int(os.getenv("RECRAWL_MIN_INTERVAL", 60))
+        self.max_interval = int(os.getenv("RECRAWL_MAX_INTERVAL", 10080))
+        self.age_doubling_hours = float(os.getenv("RECRAWL_AGE_DOUBLING_HOURS", 168))
+        self.target_change = float(os.getenv("RECRAWL_TARGET_CHANGE", 0.05))
+        self.max_adjust = float(os.getenv("RECRAWL_MAX_ADJUST", 4))
+
+    @staticmethod
+    def is_adaptive(resource_type: str) -> bool:
+        return resource_type in ADAPTIVE_METRICS
+
+    def next_interval(self, resource_type: str, base_interval: int, activity: Optional[VideoActivity],
+                      now_ts: Optional[float] = None) -> int:
+        """
+        计算目标的下次采集间隔 (分钟)
+        非自适应维度或没有任何快照时，原样返回 base_interval
+        """
+        metric = ADAPTIVE_METRICS.get(resource_type)
+        if metric is None or activity is None:
+            return base_interval
+
+        now_ts = now_ts or time.time()
+        interval = float(base_interval)
+        if activity.pubdate_ts:
+            age_hours = max(0.0, (now_ts - activity.pubdate_ts) / 3600)
+            # 先按上限截断，变化速率的调整幅度才有意义 (否则极老视频的年龄间隔放大 4 倍也仍是天文数字)
+            interval = min(interval * 2 ** min(age_hours / self.age_doubling_hours, 32), self.max_interval)
+
+        rate = activity.relative_rate(metric)
+        if rate is not None:
+            change_interval = self.target_change / rate if rate > 0 else float("inf")
+            interval = min(max(change_interval, interval / self.max_adjust), interval * self.max_adjust)
+
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        return max(self.min_interval, quantize_interval(interval))
+
+
+# 导出一个单例供全局使用
+recrawl_policy = RecrawlPolicy()
@@ -0,0 +1,73 @@
+import os
+
+# 采集资源维度 (resource_type) 的执行画像
+# 单个消费进程内，同一资源维度允许同时执行的目标数
+# 轻量接口 (画像/关系) 可以高并发；评论全量采集、视频下载属于重 I/O 任务，必须严格限流
+RESOURCE_CONCURRENCY = {
+    "scrape_and_store_user_relation": 20,
+    "scrape_and_store_user_info": 20,
+    "scrape_and_store_video_info": 10,
+    "scrape_and_store_user_videos": 4,
+    "scrape_and_store_video_comments": 2,
+    "scrape_and_store_video_to_minio": 1,
+}
+DEFAULT_RESOURCE_CONCURRENCY = 4
+
+
+def get_resource_concurrency(resource_type: str) -> int:
+    """
+    获取资源维度的并发上限，支持环境变量覆盖
+    例: CONCURRENCY_SCRAPE_AND_STORE_VIDEO_COMMENTS=4
+    """
+    env_value = os.getenv(f"CONCURRENCY_{resource_type.upper()}")
+    if env_value:
+        return max(1, int(env_value))
+    return RESOURCE_CONCURRENCY.get(resource_type, DEFAULT_RESOURCE_CONCURRENCY)
+
+
+# 单个目标执行一次时对上游平台发起的预估请求数 (用于调度容量估算)
+# 评论、投稿列表已是增量采集，这里取成熟目标的稳态均值
+RESOURCE_REQUEST_COST = {
+    "scrape_and_store_user_relation": 1,
+    "scrape_and_store_user_info": 1,
+    "scrape_and_store_video_info": 1,
+    "scrape_and_store_user_videos": 2,
+    "scrape_and_store_video_comments": 5,
+    "scrape_and_store_video_to_minio": 3,
+}
+DEFAULT_RESOURCE_REQUEST_COST = 1
+
+
+def get_resource_request_cost(resource_type: str) -> float:
+    """
+    获取资源维度单次执行的预估请求数，支持环境变量覆盖
+    例: REQUEST_COST_SCRAPE_AND_STORE_VIDEO_COMMENTS=12
+    """
+    env_value = os.getenv(f"REQUEST_COST_{resource_type.upper()}")
+    if env_value:
+        return max(0.0, float(env_value))
+    return RESOURCE_REQUEST_COST.get(resource_type, DEFAULT_RESOURCE_REQUEST_COST)
+
+
+# 调度下发时单条 CrawlerTask / Kafka 消息携带的目标数 (按执行成本加权)
+# 轻量接口一条消息打包几十个目标；评论、下载等重任务小批次下发，分散到多个分区由不同消费者并行执行
+RESOURCE_DISPATCH_BATCH_SIZE = {
+    "scrape_and_store_user_relation": 50,
+    "scrape_and_store_user_info": 50,
+    "scrape_and_store_video_info": 20,
+    "scrape_and_store_user_videos": 5,
+    "scrape_and_store_video_comments": 2,
+    "scrape_and_store_video_to_minio": 1,
+}
+DEFAULT_RESOURCE_DISPATCH_BATCH_SIZE = 10
+
+
+def get_resource_dispatch_batch_size(resource_type: str) -> int:
+    """
+    获取资源维度单条下发消息的目标数上限，支持环境变量覆盖
+    例: DISPATCH_BATCH_SCRAPE_AND_STORE_VIDEO_COMMENTS=4
+    """
+    env_value = os.getenv(f"DISPATCH_BATCH_{resource_type.upper()}")
+    if env_value:
+        return max(1, int(env_value))
+    return RESOURCE_DISPATCH_BATCH_SIZE.get(resource_type, DEFAULT_RESOURCE_DISPATCH_BATCH_SIZE)
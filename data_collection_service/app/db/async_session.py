@@ -0,0 +1,49 @@
+import os
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from dotenv import load_dotenv
+from data_collection_service.crawlers.utils.logger import logger
+
+load_dotenv()
+
+
+def _to_async_url(url: str) -> str:
+    """把同步驱动的连接串 (mysql+pymysql:// 或 mysql://) 换成 aiomysql 驱动"""
+    for prefix in ("mysql+pymysql://", "mysql+mysqldb://", "mysql://"):
+        if url.startswith(prefix):
+            return "mysql+aiomysql://" + url[len(prefix):]
+    return url
+
+
+# 优先读取独立的异步连接串，未配置时由同步连接串 MYSQL_URL_PYTHON 推导 (复用同一套账号与库)
+MYSQL_ASYNC_URL = os.getenv("MYSQL_ASYNC_URL_PYTHON") or _to_async_url(os.getenv("MYSQL_URL_PYTHON") or "")
+
+try:
+    # 事件循环内的 MySQL 访问走异步驱动：等待数据库回包期间让出事件循环，不再阻塞 Kafka 心跳与在途的 HTTP 抓取
+    # pool_pre_ping / pool_recycle: 防止 MySQL 隔夜断开 (wait_timeout) 导致 2006/2013 错误
+    async_engine = create_async_engine(
+        MYSQL_ASYNC_URL,
+        pool_pre_ping=True,
+        pool_recycle=int(os.getenv("MYSQL_POOL_RECYCLE", 3600)),
+        pool_size=int(os.getenv("MYSQL_ASYNC_POOL_SIZE", 10)),
+        max_overflow=int(os.getenv("MYSQL_ASYNC_MAX_OVERFLOW", 20))
+    )
+    # expire_on_commit=False: 提交后仍可直接读取已加载的属性 (异步会话不支持隐式懒加载刷新)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    logger.info("[DB] MySQL 异步引擎及连接池初始化完成")
+except Exception as e:
+    logger.error(f"[DB] MySQL 异步连接引擎初始化失败: {str(e)}")
+    raise e
+
+
+async def get_async_db():
+    """
+    FastAPI 依赖注入：获取异步数据库会话
+    请求结束 (或发生异常) 时自动关闭会话，连接归还连接池
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    """关闭连接池中的全部连接 (交由 main.py 在停机阶段调用)"""
+    await async_engine.dispose()
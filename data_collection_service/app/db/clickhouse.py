@@ -39,6 +39,18 @@ class ClickHouseManager:
             await cls.pool.shutdown()
             logger.info("🛑 ClickHouse 数据库连接已安全关闭。")
 
+    @staticmethod
+    async def insert_columnar(conn: Connection, query: str, columns: list) -> int:
+        """
+        列式写入：columns 为按 INSERT 列顺序排列的列数组，驱动直接按列编码，返回写入行数
+        asynch 的 cursor 不暴露 columnar 参数，这里统一调用底层协议连接 (与 cursor.execute 的调用路径相同)
+        依赖 asynch 0.3.1 (requirements.txt 中固定版本) 的私有属性 Connection._connection，升级驱动时需同步核对此处
+        """
+        protocol_conn = getattr(conn, "_connection", None)
+        if protocol_conn is None:
+            raise RuntimeError("当前 asynch 版本的 Connection 没有 _connection 属性，列式写入需要 asynch==0.3.1")
+        return await protocol_conn.execute(query, args=columns, columnar=True)
+
 #  核心：这就是提供给 FastAPI 路由的依赖注入函数
 async def get_ch_client() -> AsyncGenerator[Connection, None]:
     if not ClickHouseManager.pool:
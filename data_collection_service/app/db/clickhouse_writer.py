@@ -0,0 +1,165 @@
+import os
+import time
+import asyncio
+from typing import Optional
+
+from asynch.errors import NetworkError, SocketTimeoutError, ServerException
+
+from data_collection_service.app.db.clickhouse import ClickHouseManager
+from data_collection_service.crawlers.utils.logger import logger
+
+
+# ClickHouse 服务端的查询超时 (TIMEOUT_EXCEEDED)，与网络类错误一样属于暂时性故障
+_TRANSIENT_SERVER_CODES = {159}
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """连接/超时类错误可退避重试；类型不匹配、表结构不一致等确定性错误重试也不会成功"""
+    if isinstance(exc, (NetworkError, SocketTimeoutError, OSError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, ServerException) and exc.code in _TRANSIENT_SERVER_CODES
+
+
+class _TableBuffer:
+    """单个 (表, 列集合) 的待写缓冲区"""
+    __slots__ = ("rows", "futures", "spans", "first_at")
+
+    def __init__(self):
+        self.rows: list = []
+        # 每次 write 调用对应一个 future 及其在 rows 中的区间，整批落盘后统一回执
+        self.futures: list[asyncio.Future] = []
+        self.spans: list[tuple[int, int]] = []
+        self.first_at = time.monotonic()
+
+
+class ClickHouseBatchWriter:
+    """
+    进程级 ClickHouse 合批写入器 (Write-Behind)
+    职责:
+    1. 将各任务零散的小批量 INSERT 按 (表, 列) 合并，达到行数阈值或等待时间阈值时一次性写入，减少 MergeTree 小 part
+    2. write() 可 await：调用方拿到的是整批真正落盘后的结果，任务状态机的持久化语义不变
+    3. 只有连接/超时类错误按退避重试；确定性错误 (类型或表结构不匹配) 不重试，
+       而是把合并进来的各次写入拆开单独重写，只有包含问题数据的调用方收到 False
+    4. 停机时由 main.py 的 lifespan 调用 close() 将剩余缓冲全部刷出
+    """
+
+    def __init__(self):
+        self.max_rows = int(os.getenv("CH_BATCH_MAX_ROWS", 5000))
+        self.max_delay = float(os.getenv("CH_BATCH_MAX_DELAY", 1.0))
+        self.max_retries = int(os.getenv("CH_BATCH_RETRIES", 3))
+        self.retry_backoff = float(os.getenv("CH_BATCH_RETRY_BACKOFF", 0.5))
+
+        self._buffers: dict[tuple, _TableBuffer] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._flusher is not None
+
+    async def start(self):
+        """启动定时刷盘协程"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+            logger.info(f"🧺 [CH Writer] 合批写入器已启动 (行数阈值: {self.max_rows}, 时间阈值: {self.max_delay}s)")
+
+    async def close(self):
+        """停止定时协程并刷出全部缓冲 (需在 ClickHouse 连接池关闭之前调用)"""
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        for key in list(self._buffers):
+            self._schedule_flush(key)
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        logger.info("🛑 [CH Writer] 合批写入器已刷出全部缓冲并关闭")
+
+    async def write(self, table_name: str, data_list: list[dict]) -> bool:
+        """
+        追加一批行到对应表的缓冲区，等待所在批次写入完成
+        :return: 所在批次最终是否写入成功
+        """
+        key = (table_name, tuple(data_list[0].keys()))
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = _TableBuffer()
+        future = asyncio.get_running_loop().create_future()
+        start = len(buffer.rows)
+        buffer.rows.extend(data_list)
+        buffer.futures.append(future)
+        buffer.spans.append((start, len(buffer.rows)))
+        if len(buffer.rows) >= self.max_rows:
+            self._schedule_flush(key)
+        # shield：调用方被取消时不影响整批写入，也不会让其他调用方的回执失效
+        return await asyncio.shield(future)
+
+    def _schedule_flush(self, key: tuple):
+        buffer = self._buffers.pop(key, None)
+        if buffer is None:
+            return
+        task = asyncio.create_task(self._flush(key, buffer))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.max_delay / 4)
+                now = time.monotonic()
+                for key in [k for k, b in self._buffers.items() if now - b.first_at >= self.max_delay]:
+                    self._schedule_flush(key)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ [CH Writer] 定时刷盘异常: {e}")
+
+    async def _flush(self, key: tuple, buffer: _TableBuffer):
+        table_name, columns = key
+        query = f"INSERT INTO {table_name}({', '.join(columns)}) VALUES"
+        try:
+            is_ok = await self._insert_with_retry(table_name, query, buffer.rows)
+            if is_ok:
+                logger.info(f"[ClickHouse] 合批写入 {len(buffer.rows)} 条数据到 {table_name} (合并 {len(buffer.futures)} 次写入)")
+            results = [is_ok] * len(buffer.futures)
+        except Exception as e:
+            logger.error(f"[ClickHouse] 合批写入 {table_name} 失败 (确定性错误): {str(e)}")
+            if len(buffer.futures) == 1:
+                results = [False]
+            else:
+                # 拆回各次写入单独重写，问题数据只影响提交它的调用方
+                logger.warning(f"[ClickHouse] 将 {len(buffer.futures)} 次合并写入拆开逐个重写 {table_name}，隔离问题数据")
+                results = [await self._insert_isolated(table_name, query, buffer.rows[start:end])
+                           for start, end in buffer.spans]
+        for future, is_ok in zip(buffer.futures, results):
+            if not future.done():
+                future.set_result(is_ok)
+
+    async def _insert_with_retry(self, table_name: str, query: str, rows: list) -> bool:
+        """
+        写入一批行：暂时性错误按退避重试，重试耗尽返回 False；确定性错误直接抛出，由调用方拆分隔离
+        """
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with ClickHouseManager.pool.connection() as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute(query, rows)
+                return True
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                logger.error(f"[ClickHouse] 写入 {table_name} 连接/超时失败 (第 {attempt}/{self.max_retries} 次): {str(e)}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+        return False
+
+    async def _insert_isolated(self, table_name: str, query: str, rows: list) -> bool:
+        try:
+            return await self._insert_with_retry(table_name, query, rows)
+        except Exception as e:
+            logger.error(f"[ClickHouse] 单次写入 {len(rows)} 条数据到 {table_name} 失败: {str(e)}")
+            return False
+
+
+# 导出单例，交由 main.py 管理其生命周期
+clickhouse_batch_writer = ClickHouseBatchWriter()
@@ -0,0 +1,86 @@
+import os
+from typing import Iterable, Optional
+
+from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class CommentWatermark:
+    """单个视频上一次成功采集时的评论水位：最新主评论的 ctime / rpid"""
+    __slots__ = ("bvid", "max_ctime", "max_rpid")
+
+    def __init__(self, bvid: str, max_ctime: int, max_rpid: int):
+        self.bvid = bvid
+        self.max_ctime = max_ctime
+        self.max_rpid = max_rpid
+
+
+class CommentWatermarkStore:
+    """
+    B站视频评论增量水位存储 (Redis)
+    职责:
+    1. comment_wm:bilibili:{bvid} (Hash) 记录已入库的最新主评论 max_ctime / max_rpid，
+       按时间倒序 (sort=0) 翻页时越过水位即可停止翻页
+    2. comment_rcount:bilibili:{bvid} (Hash) 记录每条主评论上次补全楼中楼时的 rcount，
+       只有 rcount 变化的主评论才重新拉取楼中楼；rcount 为 0 的主评论不落 key
+    3. 两个 key 带 TTL (默认 7 天)，过期后自动退化为一次全量采集，顺带刷新旧评论的点赞数
+    Redis 不可用时一律视为无水位，走全量采集，保证不漏数据
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("COMMENT_INCREMENTAL", "True").lower() in ("true", "1", "t")
+        self.ttl = int(os.getenv("COMMENT_WATERMARK_TTL", 7 * 86400))
+
+    @staticmethod
+    def _keys(bvid: str) -> tuple[str, str]:
+        return f"comment_wm:bilibili:{bvid}", f"comment_rcount:bilibili:{bvid}"
+
+    async def load(self, bvid: str) -> Optional[CommentWatermark]:
+        """读取视频的评论水位，无水位 (首次采集/已过期/未启用) 时返回 None"""
+        redis_pool = redis_client_mgr.pool
+        if not self.enabled or redis_pool is None:
+            return None
+        wm_key, _ = self._keys(bvid)
+        try:
+            max_ctime, max_rpid = await redis_pool.hmget(wm_key, "max_ctime", "max_rpid")
+        except Exception as e:
+            logger.warning(f"⚠️ [CommentWatermark] 读取 {bvid} 水位失败，退化为全量采集: {e}")
+            return None
+        if not max_ctime:
+            return None
+        return CommentWatermark(bvid, int(max_ctime), int(max_rpid or 0))
+
+    async def get_rcounts(self, bvid: str, rpids: list[str]) -> dict[str, int]:
+        """批量读取主评论上次同步时的 rcount，未记录的主评论视为 0"""
+        redis_pool = redis_client_mgr.pool
+        if not rpids or redis_pool is None:
+            return {}
+        _, rcount_key = self._keys(bvid)
+        values = await redis_pool.hmget(rcount_key, rpids)
+        return {rpid: int(value) for rpid, value in zip(rpids, values) if value is not None}
+
+    async def save(self, bvid: str, max_ctime: int, max_rpid: int, rcounts: dict[str, int]):
+        """
+        推进水位并记录本轮已同步楼中楼的主评论 rcount
+        调用方需保证本轮采集的数据已全部落盘，否则下一轮会跳过未入库的评论
+        """
+        redis_pool = redis_client_mgr.pool
+        if not self.enabled or redis_pool is None:
+            return
+        wm_key, rcount_key = self._keys(bvid)
+        try:
+            async with redis_pool.pipeline(transaction=False) as pipe:
+                if max_ctime:
+                    pipe.hset(wm_key, mapping={"max_ctime": max_ctime, "max_rpid": max_rpid})
+                    pipe.expire(wm_key, self.ttl)
+                if rcounts:
+                    pipe.hset(rcount_key, mapping=rcounts)
+                # rcount 表与水位同生共死：水位过期后的全量采集会重建它
+                pipe.expire(rcount_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ [CommentWatermark] 保存 {bvid} 水位失败，下一轮将多采集部分分页: {e}")
+
+
+# 导出一个单例供全局使用
+comment_watermark_store = CommentWatermarkStore()
@@ -41,10 +41,40 @@ return browser_id
 """
 
 
+# 2. 归还租约：按用量计算的冷却时间乘以与调度脚本相同的倍数 (老化惩罚 * 2^fail_count)，
+#    被风控过的节点归还后同样要多冷却；节点已被下线 (不在 ZSET 中) 时不写回
+_LUA_RELEASE_COOKIE_SCRIPT = """
+local platform = KEYS[1]
+local browser_id = ARGV[1]
+local current_time = tonumber(ARGV[2])
+local usage_cooldown = tonumber(ARGV[3])
+
+local zset_key = "cookie_pool:" .. platform
+if not redis.call('ZSCORE', zset_key, browser_id) then
+    return 0
+end
+
+local hash_key = "cookie_info:" .. platform .. ":" .. browser_id
+local last_update = tonumber(redis.call('HGET', hash_key, 'last_update') or current_time)
+local fail_count = tonumber(redis.call('HGET', hash_key, 'fail_count') or 0)
+
+local age_days = (current_time - last_update) / 86400
+local time_penalty = 0
+if age_days > 3 then
+    time_penalty = (age_days - 3) * 0.5
+end
+
+local multiplier = (1 + time_penalty) * math.pow(2, fail_count)
+redis.call('ZADD', zset_key, current_time + usage_cooldown * multiplier, browser_id)
+return 1
+"""
+
+
 class CookieScheduler:
     def __init__(self):
         # 预留给 register_script 返回的 Script 对象
         self._script = None
+        self._release_script = None
 
     async def get_optimal_browser_id(self, redis_pool, platform: str, base_cooldown: int) -> Optional[str]:
         """
@@ -71,6 +101,41 @@ class CookieScheduler:
             print(f"⚠️ [CookieScheduler] 调度 Lua 脚本执行异常: {e}")
             return None
 
+    async def lease_browser_id(self, redis_pool, platform: str, base_cooldown: int, lease_ttl: int) -> Optional[str]:
+        """
+        租用一个 Browser ID：调度出最优节点后，将其在 ZSET 中的可用时间推迟到租期结束，租期内不会被其他会话调度到
+        """
+        browser_id = await self.get_optimal_browser_id(redis_pool, platform, base_cooldown)
+        if not browser_id:
+            return None
+        try:
+            # XX：只更新已存在的成员，避免节点被下线后又被租约写回池中
+            await redis_pool.zadd(f"cookie_pool:{platform}", {browser_id: int(time.time()) + lease_ttl}, xx=True)
+        except Exception as e:
+            print(f"⚠️ [CookieScheduler] 延长租期失败: {e}")
+        return browser_id
+
+    async def release_browser_id(self, redis_pool, platform: str, browser_id: str, used_requests: int,
+                                 base_cooldown: int, cooldown_per_request: float):
+        """
+        归还租用的 Browser ID：按本次租期实际消耗的请求数计算冷却时间，用得越多冷却越久；
+        与调度时一样按 fail_count 指数放大，租期内触发过风控的节点会被推迟更久
+        """
+        if not browser_id or browser_id == "local_config":
+            return
+
+        if self._release_script is None:
+            self._release_script = redis_pool.register_script(_LUA_RELEASE_COOKIE_SCRIPT)
+        cooldown = max(base_cooldown, used_requests * cooldown_per_request)
+        try:
+            await self._release_script(
+                keys=[platform],
+                args=[browser_id, int(time.time()), cooldown],
+                client=redis_pool
+            )
+        except Exception as e:
+            print(f"⚠️ [CookieScheduler] 归还租约失败: {e}")
+
     async def report_failure(self, redis_pool, platform: str, browser_id: str):
         """
         公共的风控上报方法，供所有爬虫调用
@@ -0,0 +1,127 @@
+import os
+import time
+import socket
+from datetime import datetime
+from typing import AsyncIterable, Iterable, Optional
+
+from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.crawlers.utils.logger import logger
+
+# 原子弹出到期成员：ZRANGEBYSCORE + ZREM 在同一个脚本中执行，多个调度协程不会取到同一个目标
+_LUA_POP_DUE_SCRIPT = """
+local key = KEYS[1]
+local now = ARGV[1]
+local limit = tonumber(ARGV[2])
+
+local ids = redis.call('ZRANGEBYSCORE', key, '-inf', now, 'LIMIT', 0, limit)
+if #ids > 0 then
+    redis.call('ZREM', key, unpack(ids))
+end
+return ids
+"""
+
+
+class TargetDueIndex:
+    """
+    采集目标到期索引 (Redis ZSET: scheduler:due_targets, member = crawler_target.id, score = next_run_time 时间戳)
+    职责:
+    1. MySQL 仍是唯一事实来源，ZSET 只是到期时间的索引；调度器弹出后在 MySQL 中认领 (校验 is_active / next_run_time)
+    2. 所有写 CrawlerTarget 的路径 (注册接口、级联注册、调度回写) 提交后同步写入索引
+    3. 启动时从 MySQL 全量重建：先写临时 key，再以 ZUNIONSTORE ... AGGREGATE MIN 合并进正在使用的索引，
+       重建期间其他路径写入的到期时间不会被覆盖丢失；多余成员 (已停用/已删除的目标) 弹出后回表校验即被丢弃
+    4. Redis 调用失败后在 SCHEDULER_INDEX_FAILURE_COOLDOWN 秒内视为不可用 (调度器退化为扫描 MySQL)，
+       并标记索引过期，恢复后由调度器立即重建
+    """
+
+    def __init__(self):
+        self.key = os.getenv("SCHEDULER_DUE_INDEX_KEY", "scheduler:due_targets")
+        self.rebuild_chunk = int(os.getenv("SCHEDULER_INDEX_REBUILD_CHUNK", 5000))
+        # 预留给 register_script 返回的 Script 对象
+        self._pop_script = None
+        # 重建锁的持有者标识 (便于排查是哪个副本执行了重建)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.failure_cooldown = float(os.getenv("SCHEDULER_INDEX_FAILURE_COOLDOWN", 30))
+        self._unavailable_until = float("-inf")
+        # 索引写入失败或降级期间，MySQL 中的到期时间变更没有同步到索引，恢复后需要重建
+        self.stale = False
+
+    @property
+    def available(self) -> bool:
+        return redis_client_mgr.pool is not None and time.monotonic() >= self._unavailable_until
+
+    def mark_failed(self, e: Exception):
+        """Redis 调用失败：冷却期内视为不可用，并标记索引过期"""
+        self._unavailable_until = time.monotonic() + self.failure_cooldown
+        self.stale = True
+        logger.warning(f"⚠️ [DueIndex] Redis 调用失败，{self.failure_cooldown:.0f}s 内退化为扫描 MySQL: {e}")
+
+    async def add(self, schedules: Iterable[tuple[int, datetime]]):
+        """写入/更新目标的到期时间：[(target_pk, next_run_time), ...]"""
+        mapping = {str(pk): next_run_time.timestamp() for pk, next_run_time in schedules if next_run_time}
+        if not mapping or not self.available:
+            return
+        try:
+            await redis_client_mgr.pool.zadd(self.key, mapping)
+        except Exception as e:
+            # 索引写失败不影响 MySQL 事实数据，恢复后的重建会补回
+            logger.warning(f"⚠️ [DueIndex] 写入 {len(mapping)} 个目标的到期时间失败: {e}")
+            self.mark_failed(e)
+
+    async def pop_due(self, now_ts: float, limit: int) -> list[int]:
+        """弹出 score <= now_ts 的目标 (最早到期的优先)，最多 limit 个"""
+        redis_pool = redis_client_mgr.pool
+        if self._pop_script is None:
+            self._pop_script = redis_pool.register_script(_LUA_POP_DUE_SCRIPT)
+        ids = await self._pop_script(keys=[self.key], args=[now_ts, limit], client=redis_pool)
+        return [int(pk) for pk in ids or []]
+
+    async def next_due_at(self) -> Optional[float]:
+        """最早到期目标的时间戳，索引为空时返回 None"""
+        head = await redis_client_mgr.pool.zrange(self.key, 0, 0, withscores=True)
+        return head[0][1] if head else None
+
+    async def try_acquire_rebuild_lock(self, ttl: int) -> bool:
+        """
+        抢占重建锁 (SET NX EX)，锁在 ttl 秒后自然过期且不主动释放：多个副本每个周期只有一个执行重建
+        """
+        try:
+            return bool(await redis_client_mgr.pool.set(f"{self.key}:rebuild_lock", self._owner, nx=True, ex=max(1, ttl)))
+        except Exception as e:
+            logger.warning(f"⚠️ [DueIndex] 抢占重建锁失败，本周期跳过重建: {e}")
+            return False
+
+    async def rebuild(self, schedules: AsyncIterable[tuple[int, datetime]]) -> int:
+        """
+        用 MySQL 中全部激活目标重建索引，合并进正在使用的 key
+        同一目标取两边较早的到期时间：提前弹出只会在回表认领时被校验掉，而覆盖成较晚的时间会漏调度
+        :param schedules: 异步可迭代的 (target_pk, next_run_time)，由数据库分段查询流式产出
+        :return: 写入的目标数
+        """
+        redis_pool = redis_client_mgr.pool
+        # 临时 key 带上副本标识：索引恢复后多个副本可能同时重建
+        tmp_key = f"{self.key}:rebuilding:{self._owner}"
+        await redis_pool.delete(tmp_key)
+
+        total = 0
+        chunk = {}
+        async for pk, next_run_time in schedules:
+            chunk[str(pk)] = (next_run_time or datetime.now()).timestamp()
+            if len(chunk) >= self.rebuild_chunk:
+                await redis_pool.zadd(tmp_key, chunk)
+                total += len(chunk)
+                chunk = {}
+        if chunk:
+            await redis_pool.zadd(tmp_key, chunk)
+            total += len(chunk)
+
+        if total:
+            async with redis_pool.pipeline(transaction=True) as pipe:
+                pipe.zunionstore(self.key, [self.key, tmp_key], aggregate="MIN")
+                pipe.delete(tmp_key)
+                await pipe.execute()
+        self.stale = False
+        return total
+
+
+# 导出一个单例供全局使用
+target_due_index = TargetDueIndex()
@@ -0,0 +1,62 @@
+import os
+from typing import Iterable
+
+from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class KnownTargetSet:
+    """
+    已注册采集目标集合 (Redis Set: target_known:{platform_type}:{uid}, member = "{resource_type}:{target_id}")
+    职责:
+    1. 级联注册前过滤掉已经在 crawler_target 中的目标，老视频不再每轮重复 UPSERT
+    2. 只在注册事务提交成功后写入，集合中的目标一定已落库；集合丢失/过期只会退化为重复 UPSERT (幂等)
+    3. key 带 TTL (默认 7 天)，过期后下一轮会对全部目标重新 UPSERT 一次，顺带恢复被人工停用的目标
+    Redis 不可用时不做过滤
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("TARGET_KNOWN_SET", "True").lower() in ("true", "1", "t")
+        self.ttl = int(os.getenv("TARGET_KNOWN_SET_TTL", 7 * 86400))
+
+    @staticmethod
+    def _key(platform_type: int, uid: str) -> str:
+        return f"target_known:{platform_type}:{uid}"
+
+    @staticmethod
+    def _member(resource_type: str, target_id: str) -> str:
+        return f"{resource_type}:{target_id}"
+
+    async def filter_unknown(self, platform_type: int, uid: str, targets: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """
+        过滤出尚未注册过的目标 (保持原有顺序)
+        :param targets: [(resource_type, target_id), ...]
+        """
+        redis_pool = redis_client_mgr.pool
+        if not targets or not self.enabled or redis_pool is None:
+            return targets
+        try:
+            flags = await redis_pool.smismember(self._key(platform_type, uid), [self._member(*t) for t in targets])
+        except Exception as e:
+            logger.warning(f"⚠️ [KnownTargets] 读取 UID:{uid} 已注册目标失败，本轮不做过滤: {e}")
+            return targets
+        return [t for t, known in zip(targets, flags) if not known]
+
+    async def remember(self, platform_type: int, uid: str, targets: Iterable[tuple[str, str]]):
+        """注册事务提交后调用，记录已落库的目标"""
+        redis_pool = redis_client_mgr.pool
+        members = [self._member(*t) for t in targets]
+        if not members or not self.enabled or redis_pool is None:
+            return
+        key = self._key(platform_type, uid)
+        try:
+            async with redis_pool.pipeline(transaction=False) as pipe:
+                pipe.sadd(key, *members)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ [KnownTargets] 记录 UID:{uid} 已注册目标失败，下一轮会重复 UPSERT: {e}")
+
+
+# 导出一个单例供全局使用
+known_target_set = KnownTargetSet()
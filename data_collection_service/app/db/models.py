@@ -1,6 +1,6 @@
 from sqlalchemy import Column, Integer, String, Text, SmallInteger, DateTime, BIGINT, Boolean, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.schema import UniqueConstraint
+from sqlalchemy.schema import UniqueConstraint, Index
 from datetime import datetime
 
 Base = declarative_base()
@@ -26,6 +26,8 @@ class CrawlerTarget(Base):
     # 声明四元组复合唯一约束
     __table_args__ = (
         UniqueConstraint('platform_type', 'uid', 'resource_type', 'target_id', name='uk_target'),
+        # 调度器按 is_active + next_run_time 取到期目标 / 重建到期索引
+        Index('idx_active_next_run', 'is_active', 'next_run_time'),
     )
 
 # 2. 采集任务快照表
@@ -47,7 +49,34 @@ class CrawlerTask(Base):
     task_status = Column(SmallInteger, default=0, index=True, comment="状态: 0=待执行, 1=执行中, 2=成功, 3=失败")
     params = Column(JSON, nullable=True, comment="调度参数与限制: {'max_pages': 5, 'retry': 3}")
     error_msg = Column(Text, nullable=True, comment="失败异常堆栈")
+    # 执行租约：认领者在执行期间定期续约，状态为 1 的批次只有租约过期后才允许被其他消费者接管
+    lease_owner = Column(String(100), nullable=True, comment="当前执行者 (主机名:进程号)")
+    lease_expire_time = Column(DateTime, nullable=True, comment="执行租约到期时间")
     create_time = Column(DateTime, default=datetime.now, comment="批次创建时间")
     update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="状态更新时间")
 
 
+
+
+# 3. 任务消息发件箱 (Transactional Outbox)
+class TaskOutbox(Base):
+    """
+    与 CrawlerTask 在同一个本地事务中写入的待投递 Kafka 消息
+    由 OutboxRelay 异步批量投递并标记为已发送，保证 "任务落库" 与 "消息下发" 最终一致
+    """
+    __tablename__ = "task_outbox"
+    id = Column(BIGINT, primary_key=True, autoincrement=True, comment="物理主键 (同时决定投递顺序)")
+    topic = Column(String(100), nullable=False, comment="目标 Topic")
+    message_key = Column(String(100), nullable=True, comment="消息 Key (决定分区)")
+    payload = Column(JSON, nullable=False, comment="消息体")
+    status = Column(SmallInteger, default=0, comment="状态: 0=待投递, 1=已投递, 2=投递中, 3=投递失败 (死信)")
+    attempts = Column(Integer, default=0, comment="投递失败次数")
+    # 投递中: 租约到期后可被重新认领；待投递: 失败退避结束前不会被认领
+    lease_expire_time = Column(DateTime, nullable=True, comment="租约到期 / 下次重试时间")
+    last_error = Column(String(500), nullable=True, comment="最近一次投递失败原因")
+    create_time = Column(DateTime, default=datetime.now, comment="写入时间")
+    sent_time = Column(DateTime, nullable=True, comment="投递成功时间")
+    __table_args__ = (
+        # 中继按 status + id 顺序拉取待投递消息
+        Index('idx_status_id', 'status', 'id'),
+    )
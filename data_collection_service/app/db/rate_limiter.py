@@ -0,0 +1,102 @@
+import os
+import asyncio
+from typing import Optional
+
+from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.crawlers.utils.rate_limiter import LocalRateLimiter
+from data_collection_service.crawlers.utils.logger import logger
+
+# 1. 分布式令牌桶 Lua 脚本 (与 _LUA_FETCH_COOKIE_SCRIPT 一样保证原子性，多副本共享同一个桶)
+# 使用 Redis 服务端时间，避免多台机器时钟不一致导致补充速率失真
+_LUA_TOKEN_BUCKET_SCRIPT = """
+local bucket_key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local bucket = redis.call('HMGET', bucket_key, 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now_ms
+
+-- 按流逝时间补充令牌，最多积攒到桶容量
+local elapsed = math.max(0, now_ms - ts)
+tokens = math.min(capacity, tokens + elapsed * rate / 1000)
+
+local wait_ms = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    -- 令牌不足：不扣减，返回还需等待的毫秒数
+    wait_ms = math.ceil((requested - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', bucket_key, 'tokens', tokens, 'ts', now_ms)
+-- 桶回满后即可过期，避免废弃的 browser_id 残留 key
+redis.call('PEXPIRE', bucket_key, math.ceil(capacity * 1000 / rate) + 1000)
+return wait_ms
+"""
+
+# 2. 各接口族的请求预算 (每秒令牌数, 桶容量)，未列出的接口族使用 default
+_DEFAULT_QPS = float(os.getenv("CRAWLER_COOKIE_QPS", 1.0))
+_DEFAULT_BURST = float(os.getenv("CRAWLER_COOKIE_BURST", 2))
+ENDPOINT_FAMILY_BUDGETS = {
+    "reply": (_DEFAULT_QPS * 2, _DEFAULT_BURST * 2),  # 评论/楼中楼：分页量最大，风控相对宽松
+    "space": (_DEFAULT_QPS / 2, _DEFAULT_BURST),      # 用户空间 (wbi 签名接口)：风控最严格
+    "default": (_DEFAULT_QPS, _DEFAULT_BURST),
+}
+
+
+class RedisRateLimiter:
+    """
+    基于 Redis 的分布式令牌桶限流器
+    以 (平台, 接口族, browser_id) 为粒度限流，无论扩容多少个消费者副本，打到目标平台的总 QPS 保持不变
+    Redis 不可用时自动降级为进程内令牌桶，保证采集链路不中断
+    """
+
+    def __init__(self):
+        # 预留给 register_script 返回的 Script 对象
+        self._script = None
+        self._fallback = LocalRateLimiter(rate=_DEFAULT_QPS, capacity=_DEFAULT_BURST)
+
+    @staticmethod
+    def get_budget(family: str) -> tuple[float, float]:
+        return ENDPOINT_FAMILY_BUDGETS.get(family, ENDPOINT_FAMILY_BUDGETS["default"])
+
+    async def acquire(self, platform: str, family: str, browser_id: Optional[str], tokens: float = 1.0):
+        """
+        获取令牌，预算不足时挂起等待，有预算时立即放行 (无空转等待)
+        """
+        rate, capacity = self.get_budget(family)
+        key = f"{platform}:{family}:{browser_id or 'local_config'}"
+        redis_pool = redis_client_mgr.pool
+        if redis_pool is None:
+            await self._fallback.acquire(key, tokens, rate=rate, capacity=capacity)
+            return
+
+        # 懒加载：只在第一次调用时注册 Lua 脚本到 Redis，获取 SHA1 缓存
+        if self._script is None:
+            self._script = redis_pool.register_script(_LUA_TOKEN_BUCKET_SCRIPT)
+
+        while True:
+            try:
+                wait_ms = await self._script(
+                    keys=[f"rate_limit:{key}"],
+                    args=[rate, capacity, tokens],
+                    client=redis_pool
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ [RateLimiter] Redis 令牌桶执行异常，降级为进程内限流: {e}")
+                await self._fallback.acquire(key, tokens, rate=rate, capacity=capacity)
+                return
+
+            wait_ms = int(wait_ms or 0)
+            if wait_ms <= 0:
+                return
+            await asyncio.sleep(wait_ms / 1000)
+
+
+# 导出一个单例供全局使用
+redis_rate_limiter = RedisRateLimiter()
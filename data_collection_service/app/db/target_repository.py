@@ -1,51 +1,107 @@
+import os
 from datetime import datetime
+from sqlalchemy import select, tuple_
 from sqlalchemy.dialects.mysql import insert
 
-from data_collection_service.app.db.session import SessionLocal
+from data_collection_service.app.db.async_session import AsyncSessionLocal
 from data_collection_service.app.db.models import CrawlerTarget
+from data_collection_service.app.db.known_targets import known_target_set
 from data_collection_service.crawlers.utils.logger import logger
 
+# 批量注册时单条 INSERT 语句的最大行数
+REGISTER_CHUNK_SIZE = int(os.getenv("TARGET_REGISTER_CHUNK_SIZE", 500))
 
-def cascade_register_videos_to_target(uid: str, platform_type: int, bvid_list: list, r_type: str, interval_minutes: int = 720):
+
+async def register_targets(uid: str, platform_type: int, targets: list[tuple[str, str]], interval_minutes: int = 720) -> list[tuple[int, datetime]]:
     """
-    专门用于级联写入新视频 ID 到调度总表，自我管理 DB Session。
+    批量注册采集目标 (多个资源维度合并为一次调用)，自我管理 DB Session。
+    1. 先用已注册目标集合 (Redis) 过滤掉已落库的目标，老视频不再每轮重复写入
+    2. 剩余目标按 TARGET_REGISTER_CHUNK_SIZE 分段 INSERT ... ON DUPLICATE KEY UPDATE，单条语句大小有界，全部分段在同一个事务中提交
     遇到老数据仅保持激活，绝不重置下一次调度时间！
+    :param targets: [(resource_type, target_id), ...]
+    :return: 本次写入目标的 [(主键, next_run_time)]，供调用方同步到期索引；失败时回滚并抛出异常
     """
-    if not bvid_list:
-        return 0
+    # 去重并保持顺序
+    targets = list(dict.fromkeys(targets))
+    pending = await known_target_set.filter_unknown(platform_type, uid, targets)
+    if not pending:
+        return []
 
     now = datetime.now()
-    values_to_insert = []
-
-    # 同时给新视频注册“详情”任务
-    for bvid in bvid_list:
-        values_to_insert.append({
-            "platform_type": platform_type,
-            "uid": uid,
-            "resource_type": r_type,
-            "target_id": bvid,
-            "cron_interval_minutes": interval_minutes,
-            "is_active": True,
-            "next_run_time": now  # 仅对首次 Insert 生效，新视频立刻跑
-        })
-
-    # 创建独立的数据库会话
-    db = SessionLocal()
-    try:
-        stmt = insert(CrawlerTarget).values(values_to_insert)
-
-        # 【核心逻辑】：遇到重复键时，只保证处于激活状态，坚决不更新 next_run_time，保护老视频调度周期
-        on_duplicate_stmt = stmt.on_duplicate_key_update(
-            is_active=True
-        )
-
-        result = db.execute(on_duplicate_stmt)
-        db.commit()
-        return result.rowcount
-    except Exception as e:
-        db.rollback()
-        logger.error(f"级联写入视频 Target 失败 (UID: {uid}): {str(e)}")
-        return 0
-    finally:
-        # 确保释放连接池
-        db.close()
\ No newline at end of file
+    schedules = []
+    async with AsyncSessionLocal() as db:
+        try:
+            for i in range(0, len(pending), REGISTER_CHUNK_SIZE):
+                chunk = pending[i:i + REGISTER_CHUNK_SIZE]
+                stmt = insert(CrawlerTarget).values([{
+                    "platform_type": platform_type,
+                    "uid": uid,
+                    "resource_type": resource_type,
+                    "target_id": target_id,
+                    "cron_interval_minutes": interval_minutes,
+                    "is_active": True,
+                    "next_run_time": now  # 仅对首次 Insert 生效，新视频立刻跑
+                } for resource_type, target_id in chunk])
+
+                # 【核心逻辑】：遇到重复键时，只保证处于激活状态，坚决不更新 next_run_time，保护老视频调度周期
+                await db.execute(stmt.on_duplicate_key_update(is_active=True))
+
+                # 回查本段目标的主键与实际调度时间 (已存在的目标保持原 next_run_time)
+                rows = (await db.execute(select(CrawlerTarget.id, CrawlerTarget.next_run_time).where(
+                    CrawlerTarget.platform_type == platform_type,
+                    CrawlerTarget.uid == uid,
+                    tuple_(CrawlerTarget.resource_type, CrawlerTarget.target_id).in_(chunk)
+                ))).all()
+                schedules.extend((row.id, row.next_run_time) for row in rows)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"批量注册 Target 失败 (UID: {uid}, 共 {len(pending)} 个): {str(e)}")
+            raise
+
+    # 提交成功后才记入已注册集合
+    await known_target_set.remember(platform_type, uid, pending)
+    return schedules
+
+
+async def fetch_target_schedule(platform_type: int, uid: str, resource_type: str, target_ids: list) -> list[tuple[int, datetime]]:
+    """
+    查询指定目标当前的 (主键, next_run_time)，用于注册后同步到期索引 (只返回激活状态的目标)
+    """
+    if not target_ids:
+        return []
+
+    async with AsyncSessionLocal() as db:
+        try:
+            rows = (await db.execute(select(CrawlerTarget.id, CrawlerTarget.next_run_time).where(
+                CrawlerTarget.platform_type == platform_type,
+                CrawlerTarget.uid == uid,
+                CrawlerTarget.resource_type == resource_type,
+                CrawlerTarget.target_id.in_(target_ids),
+                CrawlerTarget.is_active == True
+            ))).all()
+            return [(row.id, row.next_run_time) for row in rows]
+        except Exception as e:
+            logger.error(f"查询 Target 调度时间失败 (UID: {uid}): {str(e)}")
+            return []
+
+
+async def iter_active_target_schedule(chunk_size: int = 5000):
+    """
+    异步流式产出全部激活目标的 (主键, next_run_time)，用于重建到期索引
+    按主键 keyset 分段读取，不会一次性把全表载入内存，也不会长时间持有一个大查询
+    """
+    async with AsyncSessionLocal() as db:
+        last_id = 0
+        while True:
+            rows = (await db.execute(select(CrawlerTarget.id, CrawlerTarget.next_run_time).where(
+                CrawlerTarget.is_active == True,
+                CrawlerTarget.id > last_id
+            ).order_by(CrawlerTarget.id).limit(chunk_size))).all()
+            # 每段读完即结束只读事务，不在两段之间持有快照
+            await db.commit()
+            if not rows:
+                break
+            for row in rows:
+                yield row.id, row.next_run_time
+            last_id = rows[-1].id
@@ -0,0 +1,83 @@
+import os
+import time
+from typing import Optional
+
+from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class UploadWatermark:
+    """单个 UP 主上一次成功采集到的最新投稿 (created 时间戳 + bvid) 及上次全量刷新时间"""
+    __slots__ = ("mid", "latest_created", "latest_bvid", "full_refreshed_at")
+
+    def __init__(self, mid: str, latest_created: int, latest_bvid: str, full_refreshed_at: float):
+        self.mid = mid
+        self.latest_created = latest_created
+        self.latest_bvid = latest_bvid
+        self.full_refreshed_at = full_refreshed_at
+
+    def is_known(self, created: int, bvid: str) -> bool:
+        """投稿列表按 created 倒序：早于水位或就是水位本身的视频都已入库"""
+        return created < self.latest_created or bvid == self.latest_bvid
+
+
+class UploadWatermarkStore:
+    """
+    B站 UP 主投稿列表增量水位存储 (Redis Hash: upload_wm:bilibili:{mid})
+    1. 增量模式翻页遇到水位即停止，只采集并级联注册新投稿
+    2. 距上次全量刷新超过 UPLOAD_FULL_REFRESH_INTERVAL (默认 7 天) 时走一次全量，修正旧视频的统计数据漂移
+    Redis 不可用或水位过期时一律按全量处理
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("UPLOAD_INCREMENTAL", "True").lower() in ("true", "1", "t")
+        self.full_refresh_interval = int(os.getenv("UPLOAD_FULL_REFRESH_INTERVAL", 7 * 86400))
+        self.ttl = int(os.getenv("UPLOAD_WATERMARK_TTL", 30 * 86400))
+
+    @staticmethod
+    def _key(mid: str) -> str:
+        return f"upload_wm:bilibili:{mid}"
+
+    async def load(self, mid: str) -> Optional[UploadWatermark]:
+        """读取水位，无水位 (首次采集/已过期/未启用) 时返回 None"""
+        redis_pool = redis_client_mgr.pool
+        if not self.enabled or redis_pool is None:
+            return None
+        try:
+            data = await redis_pool.hgetall(self._key(mid))
+        except Exception as e:
+            logger.warning(f"⚠️ [UploadWatermark] 读取 UID:{mid} 水位失败，退化为全量采集: {e}")
+            return None
+        if not data or not data.get("latest_created"):
+            return None
+        return UploadWatermark(
+            mid,
+            int(data["latest_created"]),
+            data.get("latest_bvid", ""),
+            float(data.get("full_refreshed_at") or 0)
+        )
+
+    def needs_full_refresh(self, watermark: Optional[UploadWatermark]) -> bool:
+        if watermark is None:
+            return True
+        return time.time() - watermark.full_refreshed_at >= self.full_refresh_interval
+
+    async def save(self, mid: str, latest_created: int, latest_bvid: str, full_refresh: bool):
+        """推进水位；调用方需保证本轮数据与级联注册均已成功"""
+        redis_pool = redis_client_mgr.pool
+        if not self.enabled or redis_pool is None or not latest_created:
+            return
+        mapping = {"latest_created": latest_created, "latest_bvid": latest_bvid}
+        if full_refresh:
+            mapping["full_refreshed_at"] = int(time.time())
+        try:
+            async with redis_pool.pipeline(transaction=False) as pipe:
+                pipe.hset(self._key(mid), mapping=mapping)
+                pipe.expire(self._key(mid), self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"⚠️ [UploadWatermark] 保存 UID:{mid} 水位失败，下一轮会重复采集部分投稿: {e}")
+
+
+# 导出一个单例供全局使用
+upload_watermark_store = UploadWatermarkStore()
@@ -0,0 +1,110 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+
+from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.crawlers.bilibili.utils import bv2av
+from data_collection_service.crawlers.utils import json_codec
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class VideoMetaCache:
+    """
+    B站视频元数据 (/x/web-interface/view) 两级缓存
+    职责:
+    1. 进程内 LRU + 短 TTL，评论/详情/下载等任务在级联注册后往往紧挨着执行，同一 bvid 只请求一次上游
+    2. 可选 Redis 二级缓存，多个消费者副本之间共享
+    3. 请求合并 (single-flight)：同一 bvid 的并发请求只发出一次上游调用，其余协程等待同一结果
+    4. aid 可由 bvid 本地换算，无需任何网络请求
+    注意：返回的是共享对象，调用方只读不写
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("VIDEO_META_CACHE_TTL", 300))
+        self.max_size = int(os.getenv("VIDEO_META_CACHE_SIZE", 2048))
+        self.redis_ttl = int(os.getenv("VIDEO_META_REDIS_TTL", 600))
+        self.use_redis = os.getenv("VIDEO_META_CACHE_REDIS", "True").lower() in ("true", "1", "t")
+
+        self._local: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def _get_local(self, bvid: str) -> Optional[dict]:
+        entry = self._local.get(bvid)
+        if entry is None:
+            return None
+        expires_at, view = entry
+        if expires_at < time.monotonic():
+            del self._local[bvid]
+            return None
+        self._local.move_to_end(bvid)
+        return view
+
+    def _set_local(self, bvid: str, view: dict):
+        self._local[bvid] = (time.monotonic() + self.ttl, view)
+        self._local.move_to_end(bvid)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    async def get_video_view(self, crawler, bvid: str) -> Optional[dict]:
+        """
+        获取视频详情原始响应 (与 crawler.fetch_one_video 返回结构一致)，仅缓存 code == 0 的成功响应
+        """
+        view = self._get_local(bvid)
+        if view is not None:
+            return view
+
+        task = self._inflight.get(bvid)
+        if task is None:
+            task = asyncio.create_task(self._load(crawler, bvid))
+            self._inflight[bvid] = task
+            task.add_done_callback(lambda _: self._inflight.pop(bvid, None))
+        # shield：某个等待方被取消不影响其他合并等待的协程
+        return await asyncio.shield(task)
+
+    async def _load(self, crawler, bvid: str) -> Optional[dict]:
+        redis_key = f"video_meta:bilibili:{bvid}"
+        redis_pool = redis_client_mgr.pool if self.use_redis else None
+        if redis_pool is not None:
+            try:
+                cached = await redis_pool.get(redis_key)
+                if cached:
+                    view = json_codec.loads(cached)
+                    self._set_local(bvid, view)
+                    return view
+            except Exception as e:
+                logger.warning(f"⚠️ [VideoMetaCache] Redis 读取 {bvid} 失败，直接请求上游: {e}")
+
+        view = await crawler.fetch_one_video(bvid)
+        if not view or view.get('code') != 0:
+            return view
+
+        self._set_local(bvid, view)
+        if redis_pool is not None:
+            try:
+                await redis_pool.set(redis_key, json_codec.dumps_bytes(view), ex=self.redis_ttl)
+            except Exception as e:
+                logger.warning(f"⚠️ [VideoMetaCache] Redis 写入 {bvid} 失败: {e}")
+        return view
+
+    async def get_aid(self, crawler, bvid: str) -> Optional[int]:
+        """bvid -> aid：优先本地换算，bvid 格式异常时才回退到详情接口"""
+        try:
+            return await bv2av(bvid)
+        except (KeyError, IndexError):
+            view = await self.get_video_view(crawler, bvid)
+            if not view or view.get('code') != 0:
+                return None
+            return view.get('data', {}).get('aid')
+
+    async def get_cid(self, crawler, bvid: str) -> Optional[int]:
+        """bvid -> 第一P的 cid (走缓存的详情接口)"""
+        view = await self.get_video_view(crawler, bvid)
+        if not view or view.get('code') != 0:
+            return None
+        return view.get('data', {}).get('cid')
+
+
+# 导出一个单例供全局使用
+video_meta_cache = VideoMetaCache()
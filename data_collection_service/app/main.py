@@ -3,17 +3,24 @@ import asyncio
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
 
 # 导入路由文件:b站爬虫、clickhouse连接
 from data_collection_service.app.api.router import router
 from data_collection_service.app.core.nacos_config import nacos_registry
 from data_collection_service.app.db.clickhouse import ClickHouseManager
+from data_collection_service.app.db.clickhouse_writer import clickhouse_batch_writer
 from data_collection_service.crawlers.utils.logger import logger
+from data_collection_service.crawlers.utils.json_codec import ORJSON_AVAILABLE
 from data_collection_service.app.services.kafka_service import kafka_producer
+from data_collection_service.app.services.outbox_relay import outbox_relay
 from data_collection_service.app.services.kafka_consumer import kafka_consumer
 from data_collection_service.app.services.scheduler_service import scheduler_daemon
 from data_collection_service.app.db.redis_client import redis_client_mgr
+from data_collection_service.app.db.async_session import dispose_async_engine
+from data_collection_service.crawlers.utils.client_pool import crawler_client_pool
+from data_collection_service.app.services.range_downloader import range_downloader
 
 # 1. Nacos 连接配置
 # (为了代码健壮性，这里使用 os.getenv 并结合本地 .env 文件读取环境变量，赋予默认值以匹配本地开发)
@@ -46,13 +53,22 @@ async def lifespan(app: FastAPI):
             database="ods"  # or: os.getenv("CLICKHOUSE_DB", "ods")
         )
         logger.info("[Init] ClickHouse 数据库连接初始化成功。")
+        # 启动 ClickHouse 合批写入器 (合并小批量 INSERT，缓解 too many parts)
+        await clickhouse_batch_writer.start()
+        logger.info("[Init] ClickHouse 合批写入器启动成功。")
         # 初始化 Redis 异步连接池 (支撑高并发热缓存)
         await redis_client_mgr.init_pool()
         logger.info("[Init] Redis 热缓存连接池初始化成功。")
+        # 启动爬虫 HTTP 长连接客户端池 (复用 TCP/TLS 连接)
+        await crawler_client_pool.start()
+        logger.info("[Init] 爬虫 HTTP 客户端池启动成功。")
 
         # 步骤 2: 启动 Kafka 生产者
         await kafka_producer.start()
         logger.info("[Init] Kafka 生产者启动成功。")
+        # 启动发件箱中继 (把已落库的任务消息批量投递到 Kafka)
+        await outbox_relay.start()
+        logger.info("[Init] 发件箱中继启动成功。")
         # 步骤 3: 注册到 Nacos 注册中心 (服务就绪，开始接收流量)
         await nacos_registry.register()
         logger.info("[Init] Nacos 服务注册成功。")
@@ -100,6 +116,13 @@ async def lifespan(app: FastAPI):
         # 优雅停机缓冲期：给当前还在处理中的请求留出 1 秒收尾时间
         await asyncio.sleep(1)
 
+        # 停止发件箱中继 (调度器已停止，退出前把剩余的待投递消息发完)
+        try:
+            await outbox_relay.stop()
+            logger.info("[Cleanup] 发件箱中继已安全关闭。")
+        except Exception as e:
+            logger.error(f"[Cleanup] 发件箱中继关闭异常: {str(e)}")
+
         # 步骤 4. 安全关闭 Kafka 生产者 (确保状态更新等最后一条消息被 flush 到 Broker)
         try:
             await kafka_producer.stop()
@@ -107,7 +130,27 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"[Cleanup] Kafka 生产者关闭异常: {str(e)}")
 
-        # 步骤 5: 断开 ClickHouse 等、redis底层数据库连接
+        # 关闭爬虫 HTTP 长连接客户端池 (此时消费者已停止，不再有在途请求)
+        try:
+            await crawler_client_pool.close()
+            logger.info("[Cleanup] 爬虫 HTTP 客户端池已安全关闭。")
+        except Exception as e:
+            logger.error(f"[Cleanup] 爬虫 HTTP 客户端池关闭异常: {str(e)}")
+
+        # 关闭视频分段下载连接池
+        try:
+            await range_downloader.close()
+            logger.info("[Cleanup] 视频下载连接池已安全关闭。")
+        except Exception as e:
+            logger.error(f"[Cleanup] 视频下载连接池关闭异常: {str(e)}")
+
+        # 步骤 5: 刷出 ClickHouse 合批缓冲，再断开 ClickHouse 等、redis底层数据库连接
+        try:
+            await clickhouse_batch_writer.close()
+            logger.info("[Cleanup] ClickHouse 合批写入器已刷盘关闭。")
+        except Exception as e:
+            logger.error(f"[Cleanup] ClickHouse 合批写入器关闭异常: {str(e)}")
+
         try:
             await ClickHouseManager.close_db()
             logger.info("[Cleanup] ClickHouse 数据库连接已安全关闭。")
@@ -120,6 +163,12 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"[Cleanup] Redis 关闭异常: {str(e)}")
 
+        try:
+            await dispose_async_engine()
+            logger.info("[Cleanup] MySQL 异步连接池已安全关闭。")
+        except Exception as e:
+            logger.error(f"[Cleanup] MySQL 异步连接池关闭异常: {str(e)}")
+
         logger.info("👋 ================== 数据采集服务已安全退出 ================== 👋")
 
 # 3. 初始化 FastAPI
@@ -127,7 +176,9 @@ app = FastAPI(
     title="Data Collection Service",
     description="数据采集微服务",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # 安装了 orjson 时接口响应统一走 orjson 序列化，否则保持标准库 JSONResponse
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 # [新增] 配置 CORS
@@ -1,5 +1,6 @@
 """
 bilibili_task_service:
+comment_crawl_service:评论分页并发采集引擎
 data_cleaning_service:数据清洗服务
 storage_service:
 kafka_service:
@@ -1,3 +1,4 @@
+import os
 import asyncio
 import math
 import json
@@ -7,12 +8,17 @@ from typing import Optional
 
 from data_collection_service.app.db.clickhouse import ClickHouseManager
 from data_collection_service.app.services.kafka_service import kafka_producer
-from data_collection_service.app.services.data_cleaning_service import DataCleaningService
+from data_collection_service.app.services.data_cleaning_service import DataCleaningService, COMMENT_COLUMNS
 from data_collection_service.app.services.storage_service import StorageService
+from data_collection_service.app.services.comment_crawl_service import CommentCrawlEngine
 from data_collection_service.app.services.video_processor_service import VideoProcessorService
 from data_collection_service.app.services.storage_video_service import minio_video_client
 from data_collection_service.app.services.coze_service import coze_client
-from data_collection_service.app.db.target_repository import cascade_register_videos_to_target
+from data_collection_service.app.db.target_repository import register_targets
+from data_collection_service.app.db.due_index import target_due_index
+from data_collection_service.app.db.video_meta_cache import video_meta_cache
+from data_collection_service.app.db.comment_watermark import comment_watermark_store
+from data_collection_service.app.db.upload_watermark import upload_watermark_store
 from data_collection_service.crawlers.bilibili.web_crawler import BilibiliWebCrawler
 from data_collection_service.crawlers.utils.logger import logger
 from data_collection_service.crawlers.utils.multimodal_data import align_and_chunk_multimodal_data
@@ -30,104 +36,87 @@ class BilibiliTaskService:
         bvid = target_id
         logger.info(f"[Task {batch_id}] 开始执行视频 {bvid} 的评论采集任务")
 
-        # 1. 获取视频 aid
-        video_info = await self.crawler.fetch_one_video(bvid)
-        if not video_info or video_info.get('code') != 0:
-            logger.error(f"获取视频信息失败，无法提取 aid: bvid={bvid}")
-            return
-
-        aid = video_info.get('data', {}).get('aid')
+        # 1. 获取视频 aid (由 bvid 本地换算，无需请求详情接口)
+        aid = await video_meta_cache.get_aid(self.crawler, bvid)
         if not aid:
-            logger.error("视频信息中缺失 aid")
-            return
-
-        all_comments = []
-
-        # 2. 采集第一页并计算分页
-        first_page = await self.crawler.fetch_video_comments_new(bvid, pn=1, aid=aid)
-        if not first_page or first_page.get('code') != 0:
-            logger.error(f"获取首页评论失败: bvid={bvid}")
+            logger.error(f"获取视频信息失败，无法提取 aid: bvid={bvid}")
             return
 
-        page_info = first_page.get('data', {}).get('page', {})
-        total_count = page_info.get('count', 0)
-        page_size = page_info.get('size', 20) or 20
-        total_pages = math.ceil(total_count / page_size)
-
-        logger.info(f"视频 {bvid} 共发现 {total_count} 条评论，需采集 {total_pages} 页")
-
-        replies = first_page.get('data', {}).get('replies', [])
-        if replies:
-            all_comments.extend(replies)
-
-        # 3. 采集主评论剩余页
-        for pn in range(2, total_pages + 1):
-            try:
-                page_data = await self.crawler.fetch_video_comments_new(bvid, pn=pn, aid=aid)
-                if page_data.get('code') == 0:
-                    page_replies = page_data.get('data', {}).get('replies', [])
-                    if page_replies:
-                        all_comments.extend(page_replies)
-                    else:
-                        break
+        # 读取上一轮的评论水位：有水位时增量采集 (越过水位停止翻页，只更新 rcount 变化的楼中楼)
+        watermark = await comment_watermark_store.load(bvid)
+
+        # 整个视频的评论分页共用一个采集会话：租用少量身份轮换，不再逐页调度 Cookie
+        identities = int(os.getenv("COMMENT_SESSION_IDENTITIES", 2))
+        async with self.crawler.crawl_session(identities=identities) as session:
+            engine = CommentCrawlEngine(crawler=self.crawler, session=session, watermark=watermark)
+
+            # 2. 采集第一页并计算分页
+            first_page = await engine.fetch_first_page(bvid, aid)
+            if not first_page:
+                logger.error(f"获取首页评论失败: bvid={bvid}")
+                return
+
+            page_info = first_page.get('data', {}).get('page', {})
+            total_count = page_info.get('count', 0)
+            page_size = page_info.get('size', 20) or 20
+            total_pages = math.ceil(total_count / page_size)
+
+            if watermark:
+                logger.info(f"视频 {bvid} 共发现 {total_count} 条评论，增量采集至水位 ctime={watermark.max_ctime} (最多 {total_pages} 页)")
+            else:
+                logger.info(f"视频 {bvid} 共发现 {total_count} 条评论，需采集 {total_pages} 页")
+
+            # 3. 流式管道：有界并发采集 -> 逐页清洗 -> 攒满 N 行 -> 分批写入 ClickHouse
+            # 内存中最多只驻留一个并发窗口的原始页 + 一个待写批次，已落盘的批次不受后续页失败影响
+            inserted_rows = 0
+            failed_batches = 0
+            batches = self._iter_cleaned_comment_batches(engine, bvid, aid, first_page, batch_id)
+            async for cleaned_columns, row_count in batches:
+                # 列式写入：评论批次按列直接编码，不再为每条评论构造字典
+                is_ok = await self.storage.save_columns_to_clickhouse(
+                    table_name="ods.bilibili_video_comments",
+                    columns=cleaned_columns
+                )
+                if is_ok:
+                    inserted_rows += row_count
+                else:
+                    failed_batches += 1
+                    logger.error(f"[Task {batch_id}] 视频 {bvid} 有 {row_count} 条评论的批次落盘失败，继续采集后续分页")
 
-                # 【核心移植】：动态自适应延时策略防封
-                sleep_time = min(1.5 + (total_count / 1000), 3.0)
-                await asyncio.sleep(sleep_time)
-            except Exception as e:
-                logger.error(f"爬取第 {pn} 页异常: {e}")
-                await asyncio.sleep(3.0)
-                continue
-
-        # 4. 采集楼中楼（子评论）
-        for comment in all_comments:
-            rpid = comment.get('rpid')
-            rcount = comment.get('rcount', 0)
-
-            if rpid and rcount > 0:
-                reply_page = await self.crawler.fetch_comment_reply_new(bvid, pn=1, rpid=str(rpid), aid=aid)
-                if reply_page.get('code') == 0:
-                    reply_data = reply_page.get('data', {})
-                    # sub_replies = reply_data.get('replies', [])
-                    # 如果 get 到的是 None，强制转为空列表 []
-                    sub_replies = reply_data.get('replies') or []
-                    comment['replies'] = sub_replies
-
-                    reply_count = reply_data.get('page', {}).get('count', rcount)
-                    reply_size = reply_data.get('page', {}).get('size', 10) or 10
-                    reply_total_pages = math.ceil(reply_count / reply_size)
-
-                    for reply_pn in range(2, reply_total_pages + 1):
-                        await asyncio.sleep(0.8)
-                        try:
-                            reply_page_more = await self.crawler.fetch_comment_reply_new(bvid, pn=reply_pn, rpid=str(rpid),aid=aid)
-                            if reply_page_more.get('code') == 0:
-                                more_replies = reply_page_more.get('data', {}).get('replies', [])
-                                if more_replies:
-                                    comment['replies'].extend(more_replies)
-                        except Exception as e:
-                            logger.error(f"获取子评论异常: {e}")
-                            continue
-                await asyncio.sleep(1.0)
-
-        # 5. 数据清洗与格式化
-        cleaned_data = DataCleaningService.clean_bilibili_video_comments(all_comments, bvid, aid, batch_id)
-        logger.info(f"[清洗] 完成数据转换，清洗后产生 {len(cleaned_data)} 条标准化数据 (含子评论)")
-
-        # 6. 通用化写入 ClickHouse
-        # 即使未来换成动态评论、直播弹幕，这行代码都不用变，只需换 table_name 即可
-        if not cleaned_data:
+        if inserted_rows == 0 and failed_batches == 0:
             logger.warning(f"[Task {batch_id}] 清洗 {bvid} 视频数据为空或接口返回错误，跳过入库")
             return False
 
-        success = await self.storage.save_data_to_clickhouse(
-            table_name="ods.bilibili_video_comments",
-            data_list=cleaned_data
-        )
+        # 全部批次落盘后才推进水位；主评论分页有缺失时只记录已同步的楼中楼，不推进 max_ctime
+        if failed_batches == 0:
+            await comment_watermark_store.save(
+                bvid,
+                max_ctime=engine.max_ctime if engine.complete else (watermark.max_ctime if watermark else 0),
+                max_rpid=engine.max_rpid if engine.complete else (watermark.max_rpid if watermark else 0),
+                rcounts=engine.synced_rcounts
+            )
 
-        if success:
-            logger.info(f"[Task {batch_id}] 视频 {bvid} 全量评论信息入库成功")
-        return success
+        logger.info(f"[Task {batch_id}] 视频 {bvid} 评论流式入库完成: 成功 {inserted_rows} 条 (含子评论)，失败批次 {failed_batches} 个")
+        return failed_batches == 0
+
+    async def _iter_cleaned_comment_batches(self, engine: CommentCrawlEngine, bvid: str, aid: int, first_page: dict, batch_id: str):
+        """
+        评论流式管道的清洗与攒批阶段：逐页列式清洗，按 COMMENT_FLUSH_SIZE 行切批产出 (列数组, 行数)
+        """
+        flush_size = int(os.getenv("COMMENT_FLUSH_SIZE", 2000))
+        buffer = {name: [] for name in COMMENT_COLUMNS}
+        buffered_rows = 0
+        async for page_comments in engine.iter_comment_pages(bvid, aid, first_page):
+            page_columns = DataCleaningService.clean_bilibili_video_comments_columnar(page_comments, bvid, aid, batch_id)
+            for name, values in page_columns.items():
+                buffer[name].extend(values)
+            buffered_rows += len(page_columns['rpid'])
+            while buffered_rows >= flush_size:
+                yield {name: values[:flush_size] for name, values in buffer.items()}, flush_size
+                buffer = {name: values[flush_size:] for name, values in buffer.items()}
+                buffered_rows -= flush_size
+        if buffered_rows:
+            yield buffer, buffered_rows
 
     async def collect_and_store_user_info(self, target_id: str, batch_id: str):
         """
@@ -196,7 +185,8 @@ class BilibiliTaskService:
         bvid = target_id
         logger.info(f"[Task {batch_id}] 开始采集视频 {bvid} 的基本信息")
         try:
-            raw_data = await self.crawler.fetch_one_video(bv_id=bvid)
+            # 详情接口走元数据缓存：与同批级联的评论/下载任务共用一次上游请求
+            raw_data = await video_meta_cache.get_video_view(self.crawler, bvid)
         except Exception as e:
             logger.error(f"[Task {batch_id}] 视频 {bvid} 网络请求失败: {str(e)}")
             return False
@@ -244,14 +234,10 @@ class BilibiliTaskService:
 
         try:
             # 1. 任务自闭环：独立获取视频信息，提取 cid
-            video_info = await self.crawler.fetch_one_video(bvid)
-            if not video_info or video_info.get('code') != 0:
-                logger.error(f"[Task {batch_id}] 获取视频信息失败，无法提取 cid: bvid={bvid}")
-                return False
-            # B站视频可能有多P，我们通常针对 AI 分析只取第一P的 cid
-            cid = video_info.get('data', {}).get('cid')
+            # B站视频可能有多P，我们通常针对 AI 分析只取第一P的 cid (走元数据缓存)
+            cid = await video_meta_cache.get_cid(self.crawler, bvid)
             if not cid:
-                logger.error(f"[Task {batch_id}] 视频信息中缺失 cid: bvid={bvid}")
+                logger.error(f"[Task {batch_id}] 获取视频信息失败或缺失 cid: bvid={bvid}")
                 return False
 
             # 使用 bvid 和 cid 共同作为文件名，天然支持版本追踪
@@ -282,10 +268,12 @@ class BilibiliTaskService:
                 logger.warning(f"[Task {batch_id}] 视频不包含 dash 音视频分离流，暂时跳过: bvid={bvid}")
                 return False
 
-            # 提取视频流 (取第一种清晰度的首个备用地址)
-            video_url = dash_info.get('video', [{}])[0].get('baseUrl')
+            # 提取视频流 (取第一种清晰度的主地址，backupUrl 为同一文件的 CDN 镜像，下载失败时续传用)
+            video_stream = dash_info.get('video', [{}])[0]
+            video_url = video_stream.get('baseUrl')
             # 提取音频流
-            audio_url = dash_info.get('audio', [{}])[0].get('baseUrl')
+            audio_stream = dash_info.get('audio', [{}])[0]
+            audio_url = audio_stream.get('baseUrl')
 
             if not video_url or not audio_url:
                 logger.error(f"[Task {batch_id}] 无法解析具体的音视频 baseUrl: bvid={bvid}")
@@ -296,7 +284,9 @@ class BilibiliTaskService:
             # 组装数据包
             video_mock_data = {
                 'nwm_video_url_HQ': video_url,
-                'audio_url': audio_url
+                'nwm_video_backup_urls': video_stream.get('backupUrl') or video_stream.get('backup_url') or [],
+                'audio_url': audio_url,
+                'audio_backup_urls': audio_stream.get('backupUrl') or audio_stream.get('backup_url') or []
             }
             # 4. 委托 VideoProcessorService 执行重度 I/O 操作
             composite_video_id = f"{bvid}_{cid}"
@@ -347,7 +337,8 @@ class BilibiliTaskService:
                 "cid": str(cid),
                 "coze_file_id": coze_aud_id  # 传递核心介质 ID
             }
-            await kafka_producer.send_task_message("bilibili_coze_asr_tasks", ai_asr_payload)
+            # 非阻塞投递 (按 bvid 分区)：消息进入生产者缓冲即返回，投递失败由生产者的重试缓冲区兜底
+            await kafka_producer.send("bilibili_coze_asr_tasks", ai_asr_payload, key=bvid)
             logger.info(f"[Task {batch_id}] 阶段 A 完成，已将视频 {bvid} (CozeID: {coze_aud_id}) 推入阶段 B (ASR) 队列。")
 
             return True
@@ -387,14 +378,16 @@ class BilibiliTaskService:
                 "bvid": bvid,
                 "cid": str(cid)
             }
-            # 发送给 Topic C
-            await kafka_producer.send_task_message("bilibili_multimodal_analysis_tasks", analysis_payload)
+            # 发送给 Topic C (非阻塞，按 bvid 分区)
+            await kafka_producer.send("bilibili_multimodal_analysis_tasks", analysis_payload, key=bvid)
             logger.info(f"[ASR Pipeline] 阶段 B 闭环完成，已将视频 {bvid} 推入阶段 C (多模态深度分析) 队列。")
         return success
 
     async def collect_and_store_user_videos(self, target_id: str, batch_id: str) -> bool:
         """
         采集用户投稿视频作品信息，只抓取近一年的数据，并写入 ClickHouse
+        增量模式：翻页到上一轮记录的最新投稿 (水位) 即停止；每隔 UPLOAD_FULL_REFRESH_INTERVAL 走一次全量刷新统计数据
+        无论哪种模式，只有新发现的视频才会级联注册到调度总表
         """
         mid = target_id
         page = 1
@@ -402,6 +395,12 @@ class BilibiliTaskService:
         bvid_list = []
         recent_30_days_bvid_list = []
         has_more = True
+        # 本轮看到的最新投稿，成功后作为新水位
+        latest_created, latest_bvid = 0, ""
+
+        watermark = await upload_watermark_store.load(mid)
+        full_refresh = upload_watermark_store.needs_full_refresh(watermark)
+        logger.info(f"[Task:{batch_id}] UID:{mid} 投稿采集模式: {'全量刷新' if full_refresh else f'增量 (水位 {watermark.latest_bvid})'}")
 
         # 计算时间边界：一年（365天）前的时间戳
         one_year_ago_ts = int((datetime.now() - timedelta(days=365)).timestamp())
@@ -421,6 +420,16 @@ class BilibiliTaskService:
                     pubdate_ts = v.get('created', 0)
                     bvid = v.get('bvid', '')
 
+                    if pubdate_ts > latest_created:
+                        latest_created, latest_bvid = pubdate_ts, bvid
+
+                    # 水位之前的视频都已入库：增量模式直接结束翻页
+                    is_new = watermark is None or not watermark.is_known(pubdate_ts, bvid)
+                    if not is_new and not full_refresh:
+                        logger.info(f"[Task:{batch_id}] UID:{mid} 触达上次采集水位 {watermark.latest_bvid}，提前结束爬取。")
+                        has_more = False
+                        break
+
                     if any(v.get(key, 0) != 0 for key in ['is_pay', 'is_lesson_video', 'is_charging_arc', 'is_live_playback']):
                         logger.debug(f"[Task:{batch_id}] 视频 {bvid} 不符合UGC常规投放特征，跳过")
                         continue
@@ -432,6 +441,9 @@ class BilibiliTaskService:
                         break
 
                     all_videos.append(v)
+                    if not is_new:
+                        # 全量刷新模式下的老视频：只重写统计数据，不再重复级联注册
+                        continue
                     bvid_list.append(bvid)
 
                     if pubdate_ts >= thirty_days_ago_ts:
@@ -441,11 +453,12 @@ class BilibiliTaskService:
                     break
 
                 page += 1
-                # 防护风控机制：翻页休眠 1.5 - 3 秒
-                await asyncio.sleep(2)
+                # 防护风控机制：翻页节奏由爬虫层的 Redis 分布式令牌桶控制 (space 接口族预算最严格)
 
             except Exception as e:
                 logger.error(f"[Task:{batch_id}] 拉取 UID:{mid} 视频页数 {page} 发生异常: {str(e)}")
+                # 翻页中断时本轮结果不完整，不能推进水位
+                latest_created = 0
                 break
 
         # --- 数据落盘与状态判定 ---
@@ -461,36 +474,27 @@ class BilibiliTaskService:
                 return False  # 快速失败，保护数据完整性
 
         # --- 触发级联调度 ---
+        # 两个资源维度合并为一次批量注册：近 30 天的视频下载任务 + 全部新视频的详情任务
         is_cascade_success = True
-        if recent_30_days_bvid_list and is_ch_success:
+        cascade_targets = [("scrape_and_store_video_to_minio", bvid) for bvid in recent_30_days_bvid_list]
+        cascade_targets += [("scrape_and_store_video_info", bvid) for bvid in bvid_list]
+        if cascade_targets and is_ch_success:
             try:
-                # 独立 DB Session 的操作，必须捕获其可能抛出的异常
-                affected_rows = cascade_register_videos_to_target(
+                schedules = await register_targets(
                     uid=mid,
                     platform_type=3,
-                    bvid_list=recent_30_days_bvid_list,
-                    r_type="scrape_and_store_video_to_minio",
+                    targets=cascade_targets,
                     interval_minutes=720
                 )
-                logger.info(f"[Task:{batch_id}] 级联目标注册完成，触发 {affected_rows} 个后台调度。")
+                await target_due_index.add(schedules)
+                logger.info(f"[Task:{batch_id}] 级联目标注册完成，触发 {len(schedules)} 个后台调度。")
             except Exception as e:
                 logger.error(f"[Task:{batch_id}] 级联目标注册(MySQL)发生崩溃: {str(e)}")
                 is_cascade_success = False
 
-        if bvid_list and is_ch_success:
-            try:
-                # 独立 DB Session 的操作，必须捕获其可能抛出的异常
-                affected_rows = cascade_register_videos_to_target(
-                    uid=mid,
-                    platform_type=3,
-                    bvid_list=bvid_list,
-                    r_type="scrape_and_store_video_info",
-                    interval_minutes=720
-                )
-                logger.info(f"[Task:{batch_id}] 级联目标注册完成，触发 {affected_rows} 个后台调度。")
-            except Exception as e:
-                logger.error(f"[Task:{batch_id}] 级联目标注册(MySQL)发生崩溃: {str(e)}")
-                is_cascade_success = False
+        # 落盘与级联注册都成功后才推进水位，否则下一轮会重新发现这些视频
+        if is_ch_success and is_cascade_success:
+            await upload_watermark_store.save(mid, latest_created, latest_bvid, full_refresh)
 
         # 只有当两个核心 I/O 操作都成功时，才向队列返回 ACK(True)
         return is_ch_success and is_cascade_success
@@ -0,0 +1,192 @@
+import os
+import math
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from data_collection_service.app.db.comment_watermark import CommentWatermark, comment_watermark_store
+from data_collection_service.crawlers.bilibili.web_crawler import BilibiliWebCrawler
+from data_collection_service.crawlers.bilibili.crawl_session import CrawlSession
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class CommentCrawlEngine:
+    """
+    B站评论分页并发采集引擎
+    职责:
+    1. 首页拿到 total_pages 后，主评论分页与楼中楼分页通过有界并发窗口扇出
+    2. 结果严格按页码顺序产出，遇到空页提前终止后续分页
+    3. 请求节奏交给爬虫层的 Cookie 令牌桶控制，引擎内不再写死 sleep
+    4. 传入采集会话时，全部分页复用会话租用的身份，不再逐页调度 Cookie
+    5. 传入水位时为增量模式：按时间倒序翻页，越过水位即停止；楼中楼只为 rcount 变化的主评论重新拉取
+    采集结束后 max_ctime / max_rpid / synced_rcounts 即为本轮可推进的新水位
+    """
+
+    def __init__(self, crawler: BilibiliWebCrawler, max_workers: Optional[int] = None, session: Optional[CrawlSession] = None,
+                 watermark: Optional[CommentWatermark] = None):
+        self.crawler = crawler
+        self.session = session
+        self.watermark = watermark
+        self.max_workers = max_workers or int(os.getenv("COMMENT_CRAWL_WORKERS", 4))
+        # 主评论与楼中楼共享同一个并发上限，保证单视频的在途请求数有界
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        # 本轮采集观察到的新水位；主评论分页有失败时 complete 置 False，调用方不应推进 max_ctime
+        self.max_ctime = watermark.max_ctime if watermark else 0
+        self.max_rpid = watermark.max_rpid if watermark else 0
+        self.synced_rcounts: dict[str, int] = {}
+        self.complete = True
+
+    async def _fetch(self, fetch_page: Callable[[int], Awaitable[dict]], pn: int) -> Optional[dict]:
+        """受并发上限约束的单页请求，异常降级为 None 由调用方跳过"""
+        async with self._semaphore:
+            try:
+                return await fetch_page(pn)
+            except Exception as e:
+                logger.error(f"[CommentCrawl] 爬取第 {pn} 页异常: {e}")
+                return None
+
+    async def iter_pages(self, fetch_page: Callable[[int], Awaitable[dict]], pages: Iterable[int]) -> AsyncIterator[tuple[int, Optional[dict]]]:
+        """
+        滑动窗口并发拉取分页，按页码顺序产出 (pn, page_data)
+        调用方 break 退出迭代即可提前终止，窗口内尚未完成的请求会被取消
+        """
+        page_iter = iter(pages)
+        pending: deque[tuple[int, asyncio.Task]] = deque()
+
+        def _fill_window():
+            while len(pending) < self.max_workers:
+                pn = next(page_iter, None)
+                if pn is None:
+                    return
+                pending.append((pn, asyncio.create_task(self._fetch(fetch_page, pn))))
+
+        try:
+            _fill_window()
+            while pending:
+                pn, task = pending.popleft()
+                page_data = await task
+                yield pn, page_data
+                _fill_window()
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+    async def fetch_first_page(self, bvid: str, aid: int) -> Optional[dict]:
+        """采集主评论首页，用于计算总页数"""
+        first_page = await self._fetch(lambda pn: self.crawler.fetch_video_comments_new(bvid, pn=pn, aid=aid, session=self.session), 1)
+        if not first_page or first_page.get('code') != 0:
+            return None
+        return first_page
+
+    async def iter_comment_pages(self, bvid: str, aid: int, first_page: dict) -> AsyncIterator[list[dict]]:
+        """
+        按页顺序产出主评论列表 (每条主评论的 replies 已补全楼中楼)
+        增量模式下产出到越过水位的那一页为止 (该页整页产出，避免同一秒内的评论被漏掉)
+        """
+        page_info = first_page.get('data', {}).get('page', {})
+        total_count = page_info.get('count', 0)
+        page_size = page_info.get('size', 20) or 20
+        total_pages = math.ceil(total_count / page_size)
+
+        replies = first_page.get('data', {}).get('replies') or []
+        if replies:
+            await self._process_page(bvid, aid, replies)
+            yield replies
+            if self._below_watermark(replies):
+                return
+
+        async for pn, page_data in self.iter_pages(
+                lambda pn: self.crawler.fetch_video_comments_new(bvid, pn=pn, aid=aid, session=self.session),
+                range(2, total_pages + 1)
+        ):
+            if not page_data or page_data.get('code') != 0:
+                # 跳过的分页可能含有未入库的新评论，本轮不能推进水位
+                self.complete = False
+                continue
+            page_replies = page_data.get('data', {}).get('replies') or []
+            if not page_replies:
+                # 空页说明已到末尾，提前终止剩余分页
+                break
+            await self._process_page(bvid, aid, page_replies)
+            yield page_replies
+            if self._below_watermark(page_replies):
+                break
+
+    def _below_watermark(self, comments: list[dict]) -> bool:
+        """时间倒序下，页内最旧的主评论早于水位，说明后续分页都已入库"""
+        if self.watermark is None:
+            return False
+        return (comments[-1].get('ctime') or 0) < self.watermark.max_ctime
+
+    async def _process_page(self, bvid: str, aid: int, comments: list[dict]):
+        """推进本轮水位，并补全需要更新的楼中楼"""
+        for c in comments:
+            self.max_ctime = max(self.max_ctime, c.get('ctime') or 0)
+            self.max_rpid = max(self.max_rpid, c.get('rpid') or 0)
+        await self._fill_sub_replies(bvid, aid, comments)
+
+    async def _fill_sub_replies(self, bvid: str, aid: int, comments: list[dict]):
+        """
+        并发补全一页主评论下的楼中楼 (子评论)
+        增量模式下 rcount 与上次同步一致的主评论跳过，只保留分页接口自带的预览回复
+        """
+        known_rcounts: dict[str, int] = {}
+        if self.watermark is not None:
+            rpids = [str(c['rpid']) for c in comments if c.get('rpid')]
+            try:
+                known_rcounts = await comment_watermark_store.get_rcounts(bvid, rpids)
+            except Exception as e:
+                logger.warning(f"[CommentCrawl] 读取 {bvid} 的楼中楼同步记录失败，本页全部重新拉取: {e}")
+
+        targets = []
+        for c in comments:
+            if not c.get('rpid'):
+                continue
+            rpid, rcount = str(c['rpid']), c.get('rcount') or 0
+            if self.watermark is not None and known_rcounts.get(rpid, 0) == rcount:
+                continue
+            if rcount == 0:
+                if rpid in known_rcounts:
+                    # 楼中楼被删光：记为 0，下一轮不再比对出差异
+                    self.synced_rcounts[rpid] = 0
+                continue
+            targets.append(c)
+        if targets:
+            await asyncio.gather(*(self._fetch_replies_of_root(bvid, aid, c) for c in targets))
+
+    async def _fetch_replies_of_root(self, bvid: str, aid: int, comment: dict):
+        rpid = str(comment.get('rpid'))
+        rcount = comment.get('rcount', 0)
+
+        def fetch_reply_page(pn: int) -> Awaitable[dict]:
+            return self.crawler.fetch_comment_reply_new(bvid, pn=pn, rpid=rpid, aid=aid, session=self.session)
+
+        reply_page = await self._fetch(fetch_reply_page, 1)
+        if not reply_page or reply_page.get('code') != 0:
+            return
+        synced = True
+
+        reply_data = reply_page.get('data', {})
+        # 如果 get 到的是 None，强制转为空列表 []
+        comment['replies'] = reply_data.get('replies') or []
+
+        reply_count = reply_data.get('page', {}).get('count', rcount)
+        reply_size = reply_data.get('page', {}).get('size', 10) or 10
+        reply_total_pages = math.ceil(reply_count / reply_size)
+
+        async for _, page_more in self.iter_pages(fetch_reply_page, range(2, reply_total_pages + 1)):
+            if not page_more or page_more.get('code') != 0:
+                synced = False
+                continue
+            more_replies = page_more.get('data', {}).get('replies') or []
+            if not more_replies:
+                break
+            comment['replies'].extend(more_replies)
+
+        # 楼中楼完整拉取后才记录 rcount，失败的主评论下一轮会被重新比对出差异
+        if synced:
+            self.synced_rcounts[rpid] = rcount
+
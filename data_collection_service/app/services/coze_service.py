@@ -1,8 +1,8 @@
 import os
 import httpx
-import json
 from typing import Optional, Any
 from data_collection_service.crawlers.utils.logger import logger
+from data_collection_service.crawlers.utils import json_codec
 
 
 class CozeApiService:
@@ -22,9 +22,9 @@ class CozeApiService:
         parse_count = 0
         while isinstance(data, str) and parse_count < max_depth:
             try:
-                data = json.loads(data)
+                data = json_codec.loads(data)
                 parse_count += 1
-            except json.JSONDecodeError:
+            except json_codec.JSONDecodeError:
                 break
         return data
 
@@ -38,7 +38,7 @@ class CozeApiService:
                     response = await client.post(url, headers=self.headers, files=files, timeout=60.0)
                     response.raise_for_status()
 
-                    data = response.json()
+                    data = json_codec.loads(response.content)
                     if data.get("code") == 0:
                         file_id = data.get("data", {}).get("id")
                         logger.info(f"[CozeService] 文件上传成功: {file_path} -> file_id: {file_id}")
@@ -53,7 +53,7 @@ class CozeApiService:
     async def run_asr_workflow(self, file_id: str) -> dict:
         """调用 Coze 工作流进行音视频分离与 ASR 解析"""
 
-        file_param_str = json.dumps({"file_id": file_id})
+        file_param_str = json_codec.dumps({"file_id": file_id})
         payload = {
             "workflow_id": self.asr_workflow_id,
             "parameters": {
@@ -71,7 +71,7 @@ class CozeApiService:
                 response.raise_for_status()
 
                 # 注意：Coze 可能会返回嵌套的 JSON 字符串，需要二次解析
-                data = response.json()
+                data = json_codec.loads(response.content)
                 logger.info(f"[CozeService] 工作流执行完毕, file_id: {file_id}")
                 return data
         except Exception as e:
@@ -95,7 +95,7 @@ class CozeApiService:
                 response = await client.post(self.workflow_base_url, headers=self.headers, json=payload)
                 response.raise_for_status()
                 # 1. 获取外层响应
-                res_json = response.json()
+                res_json = json_codec.loads(response.content)
                 # 2. 提取 Debug 链接 (极其重要)
                 debug_url = res_json.get("debug_url") or res_json.get("data", {}).get("debug_url", "未提供")
                 # 3. 校验业务状态码
@@ -7,6 +7,15 @@ from data_collection_service.crawlers.utils.logger import logger
 
 TZ_SHANGHAI = timezone(timedelta(hours=8))
 
+# ods.bilibili_video_comments 的写入列 (顺序即 _parse_video_single_comment_values 的取值顺序)
+COMMENT_COLUMNS = (
+    'rpid', 'oid', 'bvid', 'batch_id', 'root_id', 'parent_id', 'dialog_id', 'state',
+    'mid', 'uname', 'sign', 'user_level', 'user_sex', 'vip_type',
+    'medal_uid', 'medal_id', 'medal_name', 'medal_level', 'medal_guard_level',
+    'message', 'mentions_mids', 'jump_url_title', 'jump_url',
+    'like_count', 'count', 'reply_count', 'ctime', 'ctime_ts',
+)
+
 class DataCleaningService:
     """
     数据清洗服务：负责将爬虫获取的各种异构原始数据转换为 ClickHouse 强类型标准字典
@@ -74,14 +83,43 @@ class DataCleaningService:
         return cleaned_data
 
     @classmethod
-    def _parse_video_single_comment(cls, raw: Dict[str, Any], bvid: str, oid: int, batch_id: str) -> Dict[str, Any]:
+    def clean_bilibili_video_comments_columnar(cls, raw_comments: List[Dict[str, Any]], bvid: str, oid: int, batch_id: str) -> Dict[str, List[Any]]:
         """
+        评论清洗的列式版本：直接按列追加，不为每行构造字典，配合 StorageService.save_columns_to_clickhouse 使用
+        :return: {列名: 列数组}，列顺序与 COMMENT_COLUMNS 一致
+        """
+        columns = {name: [] for name in COMMENT_COLUMNS}
+        if not raw_comments:
+            return columns
 
-        :param raw:
+        appenders = [columns[name].append for name in COMMENT_COLUMNS]
+        for item in raw_comments:
+            # 主评论 + 子评论 (楼中楼)，加上 or [] 防止 replies 为 None
+            for raw in [item, *(item.get('replies') or [])]:
+                values = cls._parse_video_single_comment_values(raw, bvid, oid, batch_id)
+                # 与 _validate_data 一致：rpid / oid / bvid 缺一不可
+                if values[0] != 0 and values[1] != 0 and values[2]:
+                    for append, value in zip(appenders, values):
+                        append(value)
+
+        return columns
+
+    @classmethod
+    def _parse_video_single_comment(cls, raw: Dict[str, Any], bvid: str, oid: int, batch_id: str) -> Dict[str, Any]:
+        """
+        解析单条评论为行字典
+        :param raw: 接口返回的单条评论 (主评论或楼中楼)
         :param bvid:
         :param oid:
         :return:
         """
+        return dict(zip(COMMENT_COLUMNS, cls._parse_video_single_comment_values(raw, bvid, oid, batch_id)))
+
+    @classmethod
+    def _parse_video_single_comment_values(cls, raw: Dict[str, Any], bvid: str, oid: int, batch_id: str) -> tuple:
+        """
+        解析单条评论为按 COMMENT_COLUMNS 顺序排列的值元组 (行式/列式清洗共用)
+        """
         member = raw.get('member', {})
         fans_detail = member.get('fans_detail') or {}
         content = raw.get('content', {})
@@ -92,45 +130,45 @@ class DataCleaningService:
 
         jump_url = content.get('jump_url', {})
 
-        return {
-            'rpid': cls._safe_int(raw.get('rpid_str', raw.get('rpid', 0))),
-            'oid': oid,
-            'bvid': bvid,
-            'batch_id': cls._safe_int(batch_id),
-            'root_id': cls._safe_int(raw.get('root_str', raw.get('root', 0))),
-            'parent_id': cls._safe_int(raw.get('parent_str', raw.get('parent', 0))),
-            'dialog_id': cls._safe_int(raw.get('dialog_str', raw.get('dialog', 0))),
-            'state': cls._safe_int(raw.get('state', 0)),
+        return (
+            cls._safe_int(raw.get('rpid_str', raw.get('rpid', 0))),  # rpid
+            oid,  # oid
+            bvid,  # bvid
+            cls._safe_int(batch_id),  # batch_id
+            cls._safe_int(raw.get('root_str', raw.get('root', 0))),  # root_id
+            cls._safe_int(raw.get('parent_str', raw.get('parent', 0))),  # parent_id
+            cls._safe_int(raw.get('dialog_str', raw.get('dialog', 0))),  # dialog_id
+            cls._safe_int(raw.get('state', 0)),  # state
 
             # 用户维度
-            'mid': cls._safe_int(member.get('mid_str', member.get('mid', 0))),
-            'uname': cls._safe_string(member.get('uname', '')),
-            'sign': cls._safe_string(member.get('sign', '')),
-            'user_level': cls._safe_int(member.get('level_info', {}).get('current_level', 0)),
-            'user_sex': cls._safe_string(member.get('sex', '保密')),
-            'vip_type': cls._safe_int(member.get('vip', {}).get('vipType', 0)),
+            cls._safe_int(member.get('mid_str', member.get('mid', 0))),  # mid
+            cls._safe_string(member.get('uname', '')),  # uname
+            cls._safe_string(member.get('sign', '')),  # sign
+            cls._safe_int(member.get('level_info', {}).get('current_level', 0)),  # user_level
+            cls._safe_string(member.get('sex', '保密')),  # user_sex
+            cls._safe_int(member.get('vip', {}).get('vipType', 0)),  # vip_type
 
             # 粉丝牌维度
-            'medal_uid': cls._safe_int(fans_detail.get('uid', 0)),
-            'medal_id': cls._safe_int(fans_detail.get('medal_id', 0)),
-            'medal_name': cls._safe_string(fans_detail.get('medal_name', '')),
-            'medal_level': cls._safe_int(fans_detail.get('level', 0)),
-            'medal_guard_level': cls._safe_int(fans_detail.get('guard_level', 0)),
+            cls._safe_int(fans_detail.get('uid', 0)),  # medal_uid
+            cls._safe_int(fans_detail.get('medal_id', 0)),  # medal_id
+            cls._safe_string(fans_detail.get('medal_name', '')),  # medal_name
+            cls._safe_int(fans_detail.get('level', 0)),  # medal_level
+            cls._safe_int(fans_detail.get('guard_level', 0)),  # medal_guard_level
 
             # 内容维度
-            'message': cls._safe_string(content.get('message', raw.get('msg', ''))),
-            'mentions_mids': mentions_mids,
-            'jump_url_title': cls._safe_string(jump_url.get('title', '')),
-            'jump_url': cls._safe_string(jump_url.get('url', '')),
+            cls._safe_string(content.get('message', raw.get('msg', ''))),  # message
+            mentions_mids,  # mentions_mids
+            cls._safe_string(jump_url.get('title', '')),  # jump_url_title
+            cls._safe_string(jump_url.get('url', '')),  # jump_url
             # 'official_verify': json.dumps(member.get('official_verify', {}), ensure_ascii=False),
 
             # 指标及时间维度
-            'like_count': cls._safe_int(raw.get('like', 0)),
-            'count': cls._safe_int(raw.get('count', 0)),
-            'reply_count': cls._safe_int(raw.get('rcount', 0)),
-            'ctime': cls._safe_datetime(raw.get('ctime', 0)),
-            'ctime_ts': cls._safe_int(raw.get('ctime', 0))
-        }
+            cls._safe_int(raw.get('like', 0)),  # like_count
+            cls._safe_int(raw.get('count', 0)),  # count
+            cls._safe_int(raw.get('rcount', 0)),  # reply_count
+            cls._safe_datetime(raw.get('ctime', 0)),  # ctime
+            cls._safe_int(raw.get('ctime', 0))  # ctime_ts
+        )
 
     @classmethod
     def clean_user_info(cls, raw_data: Dict[str, Any], batch_id: str) -> List[Dict[str, Any]]:
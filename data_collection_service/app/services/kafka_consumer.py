@@ -1,12 +1,17 @@
 import os
-import json
+import socket
 import asyncio
 import traceback
+from datetime import datetime, timedelta
+from typing import Optional
 from aiokafka import AIOKafkaConsumer
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 # 导入基础组件
 from data_collection_service.crawlers.utils.logger import logger
-from data_collection_service.app.db.session import SessionLocal
+from data_collection_service.crawlers.utils import json_codec
+from data_collection_service.app.db.async_session import AsyncSessionLocal
 from data_collection_service.app.db.models import CrawlerTask
 from data_collection_service.app.db.clickhouse import ClickHouseManager
 
@@ -14,9 +19,22 @@ from data_collection_service.app.db.clickhouse import ClickHouseManager
 from data_collection_service.crawlers.bilibili.web_crawler import BilibiliWebCrawler
 from data_collection_service.app.services.storage_service import StorageService
 from data_collection_service.app.services.bilibili_task_service import BilibiliTaskService
+from data_collection_service.app.core.resource_profiles import get_resource_concurrency
+from data_collection_service.app.services.kafka_partition_worker import PartitionedConsumerEngine
 
 load_dotenv()
 
+# 动态路由映射表 (Action Map)：resource_type -> BilibiliTaskService 的处理方法
+BILIBILI_ACTION_MAP = {
+    "scrape_and_store_video_comments": BilibiliTaskService.collect_and_store_video_comments,
+    "scrape_and_store_user_info": BilibiliTaskService.collect_and_store_user_info,
+    "scrape_and_store_user_relation": BilibiliTaskService.collect_and_store_user_relation,
+    "scrape_and_store_video_info": BilibiliTaskService.collect_and_store_video_info,
+    "scrape_and_store_user_videos": BilibiliTaskService.collect_and_store_user_videos,
+    # 下载用户近30天的所有投稿视频，这里的下载方法执行完双写后，而是生产一条消息发给 Topic B
+    "scrape_and_store_video_to_minio": BilibiliTaskService.collect_and_store_video_to_minio,
+}
+
 
 class KafkaConsumerManager:
     """
@@ -34,36 +52,73 @@ class KafkaConsumerManager:
         self.asr_consumer = None
         self.analysis_consumer = None
         self._tasks = []
+        # 阶段 A 分区并发引擎：单分区在途窗口 / 进程总在途上限
+        self.crawler_partition_window = int(os.getenv("CRAWLER_PARTITION_WINDOW", 2))
+        self.crawler_max_in_flight = int(os.getenv("CRAWLER_MAX_IN_FLIGHT", 8))
+        self.crawler_engine = None
+        # 阶段 C 多模态分析工作池：同时执行的工作流数 / 内存排队高水位 / 停机排空时限
+        self.analysis_max_concurrency = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", 2))
+        self.analysis_high_watermark = int(os.getenv("ANALYSIS_QUEUE_HIGH_WATERMARK", 8))
+        self.analysis_drain_timeout = float(os.getenv("ANALYSIS_DRAIN_TIMEOUT", 30))
+        self.analysis_engine = None
+        # 批次执行租约：执行期间每 1/3 租约时长续约一次；其他消费者遇到租约未过期的执行中批次时按轮询间隔等待
+        self.task_lease_seconds = int(os.getenv("TASK_LEASE_SECONDS", 300))
+        self.task_lease_poll = float(os.getenv("TASK_LEASE_POLL", 30))
+        self.crawler_revoke_drain_timeout = float(os.getenv("CRAWLER_REVOKE_DRAIN_TIMEOUT", 20))
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        # 资源维度 -> 并发闸门，跨批次共享，保证单进程内同类目标的在途数有界
+        self._resource_semaphores: dict[str, asyncio.Semaphore] = {}
 
     async def start(self):
         """启动消费者并挂载到后台"""
         try:
             # 1. 爬虫与下载消费者 (I/O密集型)
+            # 关闭自动提交：批次状态机落到 2/3 之后才由分区引擎手动提交位点，进程崩溃时未完成的批次会被重新投递
             self.crawler_consumer = AIOKafkaConsumer(
-                self.topic_crawler,
                 bootstrap_servers=self.bootstrap_servers,
                 group_id="crawler_worker_group",
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-                auto_offset_reset="earliest"
+                value_deserializer=json_codec.loads,
+                auto_offset_reset="earliest",
+                enable_auto_commit=False
+            )
+            self.crawler_engine = PartitionedConsumerEngine(
+                consumer=self.crawler_consumer,
+                handler=self._process_crawler_task,
+                name="Kafka Consumer A",
+                max_in_flight_per_partition=self.crawler_partition_window,
+                max_in_flight_total=self.crawler_max_in_flight,
+                revoke_drain_timeout=self.crawler_revoke_drain_timeout
             )
+            self.crawler_consumer.subscribe([self.topic_crawler], listener=self.crawler_engine.listener)
             # 2. AI ASR 工作流消费者 (CPU/第三方API限制型)
             # 这里的 session_timeout 和 max_poll_interval 可以适度调长，应对 Coze 的 API 延迟
             self.asr_consumer = AIOKafkaConsumer(
                 self.topic_asr,
                 bootstrap_servers=self.bootstrap_servers,
                 group_id="ai_asr_worker_group",  # 【关键】不同的消费组，实现算力隔离
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+                value_deserializer=json_codec.loads,
                 auto_offset_reset="earliest",
                 max_poll_interval_ms=600000  # 允许单次处理最长 10 分钟
             )
+            # 3. AI 多模态分析消费者 (长耗时工作流)
+            # 有界工作池执行，分析结束后才提交位点；排队达到高水位时暂停分区拉取
             self.analysis_consumer = AIOKafkaConsumer(
-                self.topic_analysis,
                 bootstrap_servers=self.bootstrap_servers,
                 group_id="ai_multimodal_worker_group",
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+                value_deserializer=json_codec.loads,
                 auto_offset_reset="earliest",
+                enable_auto_commit=False,
                 max_poll_interval_ms=600000  # 10分钟防掉线
             )
+            self.analysis_engine = PartitionedConsumerEngine(
+                consumer=self.analysis_consumer,
+                handler=self._process_analysis_task,
+                name="Kafka Consumer C",
+                max_in_flight_per_partition=self.analysis_high_watermark,
+                max_in_flight_total=self.analysis_high_watermark,
+                max_concurrency=self.analysis_max_concurrency
+            )
+            self.analysis_consumer.subscribe([self.topic_analysis], listener=self.analysis_engine.listener)
             await self.crawler_consumer.start()
             await self.asr_consumer.start()
             await self.analysis_consumer.start()
@@ -71,15 +126,21 @@ class KafkaConsumerManager:
             logger.info(f"🎧 [Kafka] 阶段 B (AI ASR) 已监听: {self.topic_asr}")
             logger.info(f"🎧 [Kafka] 阶段 C (AI 多模态分析) 已监听: {self.topic_analysis}")
             # 放入后台事件循环
-            self._tasks.append(asyncio.create_task(self._consume_crawler_loop()))
+            self._tasks.append(self.crawler_engine.start())
             self._tasks.append(asyncio.create_task(self._consume_asr_loop()))
-            self._tasks.append(asyncio.create_task(self._consume_analysis_loop()))
+            self._tasks.append(self.analysis_engine.start())
         except Exception as e:
             logger.error(f"❌ [Kafka Consumer] 启动失败: {str(e)}")
             raise e
 
     async def stop(self):
         """优雅停机"""
+        # 先停分区引擎：取消在途批次并提交已完成的位点，再关闭底层 consumer
+        if self.crawler_engine:
+            await self.crawler_engine.stop()
+        # 阶段 C 工作流耗时长，给在途分析一个排空窗口，超时未完成的交由重启后重新投递
+        if self.analysis_engine:
+            await self.analysis_engine.stop(drain_timeout=self.analysis_drain_timeout)
         for task in self._tasks:
             task.cancel()
         if self.crawler_consumer:
@@ -90,23 +151,12 @@ class KafkaConsumerManager:
             await self.analysis_consumer.stop()
         logger.info("🛑 [Kafka Consumer] 已安全关闭所有通道")
 
-    async def _consume_crawler_loop(self):
-        """持续消费死循环"""
-        try:
-            async for msg in self.crawler_consumer:
-                payload = msg.value
-                logger.info(f"📥 [Kafka Consumer A] 收到爬虫/下载批次: {payload.get('task_id')}")
-                await self._process_crawler_task(payload)
-        except asyncio.CancelledError:
-            logger.info("⚠️ [Kafka Consumer A] 接收到停机信号，退出消费循环")
-        except Exception as e:
-            logger.error(f"❌ [Kafka Consumer A] 消费循环发生致命错误: {str(e)}")
-
     async def _process_crawler_task(self, payload: dict):
         """
         核心调度与状态机维护逻辑 (支持批量与雪花算法 batch_id 透传)
         """
         # 1. 解析 Kafka 载荷 (与 task_service.py 的拼装逻辑严格对齐)
+        logger.info(f"📥 [Kafka Consumer A] 收到爬虫/下载批次: {payload.get('task_id')}")
         task_id = payload.get("task_id")  # 雪花算法生成的纯数字字符串 (作为 batch_id)
         platform_type = payload.get("platform_type", 3)
         resource_type = payload.get("resource_type")
@@ -114,63 +164,35 @@ class KafkaConsumerManager:
         if not target_ids:
             logger.warning(f"⚠️ [Task] 批次 {task_id} 没有有效的抓取目标(ids为空)，跳过。")
             return
-        # 独立申请 MySQL 事务连接
-        db = SessionLocal()
+        # 独立申请 MySQL 异步会话 (状态流转期间不阻塞同进程的其他分区与抓取协程)
+        db = AsyncSessionLocal()
+        lease_keeper = None
         try:
-            # 状态机步骤 1: 认领任务 (0 -> 1)
-            task_record = db.query(CrawlerTask).filter(CrawlerTask.task_id == task_id).first()
-            if not task_record or task_record.task_status != 0:
-                logger.warning(f"⚠️ [Task] 批次 {task_id} 不存在或已被处理，跳过。")
+            # 状态机步骤 1: 认领任务 (0 -> 1) 并写入执行租约
+            task_record = await self._claim_task(db, task_id)
+            if task_record is None:
                 return
-            task_record.task_status = 1
-            db.commit()
+            lease_keeper = asyncio.create_task(self._keep_lease(task_id))
             logger.info(f"🔄 [Task] 批次 {task_id} 状态 -> 1(执行中)，包含 {len(target_ids)} 个目标，开始装配链路...")
             # 状态机步骤 2: 装配组件并循环执行核心链路
             success_count = 0
             if platform_type == 3:  # 平台：B站
-                # 从异步全局连接池中安全“借用”一个连接
-                # 这样写保证了这批任务执行完毕后，连接会自动归还给连接池
-                async with ClickHouseManager.pool.connection() as ch_client:
-                    # 注入依赖 (传入异步连接)
-                    storage = StorageService(ch_client=ch_client)
-                    crawler_instance = BilibiliWebCrawler()
-                    task_service = BilibiliTaskService(crawler=crawler_instance, storage=storage)
-
-                    # 动态路由映射表 (Action Map)
-                    bilibili_action_map = {
-                        "scrape_and_store_video_comments": task_service.collect_and_store_video_comments,
-
-                        "scrape_and_store_user_info": task_service.collect_and_store_user_info,
-                        "scrape_and_store_user_relation": task_service.collect_and_store_user_relation,
-                        "scrape_and_store_video_info": task_service.collect_and_store_video_info,
-                        "scrape_and_store_user_videos": task_service.collect_and_store_user_videos,
-                        # 下载用户近30天的所有投稿视频，这里的下载方法执行完双写后，而是生产一条消息发给 Topic B
-                        "scrape_and_store_video_to_minio": task_service.collect_and_store_video_to_minio
-                    }
-                    # 获取对应的处理函数
-                    action_handler = bilibili_action_map.get(resource_type)
-
-                    if not action_handler:
-                        # 如果传了一个未知的 resource_type，直接报错退出
-                        raise ValueError(f"未知的 resource_type: {resource_type}，无法匹配底层处理函数")
-
-                    # 遍历处理目标
-                    for target_id in target_ids:
-                        try:
-                            logger.info(f"⏳ [Task:{task_id}] 动态执行动作 [{resource_type}], 目标ID: {target_id}...")
-
-                            # 动态调用：不论是评论还是画像，因为入参形式统一，直接调用 action_handler 即可！
-                            is_ok = await action_handler(target_id, task_id)
-                            if is_ok:
-                                success_count += 1
-                            else:
-                                logger.warning(f"⚠️ [Task:{task_id}] 目标 {target_id} 业务层返回采集失败。")
-                            # 强制加入休眠，防止触发高频封控
-                            await asyncio.sleep(1.5)
-
-                        except Exception as loop_e:
-                            logger.error(f"❌ [Task:{task_id}] 抓取目标 {target_id} 时发生异常: {str(loop_e)}")
-                            continue
+                # 获取对应的处理函数
+                action_handler = BILIBILI_ACTION_MAP.get(resource_type)
+
+                if not action_handler:
+                    # 如果传了一个未知的 resource_type，直接报错退出
+                    raise ValueError(f"未知的 resource_type: {resource_type}，无法匹配底层处理函数")
+
+                # 同一批次的目标共享一个爬虫实例 (底层复用长连接客户端池)
+                crawler_instance = BilibiliWebCrawler()
+                # 按资源维度取进程级并发闸门，批次内目标以有界 asyncio 任务并发执行
+                semaphore = self._get_resource_semaphore(resource_type)
+                results = await asyncio.gather(*(
+                    self._run_bilibili_target(semaphore, crawler_instance, action_handler, resource_type, target_id, task_id)
+                    for target_id in target_ids
+                ))
+                success_count = sum(1 for is_ok in results if is_ok)
 
             elif platform_type == 1:  # 预留：抖音平台
                 pass
@@ -183,29 +205,124 @@ class KafkaConsumerManager:
             if success_count > 0:
                 task_record.task_status = 2
                 task_record.error_msg = f"阶段A执行完毕: {success_count}/{len(target_ids)}"
-                db.commit()
+                await db.commit()
                 logger.info(f"🎉 [Task] 批次 {task_id} 执行结束，成功率 {success_count}/{len(target_ids)}，状态 -> 2(成功)")
             else:
                 task_record.task_status = 3
                 task_record.error_msg = f"该批次共 {len(target_ids)} 个目标全部采集失败"
-                db.commit()
+                await db.commit()
                 logger.warning(f"⚠️ [Task] 批次 {task_id} 全军覆没，状态 -> 3(失败)")
         except Exception as e:
             # 状态机步骤 4: 意外崩溃兜底回滚
-            db.rollback()
+            await db.rollback()
             error_stack = traceback.format_exc()
             logger.error(f"❌ [Task] 批次 {task_id} 发生未捕获的系统崩溃:\n{error_stack}")
             try:
-                task_record = db.query(CrawlerTask).filter(CrawlerTask.task_id == task_id).first()
+                task_record = await self._load_task(db, task_id)
                 if task_record:
                     task_record.task_status = 3
                     task_record.error_msg = str(e)[:500]
-                    db.commit()
+                    await db.commit()
             except Exception as inner_e:
-                logger.error(f"❌ [Task] 崩溃兜底更新 MySQL 失败: {inner_e}")
+                # 终态没能落库时向上抛出：分区引擎不推进位点并重试该消息，避免批次停留在 0/1 却再也收不到投递
+                logger.error(f"❌ [Task] 崩溃兜底更新 MySQL 失败，位点不提交: {inner_e}")
+                raise inner_e from e
         finally:
+            if lease_keeper:
+                lease_keeper.cancel()
             # 安全释放 MySQL 事务连接
-            db.close()
+            await db.close()
+
+    @staticmethod
+    async def _load_task(db: AsyncSession, task_id: str):
+        return (await db.execute(select(CrawlerTask).where(CrawlerTask.task_id == task_id))).scalars().first()
+
+    async def _claim_task(self, db: AsyncSession, task_id: str) -> Optional[CrawlerTask]:
+        """
+        在行锁 (SELECT ... FOR UPDATE) 下认领批次：
+        - 状态 0: 直接认领
+        - 状态 1 且租约未过期: 其他消费者 (如重平衡前的旧持有者) 仍在执行，释放行锁后等待其完成或租约过期，不重复执行
+        - 状态 1 且租约已过期或没有租约: 执行者已崩溃，接管执行
+        - 其他状态: 已处理完毕，跳过
+        :return: 认领成功的任务记录，无需执行时返回 None
+        """
+        while True:
+            now = datetime.now()
+            task_record = (await db.execute(
+                select(CrawlerTask).where(CrawlerTask.task_id == task_id)
+                .with_for_update().execution_options(populate_existing=True)
+            )).scalars().first()
+            if not task_record or task_record.task_status not in (0, 1):
+                await db.commit()
+                logger.warning(f"⚠️ [Task] 批次 {task_id} 不存在或已被处理，跳过。")
+                return None
+
+            lease_expire_time = task_record.lease_expire_time
+            if task_record.task_status == 1 and lease_expire_time and lease_expire_time > now:
+                owner = task_record.lease_owner
+                await db.commit()
+                wait = max(1.0, min(self.task_lease_poll, (lease_expire_time - now).total_seconds()))
+                logger.info(f"⏳ [Task] 批次 {task_id} 正由 {owner} 执行 (租约至 {lease_expire_time:%H:%M:%S})，{wait:.0f}s 后重新检查")
+                await asyncio.sleep(wait)
+                continue
+
+            if task_record.task_status == 1:
+                logger.warning(f"♻️ [Task] 批次 {task_id} 的执行者 {task_record.lease_owner} 租约已过期，重新接管执行")
+            task_record.task_status = 1
+            task_record.lease_owner = self._owner
+            task_record.lease_expire_time = now + timedelta(seconds=self.task_lease_seconds)
+            await db.commit()
+            return task_record
+
+    async def _keep_lease(self, task_id: str):
+        """执行期间定期续约；租约已被他人接管时停止续约"""
+        while True:
+            await asyncio.sleep(self.task_lease_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        update(CrawlerTask).where(
+                            CrawlerTask.task_id == task_id,
+                            CrawlerTask.task_status == 1,
+                            CrawlerTask.lease_owner == self._owner
+                        ).values(lease_expire_time=datetime.now() + timedelta(seconds=self.task_lease_seconds))
+                    )
+                    await db.commit()
+                if result.rowcount == 0:
+                    logger.warning(f"⚠️ [Task] 批次 {task_id} 的执行租约已不属于本进程，停止续约")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ [Task] 批次 {task_id} 续约失败 (下个周期重试): {e}")
+
+    def _get_resource_semaphore(self, resource_type: str) -> asyncio.Semaphore:
+        """获取资源维度的进程级并发闸门 (懒加载，上限见 resource_profiles)"""
+        semaphore = self._resource_semaphores.get(resource_type)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(get_resource_concurrency(resource_type))
+            self._resource_semaphores[resource_type] = semaphore
+        return semaphore
+
+    async def _run_bilibili_target(self, semaphore: asyncio.Semaphore, crawler: BilibiliWebCrawler, action_handler,
+                                   resource_type: str, target_id: str, task_id: str) -> bool:
+        """
+        执行批次内的单个目标：每个目标独立从 ClickHouse 连接池借用连接，互不阻塞
+        """
+        async with semaphore:
+            try:
+                logger.info(f"⏳ [Task:{task_id}] 动态执行动作 [{resource_type}], 目标ID: {target_id}...")
+                # 从异步全局连接池中安全“借用”一个连接，目标执行完毕后自动归还
+                async with ClickHouseManager.pool.connection() as ch_client:
+                    # 注入依赖 (传入异步连接)
+                    storage = StorageService(ch_client=ch_client)
+                    task_service = BilibiliTaskService(crawler=crawler, storage=storage)
+                    # 动态调用：不论是评论还是画像，因为入参形式统一，直接调用 action_handler 即可！
+                    is_ok = await action_handler(task_service, target_id, task_id)
+                if not is_ok:
+                    logger.warning(f"⚠️ [Task:{task_id}] 目标 {target_id} 业务层返回采集失败。")
+                return bool(is_ok)
+            except Exception as loop_e:
+                logger.error(f"❌ [Task:{task_id}] 抓取目标 {target_id} 时发生异常: {str(loop_e)}")
+                return False
 
     async def _consume_asr_loop(self):
         try:
@@ -249,26 +366,11 @@ class KafkaConsumerManager:
         except Exception as e:
             logger.error(f"❌ [阶段 B] 执行 ASR 任务发生崩溃: {e}")
 
-    async def _consume_analysis_loop(self):
-        """阶段 C 的持续消费死循环"""
-        try:
-            async for msg in self.analysis_consumer:
-                payload = msg.value
-                logger.info(f"📥 [Kafka Consumer C] 收到 AI 多模态分析任务: {payload.get('bvid')}")
-
-                # 🚨 极度关键：使用 create_task 后台运行！
-                # 因为阶段 C 耗时极长，绝对不能在这里 await 阻塞 Kafka 消费者接收心跳！
-                asyncio.create_task(self._process_analysis_task(payload))
-
-        except asyncio.CancelledError:
-            logger.info("⚠️ [Kafka Consumer C] 接收到停机信号，退出消费循环")
-        except Exception as e:
-            logger.error(f"❌ [Kafka Consumer C] 消费循环发生致命错误: {str(e)}")
-
     async def _process_analysis_task(self, payload: dict):
         """
         专门处理长耗时的多模态 AI 分析调用
         """
+        logger.info(f"📥 [Kafka Consumer C] 收到 AI 多模态分析任务: {payload.get('bvid')}")
         batch_id = payload.get("batch_id", "unknown_batch")
         bvid = payload.get("bvid")
         cid = payload.get("cid")
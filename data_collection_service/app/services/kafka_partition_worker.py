@@ -0,0 +1,247 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener
+from aiokafka.structs import TopicPartition
+
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class _PartitionState:
+    """单个分区的在途消息追踪"""
+
+    def __init__(self):
+        # 按到达顺序排列的待确认 offset (同一分区内 offset 单调递增)
+        self.offsets: deque[int] = deque()
+        # 已处理完成、但前面还有未完成消息而暂不能提交的 offset
+        self.done: set[int] = set()
+        # offset -> 处理协程
+        self.tasks: dict[int, asyncio.Task] = {}
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, engine: "PartitionedConsumerEngine"):
+        self.engine = engine
+
+    async def on_partitions_revoked(self, revoked):
+        await self.engine.on_partitions_revoked(revoked)
+
+    async def on_partitions_assigned(self, assigned):
+        pass
+
+
+class PartitionedConsumerEngine:
+    """
+    Kafka 分区并发消费引擎 (手动提交位点)
+    职责:
+    1. 不同分区的消息并发处理，单分区在途消息数受窗口限制，一条慢消息不会堵死整个 Topic
+    2. 关闭自动提交：只有当某个 offset 之前的消息全部处理完毕 (handler 返回) 才提交该位点，崩溃后从未完成处重放
+    2.1 handler 抛出异常表示结果未能落地 (如状态机写库失败)：该消息不标记完成，原地按指数退避重试，
+        期间占用分区窗口 (窗口占满即暂停该分区)，位点不会越过它；分区被收回时放弃重试，交由新持有者重新投递
+    3. 背压：单分区或全局在途数超限时 pause 对应分区，回落后 resume，期间持续 poll 保持组成员心跳
+    3.1 重平衡收回分区时：先停止接收这些分区的新消息，在 revoke_drain_timeout 内等待其在途消息完成并提交位点，
+        再交出分区；超时仍未完成的消息继续在本地跑完 (不再提交位点)，由业务侧的执行租约防止新持有者重复执行
+    4. 可选工作池：设置 max_concurrency 后，在途消息中最多 max_concurrency 条同时执行，其余在内存中排队，
+       排队 + 执行总数达到 max_in_flight_total (高水位) 时暂停拉取
+    """
+
+    def __init__(
+            self,
+            consumer: AIOKafkaConsumer,
+            handler: Callable[[dict], Awaitable[None]],
+            name: str,
+            max_in_flight_per_partition: int = 2,
+            max_in_flight_total: int = 8,
+            fetch_timeout_ms: int = 1000,
+            max_concurrency: Optional[int] = None,
+            revoke_drain_timeout: float = 20,
+            retry_backoff: float = 1.0,
+            retry_backoff_max: float = 60.0,
+    ):
+        self.consumer = consumer
+        self.handler = handler
+        self.name = name
+        self.max_in_flight_per_partition = max_in_flight_per_partition
+        self.max_in_flight_total = max_in_flight_total
+        self.fetch_timeout_ms = fetch_timeout_ms
+        # 排空时长需小于 max_poll_interval_ms，否则本消费者会在重平衡中被踢出消费组
+        self.revoke_drain_timeout = revoke_drain_timeout
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._workers = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        self.listener = _RebalanceListener(self)
+        self._partitions: dict[TopicPartition, _PartitionState] = {}
+        self._pending_commits: dict[TopicPartition, int] = {}
+        # 正在被重平衡收回的分区：不再派发新消息
+        self._revoking: set[TopicPartition] = set()
+        self._in_flight = 0
+        self._run_task: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> asyncio.Task:
+        """在后台启动拉取循环 (consumer 需已 subscribe(listener=self.listener) 并 start)"""
+        self._run_task = asyncio.create_task(self._run())
+        return self._run_task
+
+    async def stop(self, drain_timeout: float = 0):
+        """
+        停止拉取并结束在途消息
+        :param drain_timeout: 优雅排空等待秒数，超时仍未完成的消息被取消 (未提交的位点会在重启或重平衡后重新投递)
+        """
+        await self._stop_fetching()
+        tasks = [t for state in self._partitions.values() for t in state.tasks.values()]
+        if tasks and drain_timeout > 0:
+            logger.info(f"⏳ [{self.name}] 等待 {len(tasks)} 条在途消息排空 (最长 {drain_timeout}s)...")
+            _, tasks = await asyncio.wait(tasks, timeout=drain_timeout)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            logger.warning(f"⚠️ [{self.name}] {len(tasks)} 条消息未在排空时限内完成，已取消，重启后将重新投递")
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self._commit_pending()
+
+    async def _stop_fetching(self):
+        if self._run_task:
+            self._run_task.cancel()
+            await asyncio.gather(self._run_task, return_exceptions=True)
+            self._run_task = None
+
+    async def _run(self):
+        try:
+            while True:
+                batches = await self.consumer.getmany(
+                    timeout_ms=self.fetch_timeout_ms,
+                    max_records=max(1, self.max_in_flight_total - self._in_flight)
+                )
+                for tp, records in batches.items():
+                    if tp in self._revoking:
+                        continue
+                    for record in records:
+                        if not self._has_capacity(tp):
+                            # 超出窗口的消息不在本地囤积，回退拉取位置，等窗口空出后重新拉取
+                            self.consumer.seek(tp, record.offset)
+                            break
+                        self._dispatch(tp, record)
+                self._apply_backpressure()
+                await self._commit_pending()
+        except asyncio.CancelledError:
+            logger.info(f"⚠️ [{self.name}] 接收到停机信号，退出消费循环")
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 消费循环发生致命错误: {str(e)}")
+
+    def _has_capacity(self, tp: TopicPartition) -> bool:
+        if self._in_flight >= self.max_in_flight_total:
+            return False
+        state = self._partitions.get(tp)
+        return state is None or len(state.tasks) < self.max_in_flight_per_partition
+
+    def _dispatch(self, tp: TopicPartition, record):
+        state = self._partitions.setdefault(tp, _PartitionState())
+        state.offsets.append(record.offset)
+        state.tasks[record.offset] = asyncio.create_task(self._handle(tp, state, record))
+        self._in_flight += 1
+
+    async def _handle(self, tp: TopicPartition, state: _PartitionState, record):
+        # 被取消或放弃重试的消息不标记完成，位点停留在它之前，重启或重平衡后会被重新投递
+        done = False
+        try:
+            done = await self._handle_with_retry(tp, state, record)
+        finally:
+            self._in_flight -= 1
+            state.tasks.pop(record.offset, None)
+            if done:
+                self._mark_done(tp, state, record.offset)
+            self._apply_backpressure()
+
+    async def _handle_with_retry(self, tp: TopicPartition, state: _PartitionState, record) -> bool:
+        """执行 handler，失败时原地退避重试；返回 False 表示分区已被收回、放弃重试"""
+        attempts = 0
+        while True:
+            try:
+                if self._workers:
+                    async with self._workers:
+                        await self.handler(record.value)
+                else:
+                    await self.handler(record.value)
+                return True
+            except Exception as e:
+                attempts += 1
+                delay = min(self.retry_backoff_max, self.retry_backoff * (2 ** (attempts - 1)))
+                logger.error(
+                    f"❌ [{self.name}] 处理 {tp.topic}-{tp.partition}@{record.offset} 失败 (第 {attempts} 次)，"
+                    f"位点暂不推进，{delay:.1f}s 后重试: {e}"
+                )
+            await asyncio.sleep(delay)
+            if tp in self._revoking or self._partitions.get(tp) is not state:
+                logger.warning(f"⚠️ [{self.name}] {tp.topic}-{tp.partition} 已被收回，放弃重试 @{record.offset}，由新持有者重新投递")
+                return False
+
+    def _mark_done(self, tp: TopicPartition, state: _PartitionState, offset: int):
+        """推进该分区连续已完成的位点"""
+        state.done.add(offset)
+        commit_offset = None
+        while state.offsets and state.offsets[0] in state.done:
+            done_offset = state.offsets.popleft()
+            state.done.discard(done_offset)
+            commit_offset = done_offset + 1
+        # 分区已被重平衡收回时不再提交，避免覆盖新持有者的位点
+        if commit_offset is not None and self._partitions.get(tp) is state:
+            self._pending_commits[tp] = commit_offset
+
+    async def _commit_pending(self):
+        if not self._pending_commits:
+            return
+        offsets, self._pending_commits = self._pending_commits, {}
+        try:
+            await self.consumer.commit(offsets)
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 手动提交位点失败 (消息将被重新投递): {e}")
+
+    def _apply_backpressure(self):
+        """根据在途数计算应暂停的分区集合，并与当前暂停状态对齐"""
+        try:
+            assigned = self.consumer.assignment()
+            should_pause = {tp for tp in assigned if not self._has_capacity(tp)}
+            paused = self.consumer.paused()
+            to_pause = should_pause - paused
+            to_resume = paused - should_pause
+            if to_pause:
+                self.consumer.pause(*to_pause)
+            if to_resume:
+                self.consumer.resume(*to_resume)
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 背压调整异常: {e}")
+
+    async def on_partitions_revoked(self, revoked):
+        """
+        重平衡收回分区前：停止接收新消息 -> 有限时间内等待在途消息完成 -> 提交已完成的位点 -> 丢弃追踪状态
+        """
+        revoked = set(revoked)
+        self._revoking |= revoked
+        try:
+            try:
+                paused = revoked & self.consumer.assignment()
+                if paused:
+                    self.consumer.pause(*paused)
+            except Exception as e:
+                logger.warning(f"⚠️ [{self.name}] 暂停被收回分区失败: {e}")
+
+            tasks = [t for tp in revoked if tp in self._partitions for t in self._partitions[tp].tasks.values()]
+            if tasks and self.revoke_drain_timeout > 0:
+                logger.info(f"⏳ [{self.name}] 分区被收回，等待 {len(tasks)} 条在途消息完成 (最长 {self.revoke_drain_timeout}s)...")
+                _, pending = await asyncio.wait(tasks, timeout=self.revoke_drain_timeout)
+                if pending:
+                    logger.warning(
+                        f"⚠️ [{self.name}] {len(pending)} 条消息未在时限内完成，继续在本地执行但不再提交位点，"
+                        f"新持有者会在其执行租约过期后才接管"
+                    )
+            await self._commit_pending()
+            for tp in revoked:
+                self._partitions.pop(tp, None)
+        finally:
+            self._revoking -= revoked
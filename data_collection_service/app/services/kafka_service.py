@@ -1,22 +1,89 @@
 import os
-import json
+import asyncio
+from collections import deque
+from typing import Optional
+
 from aiokafka import AIOKafkaProducer
+from aiokafka import codec as kafka_codec
+from aiokafka.errors import KafkaError, KafkaTimeoutError
 from dotenv import load_dotenv
 
 # 导入项目中标准的日志记录器
 from data_collection_service.crawlers.utils.logger import logger
+from data_collection_service.crawlers.utils import json_codec
 
 load_dotenv()
 
+# 压缩算法 -> 对应编解码库是否可用 (zstd/lz4/snappy 依赖可选的第三方库，gzip 为标准库)
+_COMPRESSION_CODECS = {
+    "zstd": kafka_codec.has_zstd,
+    "lz4": kafka_codec.has_lz4,
+    "snappy": kafka_codec.has_snappy,
+    "gzip": kafka_codec.has_gzip,
+}
+
+
+def _resolve_compression_type(requested: str) -> Optional[str]:
+    """
+    KAFKA_COMPRESSION_TYPE 支持逗号分隔的优先级列表 (如 "zstd,lz4,gzip")，取第一个编解码库已安装的算法
+    全部不可用时退化为 gzip；配置为空或 none 时不压缩
+    """
+    candidates = [c.strip().lower() for c in (requested or "").split(",") if c.strip()]
+    if not candidates or candidates == ["none"]:
+        return None
+    for codec in candidates:
+        has_codec = _COMPRESSION_CODECS.get(codec)
+        if has_codec and has_codec():
+            return codec
+        logger.warning(f"⚠️ [Kafka] 压缩算法 {codec} 不可用 (未安装对应编解码库)，尝试下一个")
+    return "gzip"
+
+
+def _is_retriable(exc: BaseException) -> bool:
+    """Broker 抖动类错误 (断连/Leader 切换/请求或缓冲区超时) 可重试；序列化错误、消息过大等直接失败"""
+    return isinstance(exc, KafkaTimeoutError) or (isinstance(exc, KafkaError) and exc.retriable)
+
+
+class _SpooledRecord:
+    """一条待投递消息及其投递 Future，投递失败时暂存在重试缓冲区中"""
+    __slots__ = ("topic", "message", "key", "delivery", "attempts")
+
+    def __init__(self, topic: str, message: dict, key: Optional[str], delivery: asyncio.Future):
+        self.topic = topic
+        self.message = message
+        self.key = key
+        self.delivery = delivery
+        self.attempts = 0
+
+
 class KafkaProducerManager:
     """
     Kafka 异步生产者管理器
     负责维持与 Kafka 集群的长连接，并提供极速的异步消息投递能力
+    1. send(): 只把消息放入生产者缓冲即返回投递 Future，由 linger + 压缩合批发送，调用方无需逐条等待 Broker 回执
+    2. 按 key (如 bvid) 分区，同一视频的消息落在同一分区，保证分区内有序
+    3. 可重试的投递失败进入内存重试缓冲区 (有界)，由后台协程退避重投，覆盖 Broker 短暂不可用；
+       缓冲区满或超过重试次数时 Future 以异常结束并记录日志
+    投递语义为至少一次 (at-least-once)：幂等生产者只对 Producer 内部的重试去重，
+    重试缓冲区的重投是一次新的 send()，若首次投递实际已写入 Broker 只是回执丢失，就会产生重复消息，消费端需按 key/业务 ID 幂等处理
     """
     def __init__(self):
         # 从环境变量获取 Kafka Broker 地址，默认适配 docker-compose 里的配置
         self.bootstrap_servers = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "127.0.0.1:9092")
+        # 攒批：消息最多等待 linger_ms 与同分区的其他消息合并成一个请求，单批上限 max_batch_size 字节
+        self.linger_ms = int(os.getenv("KAFKA_LINGER_MS", 20))
+        self.max_batch_size = int(os.getenv("KAFKA_MAX_BATCH_SIZE", 65536))
+        self.compression_type = _resolve_compression_type(os.getenv("KAFKA_COMPRESSION_TYPE", "zstd,lz4,gzip"))
+        # 幂等生产者：Broker 按 (producer_id, 序列号) 去重，重试不会产生重复消息 (要求 acks=all)
+        self.enable_idempotence = os.getenv("KAFKA_ENABLE_IDEMPOTENCE", "True").lower() in ("true", "1", "t")
+        # 内存重试缓冲区
+        self.spool_size = int(os.getenv("KAFKA_RETRY_SPOOL_SIZE", 10000))
+        self.spool_max_attempts = int(os.getenv("KAFKA_RETRY_MAX_ATTEMPTS", 5))
+        self.spool_backoff = float(os.getenv("KAFKA_RETRY_BACKOFF", 1.0))
         self.producer = None
+        self._spool: deque[_SpooledRecord] = deque()
+        self._spool_event = asyncio.Event()
+        self._spool_task: Optional[asyncio.Task] = None
 
     async def start(self):
         """
@@ -27,12 +94,21 @@ class KafkaProducerManager:
             # value_serializer: 自动将 Python 字典序列化为 UTF-8 编码的 JSON 字节流
             self.producer = AIOKafkaProducer(
                 bootstrap_servers=self.bootstrap_servers,
-                value_serializer=lambda v: json.dumps(v, ensure_ascii=False).encode('utf-8'),
-                # acks=1 代表只要 Leader 写入成功就返回，兼顾高吞吐与安全性
-                acks=1
+                value_serializer=json_codec.dumps_bytes,
+                key_serializer=lambda key: key.encode("utf-8") if isinstance(key, str) else key,
+                # 幂等模式必须 acks=all；否则 acks=1 代表只要 Leader 写入成功就返回，兼顾高吞吐与安全性
+                acks="all" if self.enable_idempotence else 1,
+                enable_idempotence=self.enable_idempotence,
+                linger_ms=self.linger_ms,
+                max_batch_size=self.max_batch_size,
+                compression_type=self.compression_type
             )
             await self.producer.start()
-            logger.info(f"🚀 [Kafka] Producer 已成功连接到集群: {self.bootstrap_servers}")
+            self._spool_task = asyncio.create_task(self._spool_loop())
+            logger.info(
+                f"🚀 [Kafka] Producer 已成功连接到集群: {self.bootstrap_servers} "
+                f"(压缩: {self.compression_type}, 幂等: {self.enable_idempotence}, linger: {self.linger_ms}ms)"
+            )
         except Exception as e:
             logger.error(f"❌ [Kafka] Producer 启动失败: {str(e)}")
             raise e
@@ -41,22 +117,111 @@ class KafkaProducerManager:
         """
         优雅关闭 Producer，确保缓存在内存中的消息被 flush 到 Broker
         """
+        if self._spool_task:
+            self._spool_task.cancel()
+            try:
+                await self._spool_task
+            except asyncio.CancelledError:
+                pass
+            self._spool_task = None
         if self.producer:
+            # 关闭前对重试缓冲区中的消息做最后一次投递
+            await self._retry_spooled()
+            await self.producer.flush()
             await self.producer.stop()
+            for record in self._spool:
+                self._fail(record, RuntimeError("Producer 已关闭"))
+            self._spool.clear()
             logger.info("🛑 [Kafka] Producer 已安全关闭，内存消息已 Flush")
 
-    async def send_task_message(self, topic: str, message: dict):
-        """
-        通用异步消息发送方法
-        """
+    def _ensure_started(self):
         if not self.producer:
             error_msg = "[Kafka] Producer 尚未初始化，无法发送消息！"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
 
+    async def send(self, topic: str, message: dict, key: Optional[str] = None) -> asyncio.Future:
+        """
+        非阻塞投递：消息放入生产者缓冲后立即返回投递 Future (结果为 RecordMetadata)
+        调用方可以 await 该 Future 确认投递，也可以不等待 (失败会自动进入重试缓冲区并记录日志)
+        :param key: 分区键 (如 bvid)，同一 key 的消息进入同一分区
+        """
+        self._ensure_started()
+        delivery = asyncio.get_running_loop().create_future()
+        await self._enqueue(_SpooledRecord(topic, message, key, delivery))
+        return delivery
+
+    async def _enqueue(self, record: _SpooledRecord):
+        try:
+            ack = await self.producer.send(record.topic, record.message, key=record.key)
+        except Exception as e:
+            # 缓冲区等待超时 / 序列化失败等在入队阶段就抛出的异常
+            self._spool_or_fail(record, e)
+            return
+        ack.add_done_callback(lambda f: self._on_ack(record, f))
+
+    def _on_ack(self, record: _SpooledRecord, ack: asyncio.Future):
+        if record.delivery.done():
+            return
+        if ack.cancelled():
+            self._spool_or_fail(record, KafkaTimeoutError("投递被取消"))
+            return
+        exc = ack.exception()
+        if exc is None:
+            record.delivery.set_result(ack.result())
+        else:
+            self._spool_or_fail(record, exc)
+
+    def _spool_or_fail(self, record: _SpooledRecord, exc: BaseException):
+        record.attempts += 1
+        if not _is_retriable(exc) or record.attempts > self.spool_max_attempts:
+            self._fail(record, exc)
+            return
+        if len(self._spool) >= self.spool_size:
+            self._fail(record, exc, reason="重试缓冲区已满")
+            return
+        self._spool.append(record)
+        self._spool_event.set()
+
+    @staticmethod
+    def _fail(record: _SpooledRecord, exc: BaseException, reason: str = "投递失败"):
+        logger.error(
+            f"❌ [Kafka] 消息发送至 {record.topic} {reason} (已尝试 {record.attempts} 次): {str(exc)}, "
+            f"Key: {record.key}, 载荷: {record.message}"
+        )
+        if not record.delivery.done():
+            record.delivery.set_exception(exc)
+            # 错误已记录日志，标记为已读取，避免不等待 Future 的调用方触发 "exception was never retrieved" 告警
+            record.delivery.exception()
+
+    async def _retry_spooled(self):
+        records = list(self._spool)
+        self._spool.clear()
+        for record in records:
+            await self._enqueue(record)
+
+    async def _spool_loop(self):
+        """后台协程：重试缓冲区非空时按失败次数指数退避后整体重投"""
+        while True:
+            await self._spool_event.wait()
+            self._spool_event.clear()
+            if not self._spool:
+                continue
+            attempts = max(record.attempts for record in self._spool)
+            delay = min(30.0, self.spool_backoff * (2 ** (attempts - 1)))
+            logger.warning(f"⚠️ [Kafka] {len(self._spool)} 条消息投递失败，{delay:.1f}s 后重投")
+            await asyncio.sleep(delay)
+            await self._retry_spooled()
+
+    async def send_task_message(self, topic: str, message: dict, key: Optional[str] = None):
+        """
+        通用异步消息发送方法 (同步等待回执)
+        """
+        self._ensure_started()
+
         try:
             # send_and_wait() 会等待 Broker 的 ACK 回执，确保消息不丢失
-            record_metadata = await self.producer.send_and_wait(topic, message)
+            record_metadata = await self.producer.send_and_wait(topic, message, key=key)
             logger.info(
                 f"✉️ [Kafka] 消息投递成功 -> Topic: {topic}, "
                 f"Partition: {record_metadata.partition}, "
@@ -67,5 +232,38 @@ class KafkaProducerManager:
             logger.error(f"❌ [Kafka] 消息发送至 {topic} 失败: {str(e)}, 载荷: {message}")
             raise e
 
+    async def send_many(self, records: list[tuple[str, dict, Optional[str]]], return_exceptions: bool = False) -> list:
+        """
+        批量投递：先把全部消息放入生产者的发送缓冲 (不逐条等待 ACK)，由 linger + 压缩合批发送，最后统一等待回执
+        不经过内存重试缓冲区，由调用方的持久化状态负责重投
+        :param records: [(topic, message, key), ...]
+        :param return_exceptions: False 时任意一条失败即抛出异常；True 时不抛出，
+                                  按 records 顺序返回每条消息的结果 (RecordMetadata 或异常)，供调用方逐条处理
+        """
+        self._ensure_started()
+
+        if not return_exceptions:
+            futures = []
+            try:
+                for topic, message, key in records:
+                    futures.append(await self.producer.send(topic, message, key=key))
+            except Exception:
+                # 中途入队失败：先等待已入队消息的回执落定 (避免 Future 异常无人读取)，再把入队异常抛给调用方
+                await asyncio.gather(*futures, return_exceptions=True)
+                raise
+            return await asyncio.gather(*futures)
+
+        outcomes: list = [None] * len(records)
+        futures: dict[int, asyncio.Future] = {}
+        for i, (topic, message, key) in enumerate(records):
+            try:
+                futures[i] = await self.producer.send(topic, message, key=key)
+            except Exception as e:
+                # 入队失败 (如序列化失败、缓冲区已满) 只影响当前这一条
+                outcomes[i] = e
+        for i, result in zip(futures, await asyncio.gather(*futures.values(), return_exceptions=True)):
+            outcomes[i] = result
+        return outcomes
+
 # 导出单例对象
 kafka_producer = KafkaProducerManager()
\ No newline at end of file
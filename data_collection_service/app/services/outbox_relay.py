@@ -0,0 +1,213 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, or_
+
+from data_collection_service.app.db.async_session import AsyncSessionLocal
+from data_collection_service.app.db.models import TaskOutbox
+from data_collection_service.app.services.kafka_service import kafka_producer
+from data_collection_service.crawlers.utils.logger import logger
+
+
+class OutboxRelay:
+    """
+    发件箱中继：把 task_outbox 中待投递的消息批量发送到 Kafka 并标记为已投递
+    职责:
+    1. 任务创建只需一次本地事务提交 (CrawlerTask + TaskOutbox)，不再在事务内等待 Broker 回执
+    2. 按 id 顺序用短事务认领一批消息 (SKIP LOCKED，标记为投递中并写入租约)，多副本同时运行时同一条消息只会由一个副本投递
+    3. 在事务之外一次性放入生产者缓冲，由 linger + 压缩合批发送；回执逐条处理，成功的标记为已投递，
+       失败的按指数退避重试，达到最大次数后转为死信 (status=3)，单条坏消息不会拖住整批
+    4. 投递语义为至少一次：标记前崩溃会在租约到期后重发，消费端按任务状态机幂等处理
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+        self.poll_interval = float(os.getenv("OUTBOX_POLL_INTERVAL", 0.5))
+        self.max_backoff = float(os.getenv("OUTBOX_MAX_BACKOFF", 30))
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 20))
+        # 投递中租约：需大于生产者等待回执的上限 (request_timeout_ms，默认 40s)
+        self.lease_seconds = int(os.getenv("OUTBOX_LEASE_SECONDS", 120))
+        self.retention_hours = int(os.getenv("OUTBOX_RETENTION_HOURS", 72))
+        self.cleanup_interval = int(os.getenv("OUTBOX_CLEANUP_INTERVAL", 3600))
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._last_cleanup_at = float("-inf")
+
+    def notify(self):
+        """本进程写入发件箱并提交后调用，唤醒中继立即投递，无需等到下一次轮询"""
+        self._wakeup.set()
+
+    async def start(self):
+        self._running = True
+        self._task = asyncio.create_task(self._relay_loop())
+        logger.info(" [OutboxRelay] 发件箱中继已启动...")
+
+    async def stop(self):
+        """停止轮询，并在退出前尽力把剩余的待投递消息发完"""
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            try:
+                while await self._relay_once() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f" [OutboxRelay] 停机前投递剩余消息失败 (下次启动后继续投递): {str(e)}")
+            logger.info(" [OutboxRelay] 发件箱中继已关闭。")
+
+    async def _relay_loop(self):
+        failures = 0
+        while self._running:
+            self._wakeup.clear()
+            try:
+                relayed = await self._relay_once()
+                failures = 0
+                if time.monotonic() - self._last_cleanup_at >= self.cleanup_interval:
+                    self._last_cleanup_at = time.monotonic()
+                    await self._cleanup()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                failures += 1
+                delay = min(self.max_backoff, self.poll_interval * (2 ** failures))
+                logger.error(f" [OutboxRelay] 投递失败，{delay:.1f}s 后重试: {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+
+            # 拉满一整批说明还有积压，立即继续；否则等待唤醒或轮询超时
+            if relayed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _relay_once(self) -> int:
+        """
+        投递一批待发送消息：短事务认领 -> 事务外发送 -> 逐条标记结果
+        :return: 本批认领的消息数
+        """
+        rows = await self._claim_batch()
+        if not rows:
+            return 0
+
+        outcomes = await kafka_producer.send_many(
+            [(row.topic, row.payload, row.message_key) for row in rows], return_exceptions=True
+        )
+        sent_ids = [row.id for row, outcome in zip(rows, outcomes) if not isinstance(outcome, BaseException)]
+        failed = [(row, outcome) for row, outcome in zip(rows, outcomes) if isinstance(outcome, BaseException)]
+
+        # 标记失败时消息仍处于投递中，租约到期后会被重新认领并重发 (至少一次)
+        await self._mark_sent(sent_ids)
+        if failed:
+            await self._record_failures(failed)
+        if sent_ids:
+            logger.info(f"✉️ [OutboxRelay] 已批量投递 {len(sent_ids)} 条任务消息")
+        return len(rows)
+
+    async def _claim_batch(self) -> list:
+        """
+        短事务认领一批消息：SKIP LOCKED 选出待投递 (或租约已过期的投递中) 消息，标记为投递中并写入租约后立即提交
+        等待 Kafka 回执期间不持有任何行锁；中继在发送途中崩溃时，消息在租约到期后由任一副本重新认领
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                now = datetime.now()
+                rows = (await db.execute(
+                    select(TaskOutbox.id, TaskOutbox.topic, TaskOutbox.message_key, TaskOutbox.payload,
+                           TaskOutbox.attempts).where(
+                        TaskOutbox.status.in_((0, 2)),
+                        or_(TaskOutbox.lease_expire_time.is_(None), TaskOutbox.lease_expire_time <= now)
+                    ).order_by(TaskOutbox.id).limit(self.batch_size).with_for_update(skip_locked=True)
+                )).all()
+                if rows:
+                    await db.execute(
+                        update(TaskOutbox).where(TaskOutbox.id.in_([row.id for row in rows])).values(
+                            {TaskOutbox.status: 2,
+                             TaskOutbox.lease_expire_time: now + timedelta(seconds=self.lease_seconds)}
+                        ).execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+                return rows
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def _mark_sent(ids: list[int]):
+        if not ids:
+            return
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(
+                    update(TaskOutbox).where(TaskOutbox.id.in_(ids), TaskOutbox.status == 2).values(
+                        {TaskOutbox.status: 1, TaskOutbox.sent_time: datetime.now(), TaskOutbox.lease_expire_time: None}
+                    ).execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.error(f" [OutboxRelay] 标记已投递失败，{len(ids)} 条消息将在租约到期后重发: {str(e)}")
+
+    async def _record_failures(self, failed: list):
+        """
+        逐条记录投递失败：未超过最大次数的按指数退避回到待投递 (退避期间不会被认领)，
+        达到 OUTBOX_MAX_ATTEMPTS 的置为投递失败 (死信，需人工排查后重置 status=0 重投)
+        """
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            try:
+                for row, error in failed:
+                    attempts = (row.attempts or 0) + 1
+                    if attempts >= self.max_attempts:
+                        values = {TaskOutbox.status: 3, TaskOutbox.lease_expire_time: None}
+                        logger.error(
+                            f"❌ [OutboxRelay] 消息 {row.id} (Topic: {row.topic}, Key: {row.message_key}) "
+                            f"已失败 {attempts} 次，转为死信: {str(error)}"
+                        )
+                    else:
+                        backoff = min(self.max_backoff, self.poll_interval * (2 ** attempts))
+                        values = {TaskOutbox.status: 0, TaskOutbox.lease_expire_time: now + timedelta(seconds=backoff)}
+                        logger.warning(
+                            f" [OutboxRelay] 消息 {row.id} 第 {attempts} 次投递失败，{backoff:.1f}s 后重试: {str(error)}"
+                        )
+                    values[TaskOutbox.attempts] = attempts
+                    values[TaskOutbox.last_error] = str(error)[:500]
+                    await db.execute(
+                        update(TaskOutbox).where(TaskOutbox.id == row.id, TaskOutbox.status == 2).values(values)
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f" [OutboxRelay] 记录投递失败次数失败 (租约到期后重发): {str(e)}")
+
+    async def _cleanup(self):
+        """清理保留期之外的已投递消息，分段删除避免长事务"""
+        async with AsyncSessionLocal() as db:
+            try:
+                expire_before = datetime.now() - timedelta(hours=self.retention_hours)
+                while True:
+                    ids = (await db.execute(select(TaskOutbox.id).where(
+                        TaskOutbox.status == 1,
+                        TaskOutbox.sent_time < expire_before
+                    ).limit(5000))).scalars().all()
+                    if not ids:
+                        break
+                    await db.execute(
+                        delete(TaskOutbox).where(TaskOutbox.id.in_(ids)).execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f" [OutboxRelay] 清理已投递消息失败: {str(e)}")
+
+
+# 导出单例，交由 main.py 管理其生命周期
+outbox_relay = OutboxRelay()
@@ -94,6 +94,30 @@ class QueryService:
             logger.error(f"[ClickHouse] 读取视频数据失败 BV={video_id}: {str(e)}")
             raise e
 
+    async def get_video_snapshot_history(self, bvids: list[str], since_batch_id: int) -> list[Dict[str, Any]]:
+        """
+        查询视频最近两次详情快照的核心指标，供自适应调度计算变化速率
+        返回: [{'bvid', 'pubdate_ts', 'snaps': [(batch_id, views_count, replys_count), ...] (新 -> 旧, 最多 2 个)}]
+        """
+        if not bvids:
+            return []
+        query = """
+            SELECT
+                bvid,
+                max(pubdate_ts) AS pubdate_ts,
+                arraySlice(arrayReverseSort(x -> x.1, groupArray((batch_id, views_count, replys_count))), 1, 2) AS snaps
+            FROM ods.bilibili_video_info
+            WHERE bvid IN %(bvids)s AND batch_id >= %(since_batch_id)s
+            GROUP BY bvid
+        """
+        try:
+            async with self.ch.cursor(cursor=DictCursor) as cursor:
+                await cursor.execute(query, {"bvids": tuple(bvids), "since_batch_id": since_batch_id})
+                return await cursor.fetchall() or []
+        except Exception as e:
+            logger.error(f"[ClickHouse] 读取视频快照历史失败: {str(e)}")
+            raise e
+
     @classmethod
     def _parse_kol_data(self, raw: dict) -> Dict[str, Any]:
         """数据清洗：格式化红人基础信息"""
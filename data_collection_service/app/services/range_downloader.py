@@ -0,0 +1,256 @@
+import os
+import asyncio
+from typing import Optional
+
+import httpx
+import aiofiles
+from fastapi import Request
+
+from data_collection_service.crawlers.utils.logger import logger
+
+_DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+class ClientDisconnected(Exception):
+    """发起下载的 HTTP 请求方已断开，终止下载"""
+
+
+class _Segment:
+    """文件中的一个字节区间 [start, end] (闭区间) 及已写入的字节数，失败后从 start + written 处续传"""
+    __slots__ = ("start", "end", "written")
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+        self.written = 0
+
+    @property
+    def offset(self) -> int:
+        return self.start + self.written
+
+    @property
+    def remaining(self) -> int:
+        return self.end + 1 - self.offset
+
+
+class SegmentedDownloader:
+    """
+    多连接分段下载器 (HTTP Range)
+    职责:
+    1. 先用 Range: bytes=0-0 探测文件总长度与是否支持分段，按 DOWNLOAD_SEGMENT_SIZE 切片后由 DOWNLOAD_CONCURRENCY 个连接并行拉取
+    2. 目标文件按总长度预分配，各分段按偏移量 pwrite 写入，互不等待
+    3. 分段失败时从已写入的位置续传 (只补缺失的字节)，每次重试轮换到下一个镜像地址 (B站 dash 的 backupUrl)，单个慢节点不会拖住整个下载
+    4. 服务端不支持 Range 时退化为单连接流式下载，并依次尝试各镜像地址
+    所有下载共用一个长连接客户端，生命周期挂载到 main.py 的 lifespan
+    """
+
+    def __init__(self):
+        self.segment_size = int(os.getenv("DOWNLOAD_SEGMENT_SIZE", 4 * 1024 * 1024))
+        self.concurrency = int(os.getenv("DOWNLOAD_CONCURRENCY", 4))
+        self.max_retries = int(os.getenv("DOWNLOAD_SEGMENT_RETRIES", 4))
+        # 每个分段在内存中攒够该字节数再落盘，减少系统调用次数
+        self.write_buffer = int(os.getenv("DOWNLOAD_WRITE_BUFFER", 1024 * 1024))
+        self.max_connections = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", 32))
+        self.connect_timeout = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", 10))
+        # 读超时即慢节点判定：超过该时长没有收到任何数据就放弃当前连接，换镜像续传
+        self.read_timeout = float(os.getenv("DOWNLOAD_READ_TIMEOUT", 15))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 懒加载：首次下载时才建立连接池
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("🛑 [RangeDownloader] 下载连接池已关闭")
+
+    async def download(self, urls: list[str], file_path: str, headers: Optional[dict] = None,
+                       request: Optional[Request] = None) -> bool:
+        """
+        下载文件到 file_path
+        :param urls: 同一文件的候选地址，主地址在前，其后为备用镜像 (backupUrl)
+        :param request: 发起下载的 HTTP 请求 (可选)，请求方断开时终止下载
+        :return: 是否完整下载
+        """
+        urls = [url for url in dict.fromkeys(urls) if url]
+        headers = headers or _DEFAULT_HEADERS
+        if not urls:
+            return False
+
+        total, urls = await self._probe(urls, headers)
+        try:
+            if total is None:
+                return await self._download_single(urls, file_path, headers, request)
+            return await self._download_segmented(urls, total, file_path, headers, request)
+        except ClientDisconnected:
+            logger.warning(f"[RangeDownloader] Client disconnected, cleaning up: {file_path}")
+            return False
+        except Exception as e:
+            logger.error(f"[RangeDownloader] 下载失败 {file_path}: {e}")
+            return False
+
+    async def _probe(self, urls: list[str], headers: dict) -> tuple[Optional[int], list[str]]:
+        """
+        依次探测候选地址，返回 (文件总长度, 以探测成功的地址开头的候选列表)
+        服务端不支持 Range (返回 200) 或全部探测失败时总长度为 None
+        """
+        for i, url in enumerate(urls):
+            try:
+                async with self.client.stream("GET", url, headers={**headers, "Range": "bytes=0-0"}) as response:
+                    response.raise_for_status()
+                    if response.status_code == 206:
+                        total = self._parse_total(response.headers.get("Content-Range"))
+                        if total:
+                            return total, urls[i:] + urls[:i]
+                    return None, urls[i:] + urls[:i]
+            except Exception as e:
+                logger.warning(f"[RangeDownloader] 探测地址失败，尝试下一个镜像: {e}")
+        return None, urls
+
+    @staticmethod
+    def _parse_total(content_range: Optional[str]) -> Optional[int]:
+        """Content-Range: bytes 0-0/123456 -> 123456"""
+        if not content_range or "/" not in content_range:
+            return None
+        total = content_range.rsplit("/", 1)[1].strip()
+        return int(total) if total.isdigit() else None
+
+    async def _download_segmented(self, urls: list[str], total: int, file_path: str, headers: dict,
+                                  request: Optional[Request]) -> bool:
+        segments = [_Segment(start, min(start + self.segment_size, total) - 1) for start in range(0, total, self.segment_size)]
+        queue: asyncio.Queue[_Segment] = asyncio.Queue()
+        for segment in segments:
+            queue.put_nowait(segment)
+
+        completed = False
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # 预分配：一次性把文件扩展到最终大小，各分段直接按偏移写入
+            os.ftruncate(fd, total)
+            workers = [
+                asyncio.create_task(self._segment_worker(queue, urls, total, fd, headers, request))
+                for _ in range(min(self.concurrency, len(segments)))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                # 任一分段彻底失败即整体失败，取消其余仍在下载的分段
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+            completed = all(segment.remaining == 0 for segment in segments)
+        finally:
+            os.close(fd)
+            if not completed:
+                # 预分配的文件大小与成品一致，失败时必须删除，避免残缺文件被当成已下载
+                self._remove(file_path)
+        return completed
+
+    async def _segment_worker(self, queue: asyncio.Queue, urls: list[str], total: int, fd: int,
+                              headers: dict, request: Optional[Request]):
+        while not queue.empty():
+            segment = queue.get_nowait()
+            for attempt in range(self.max_retries + 1):
+                # 首次走主地址，重试时轮换到下一个镜像
+                url = urls[attempt % len(urls)]
+                try:
+                    await self._fetch_segment(url, segment, total, fd, headers, request)
+                    break
+                except ClientDisconnected:
+                    raise
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        raise RuntimeError(f"分段 {segment.start}-{segment.end} 重试 {self.max_retries} 次后仍失败: {e}")
+                    logger.warning(
+                        f"[RangeDownloader] 分段 {segment.start}-{segment.end} 中断 (已写入 {segment.written} 字节)，"
+                        f"换镜像续传: {e}"
+                    )
+                    await asyncio.sleep(min(5.0, 0.5 * (2 ** attempt)))
+
+    async def _fetch_segment(self, url: str, segment: _Segment, total: int, fd: int, headers: dict,
+                             request: Optional[Request]):
+        range_headers = {**headers, "Range": f"bytes={segment.offset}-{segment.end}"}
+        buffer = bytearray()
+        try:
+            async with self.client.stream("GET", url, headers=range_headers) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise RuntimeError(f"镜像不支持 Range 请求 (HTTP {response.status_code})")
+                # 镜像间文件不一致 (长度不同) 时不能拼接
+                if self._parse_total(response.headers.get("Content-Range")) != total:
+                    raise RuntimeError(f"镜像文件长度不一致: {response.headers.get('Content-Range')}")
+
+                async for chunk in response.aiter_bytes():
+                    buffer += chunk
+                    if len(buffer) >= self.write_buffer:
+                        # 仅当 Request 存在时才检查断开连接 (兼容后台任务无 Request 的场景)
+                        if request and await request.is_disconnected():
+                            raise ClientDisconnected()
+                        await self._flush(fd, segment, buffer)
+                        buffer = bytearray()
+        except ClientDisconnected:
+            raise
+        except Exception:
+            # 已收到的字节先落盘，重试时只需续传剩余部分
+            if buffer:
+                await self._flush(fd, segment, buffer)
+            raise
+        if buffer:
+            await self._flush(fd, segment, buffer)
+        if segment.remaining > 0:
+            raise RuntimeError(f"连接提前结束，缺少 {segment.remaining} 字节")
+
+    @staticmethod
+    async def _flush(fd: int, segment: _Segment, buffer: bytearray):
+        data = bytes(buffer[:segment.remaining])
+        await asyncio.to_thread(os.pwrite, fd, data, segment.offset)
+        segment.written += len(data)
+
+    async def _download_single(self, urls: list[str], file_path: str, headers: dict, request: Optional[Request]) -> bool:
+        """服务端不支持 Range 时的单连接流式下载，依次尝试各镜像地址"""
+        try:
+            for url in urls:
+                try:
+                    async with self.client.stream("GET", url, headers=headers) as response:
+                        response.raise_for_status()
+                        async with aiofiles.open(file_path, "wb") as out_file:
+                            async for chunk in response.aiter_bytes():
+                                # 仅当 Request 存在时才检查断开连接 (兼容后台任务无 Request 的场景)
+                                if request and await request.is_disconnected():
+                                    raise ClientDisconnected()
+                                await out_file.write(chunk)
+                    return True
+                except ClientDisconnected:
+                    raise
+                except Exception as e:
+                    logger.warning(f"[RangeDownloader] 单连接下载失败，尝试下一个镜像: {e}")
+        except BaseException:
+            self._remove(file_path)
+            raise
+        self._remove(file_path)
+        return False
+
+    @staticmethod
+    def _remove(file_path: str):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[RangeDownloader] 清理未完成的文件失败 {file_path}: {e}")
+
+
+# 导出单例，交由 main.py 管理其生命周期
+range_downloader = SegmentedDownloader()
@@ -1,89 +1,335 @@
+import os
+import time
 import asyncio
 from datetime import datetime, timedelta
+from typing import Optional
+from redis import RedisError
+from sqlalchemy import text, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from data_collection_service.crawlers.utils.logger import logger
-from data_collection_service.app.db.session import SessionLocal
+from data_collection_service.crawlers.utils.snowflake import snowflake_gen
+from data_collection_service.app.db.async_session import AsyncSessionLocal
 from data_collection_service.app.db.models import CrawlerTarget
+from data_collection_service.app.db.clickhouse import ClickHouseManager
+from data_collection_service.app.db.due_index import target_due_index
+from data_collection_service.app.db.target_repository import iter_active_target_schedule
+from data_collection_service.app.core.recrawl_policy import recrawl_policy, VideoActivity
+from data_collection_service.app.core.resource_profiles import get_resource_request_cost, get_resource_dispatch_batch_size
 from data_collection_service.app.services.task_service import TaskService
+from data_collection_service.app.services.outbox_relay import outbox_relay
+from data_collection_service.app.services.query_service import QueryService
 
 
 class SchedulerDaemon:
-    """定时任务引擎：扫描目标总表，按批次生成快照任务"""
+    """
+    定时任务引擎：从 Redis 到期索引 (ZSET) 中连续弹出到期目标，回表校验后按批次生成快照任务
+    - 有积压时不休眠，连续排空；空闲时睡到最早到期时间 (最多 SCHEDULER_IDLE_POLL 秒)，调度延迟为亚秒级
+    - 启动时及每隔 SCHEDULER_INDEX_REBUILD_INTERVAL 秒从 MySQL 重建索引，修复索引写入失败造成的偏差
+    - Redis 不可用 (未连接或调用报错后的冷却期) 时退化为按 (is_active, next_run_time) 扫描 MySQL，恢复后立即重建索引
+    - 多副本安全：目标在 MySQL 中以 FOR UPDATE SKIP LOCKED 认领后才会下发，同一目标同一周期只会被一个副本调度
+    - MySQL 访问全部走异步会话，认领/回写等待数据库期间不阻塞同进程的消费者与抓取协程
+    """
     def __init__(self):
         self._running = False
         self._task = None
+        self.batch_size = int(os.getenv("SCHEDULER_BATCH_SIZE", 500))
+        self.idle_poll = float(os.getenv("SCHEDULER_IDLE_POLL", 1.0))
+        self.retry_delay = float(os.getenv("SCHEDULER_RETRY_DELAY", 30))
+        # 认领租约：认领后若在该时长内没有回写结果 (副本崩溃)，目标会重新到期
+        self.claim_timeout = int(os.getenv("SCHEDULER_CLAIM_TIMEOUT", 300))
+        self.rebuild_interval = int(os.getenv("SCHEDULER_INDEX_REBUILD_INTERVAL", 3600))
+        # 自适应调度读取视频快照的回看窗口，以及容量预估的日志输出周期
+        self.activity_lookback_days = int(os.getenv("RECRAWL_ACTIVITY_LOOKBACK_DAYS", 14))
+        self.capacity_report_interval = int(os.getenv("SCHEDULER_CAPACITY_REPORT_INTERVAL", 3600))
+        self._last_report_at = float("-inf")
+        self._last_rebuild_at = float("-inf")
 
     async def start(self):
         self._running = True
         self._task = asyncio.create_task(self._schedule_loop())
-        logger.info(" [Scheduler] 定时扫描引擎已启动...")
+        logger.info(" [Scheduler] 定时调度引擎已启动...")
 
     async def stop(self):
         self._running = False
         if self._task:
             self._task.cancel()
-            logger.info(" [Scheduler] 定时扫描引擎已关闭。")
+            logger.info(" [Scheduler] 定时调度引擎已关闭。")
 
     async def _schedule_loop(self):
         while self._running:
+            dispatched = 0
             try:
-                await self._check_and_dispatch()
+                stale = target_due_index.stale
+                if target_due_index.available and (stale or time.monotonic() - self._last_rebuild_at >= self.rebuild_interval):
+                    self._last_rebuild_at = time.monotonic()
+                    # 常规周期只由抢到锁的一个副本执行重建；索引故障恢复后各副本立即重建 (合并写入，可以并发)
+                    if stale or await target_due_index.try_acquire_rebuild_lock(self.rebuild_interval):
+                        await self._rebuild_index()
+                dispatched = await self._check_and_dispatch()
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f" [Scheduler] 扫描异常: {str(e)}")
+                logger.error(f" [Scheduler] 调度异常: {str(e)}")
 
-            # 每隔 60 秒巡检一次
-            await asyncio.sleep(60)
+            if time.monotonic() - self._last_report_at >= self.capacity_report_interval:
+                self._last_report_at = time.monotonic()
+                await self._report_daily_volume()
 
-    async def _check_and_dispatch(self):
-        db = SessionLocal()
+            try:
+                # 弹满一整批说明还有积压，立即继续排空；否则睡到下一个目标到期
+                if dispatched < self.batch_size:
+                    await self._wait_next_due()
+            except asyncio.CancelledError:
+                break
+
+    async def _rebuild_index(self):
+        started = time.monotonic()
+        try:
+            total = await target_due_index.rebuild(iter_active_target_schedule())
+        except RedisError as e:
+            # 重建失败不影响本轮调度 (降级扫描 MySQL)
+            target_due_index.mark_failed(e)
+            return
+        logger.info(f" [Scheduler] 到期索引已从 MySQL 重建: {total} 个激活目标，耗时 {time.monotonic() - started:.2f}s")
+
+    async def _wait_next_due(self):
+        delay = self.idle_poll if target_due_index.available else 60
+        if target_due_index.available:
+            try:
+                next_due_at = await target_due_index.next_due_at()
+                if next_due_at is not None:
+                    delay = min(delay, max(0.05, next_due_at - time.time()))
+            except RedisError as e:
+                target_due_index.mark_failed(e)
+        await asyncio.sleep(delay)
+
+    async def _claim_rows(self, db: AsyncSession, now: datetime, candidate_ids: Optional[list[int]] = None) -> list:
+        """
+        在一个短事务中认领到期目标 (多副本安全)
+        SELECT ... FOR UPDATE SKIP LOCKED 锁住仍然到期的行，并把 next_run_time 推迟到认领租约结束后立即提交：
+        其他副本要么跳过被锁的行，要么在提交后看到未到期的 next_run_time，同一目标只会被一个副本认领
+        认领者中途崩溃时，租约 (SCHEDULER_CLAIM_TIMEOUT) 到期后目标自动重新到期
+        只查询调度需要的列，返回轻量的 Row 而非 ORM 对象
+        """
+        query = select(
+            CrawlerTarget.id,
+            CrawlerTarget.platform_type,
+            CrawlerTarget.resource_type,
+            CrawlerTarget.target_id,
+            CrawlerTarget.cron_interval_minutes
+        ).where(
+            CrawlerTarget.is_active == True,
+            CrawlerTarget.next_run_time <= now
+        )
+        if candidate_ids is not None:
+            query = query.where(CrawlerTarget.id.in_(candidate_ids))
+        else:
+            # 降级扫描 MySQL 时按到期先后分片认领 (命中 idx_active_next_run 复合索引)
+            query = query.order_by(CrawlerTarget.next_run_time).limit(self.batch_size)
+
+        targets = (await db.execute(query.with_for_update(skip_locked=True))).all()
+        if targets:
+            await self._apply_schedules(db, {t.id: now + timedelta(seconds=self.claim_timeout) for t in targets})
+        await db.commit()
+        return targets
+
+    @staticmethod
+    async def _apply_schedules(db: AsyncSession, schedules: dict[int, datetime], last_run_time: Optional[datetime] = None):
+        """
+        集合式回写 next_run_time：按目标时间分组，每组一条 UPDATE ... WHERE id IN (...)
+        重采集间隔是量化过的，一批目标通常只落在少数几档上
+        """
+        by_time: dict[datetime, list[int]] = {}
+        for pk, next_run_time in schedules.items():
+            by_time.setdefault(next_run_time, []).append(pk)
+
+        for next_run_time, pks in by_time.items():
+            values = {CrawlerTarget.next_run_time: next_run_time}
+            if last_run_time is not None:
+                values[CrawlerTarget.last_run_time] = last_run_time
+            await db.execute(
+                update(CrawlerTarget).where(CrawlerTarget.id.in_(pks)).values(values).execution_options(synchronize_session=False)
+            )
+
+    async def _claim_due_targets(self, db: AsyncSession, now: datetime) -> tuple[list, int]:
+        """
+        取出并认领本轮到期的目标
+        索引模式：弹出到期 id 后在 MySQL 中认领；未激活的直接丢弃，未认领到的 (已被改晚或被其他副本认领) 按实际时间放回索引
+        :return: (认领到的目标, 本轮从索引弹出的数量)
+        """
+        if not target_due_index.available:
+            targets = await self._claim_rows(db, now)
+            return targets, len(targets)
+
+        try:
+            due_ids = await target_due_index.pop_due(now.timestamp(), self.batch_size)
+        except RedisError as e:
+            # 本轮直接扫描 MySQL；即使脚本已执行而回包丢失，被弹出的目标也会被扫描认领，或由恢复后的重建补回
+            target_due_index.mark_failed(e)
+            targets = await self._claim_rows(db, now)
+            return targets, len(targets)
+        if not due_ids:
+            return [], 0
+        try:
+            targets = await self._claim_rows(db, now, due_ids)
+        except Exception:
+            # 认领失败 (MySQL 故障)：弹出的 id 延迟放回索引，避免丢失到下一次重建
+            await target_due_index.add((pk, now + timedelta(seconds=self.retry_delay)) for pk in due_ids)
+            raise
+
+        claimed = {t.id for t in targets}
+        unclaimed = [pk for pk in due_ids if pk not in claimed]
+        if unclaimed:
+            rows = (await db.execute(select(CrawlerTarget.id, CrawlerTarget.next_run_time).where(
+                CrawlerTarget.id.in_(unclaimed),
+                CrawlerTarget.is_active == True
+            ))).all()
+            await target_due_index.add((row.id, row.next_run_time) for row in rows)
+        # 认领租约同时写入索引作为兜底：本副本在调度完成前崩溃时，租约到期后目标会被重新弹出
+        lease_until = now + timedelta(seconds=self.claim_timeout)
+        await target_due_index.add((t.id, lease_until) for t in targets)
+        await db.commit()
+        return targets, len(due_ids)
+
+    @staticmethod
+    def _plan_batches(targets: list) -> list[tuple[int, str, list]]:
+        """
+        下发计划：按 (platform_type, resource_type) 分组后，再按资源维度的执行成本切成多个批次
+        每个批次对应一条 CrawlerTask / Kafka 消息，重任务 (评论、下载) 小批次下发，可以被多个分区的消费者并行执行
+        """
+        grouped_targets: dict[tuple[int, str], list] = {}
+        for t in targets:
+            grouped_targets.setdefault((t.platform_type, t.resource_type), []).append(t)
+
+        batches = []
+        for (p_type, r_type), group in grouped_targets.items():
+            size = get_resource_dispatch_batch_size(r_type)
+            for i in range(0, len(group), size):
+                batches.append((p_type, r_type, group[i:i + size]))
+        return batches
+
+    async def _check_and_dispatch(self) -> int:
+        """
+        调度一轮到期目标
+        :return: 本轮取出的目标数 (用于判断是否还有积压)
+        """
+        db = AsyncSessionLocal()
+        schedules = {}
         try:
             now = datetime.now()
-            # 1. 查询所有到期需要执行的任务
-            due_targets = db.query(CrawlerTarget).filter(
-                CrawlerTarget.is_active == True,
-                CrawlerTarget.next_run_time <= now
-            ).limit(500).all()  # 一次最多捞 500 个防 OOM
+            # 1. 取出并认领到期需要执行的目标 (一次最多 batch_size 个防 OOM)
+            due_targets, fetched = await self._claim_due_targets(db, now)
 
             if not due_targets:
-                return
+                return fetched
 
-            # 2. 按照 (platform_type, resource_type) 将任务分组
-            grouped_targets = {}
+            # 2. 计算下次执行时间 (由重采集策略按视频年龄与变化速率计算，其余维度沿用固定周期)
+            activities = await self._load_video_activity(due_targets)
             for t in due_targets:
-                key = (t.platform_type, t.resource_type)
-                if key not in grouped_targets:
-                    grouped_targets[key] = []
-                grouped_targets[key].append(t)
+                interval = recrawl_policy.next_interval(
+                    t.resource_type, t.cron_interval_minutes, activities.get(t.target_id), now.timestamp()
+                )
+                schedules[t.id] = now + timedelta(minutes=interval)
 
+            # 3. 按成本切批，逐批登记执行快照 (CrawlerTask) 与发件箱消息
             task_service = TaskService(db_session=db)
-
-            # 3. 批量生成执行快照 (CrawlerTask) 并发送给 Kafka
-            for (p_type, r_type), targets in grouped_targets.items():
-                target_ids = [t.target_id for t in targets]
-
-                # 复用我们写好的绝杀方法！它会自动生成 batch_id, 写入 MySQL 并发给 Kafka
-                batch_id = await task_service.create_and_dispatch_task(
+            batches = self._plan_batches(due_targets)
+            for p_type, r_type, targets in batches:
+                task_service.stage_task(
                     platform_type=p_type,
                     resource_type=r_type,
-                    resource_ids=target_ids,
+                    resource_ids=[t.target_id for t in targets],
                     task_name=f"Cron调度_{r_type}_{now.strftime('%H:%M')}"
                 )
 
-                # 4. 更新总表的 next_run_time (计算下次执行时间)
-                for t in targets:
-                    t.last_run_time = now
-                    t.next_run_time = now + timedelta(minutes=t.cron_interval_minutes)
-
-                logger.info(f" [Scheduler] 触发 {len(target_ids)} 个 {r_type} 定时任务，生成批次号: {batch_id}")
+            # 4. 集合式回写总表的 last_run_time / next_run_time，与全部批次在同一个本地事务中提交
+            await self._apply_schedules(db, schedules, last_run_time=now)
+            await db.commit()
+            outbox_relay.notify()
+            logger.info(f" [Scheduler] 本轮触发 {len(due_targets)} 个定时目标，拆分为 {len(batches)} 个批次写入发件箱")
 
-            db.commit()
+            # 5. 提交成功后把新的到期时间写回索引 (覆盖认领租约)
+            await target_due_index.add(schedules.items())
+            return fetched
 
         except Exception as e:
-            db.rollback()
+            await db.rollback()
+            if schedules:
+                # 整轮回滚：目标延迟重试，避免 MySQL 故障期间空转，也不必等认领租约过期
+                await self._release_claims(db, list(schedules), now)
             raise e
         finally:
-            db.close()
+            await db.close()
+
+    async def _release_claims(self, db: AsyncSession, target_pks: list[int], now: datetime):
+        retry_at = now + timedelta(seconds=self.retry_delay)
+        try:
+            await self._apply_schedules(db, {pk: retry_at for pk in target_pks})
+            await db.commit()
+            await target_due_index.add((pk, retry_at) for pk in target_pks)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f" [Scheduler] 回写调度结果失败，{len(target_pks)} 个目标将在认领租约过期后重新调度: {str(e)}")
+
+    async def _load_video_activity(self, targets: list) -> dict[str, VideoActivity]:
+        """批量读取自适应维度目标的视频快照；ClickHouse 不可用时返回空字典，调度退化为固定周期"""
+        bvids = sorted({t.target_id for t in targets if recrawl_policy.is_adaptive(t.resource_type)})
+        if not bvids or ClickHouseManager.pool is None:
+            return {}
+
+        since_batch_id = snowflake_gen.min_id_at((time.time() - self.activity_lookback_days * 86400) * 1000)
+        try:
+            async with ClickHouseManager.pool.connection() as ch_client:
+                rows = await QueryService(ch_client=ch_client).get_video_snapshot_history(bvids, since_batch_id)
+        except Exception as e:
+            logger.warning(f" [Scheduler] 读取视频快照失败，本轮按固定周期调度: {str(e)}")
+            return {}
+
+        activities = {}
+        for row in rows:
+            snaps = [(snowflake_gen.timestamp_ms_of(batch_id) / 1000, views, replies) for batch_id, views, replies in row['snaps']]
+            activities[row['bvid']] = VideoActivity(row['pubdate_ts'], snaps)
+        return activities
+
+    async def project_daily_volume(self, db: AsyncSession) -> dict:
+        """
+        预估当前调度节奏下每天的任务量与上游请求量，用于评估爬虫容量
+        单个目标的实际周期取 next_run_time - last_run_time (已包含自适应调整)，从未执行过的取 cron_interval_minutes
+        """
+        rows = (await db.execute(text("""
+            SELECT resource_type,
+                   COUNT(*) AS targets,
+                   SUM(1440 / GREATEST(
+                       COALESCE(TIMESTAMPDIFF(MINUTE, last_run_time, next_run_time), cron_interval_minutes),
+                       :min_interval
+                   )) AS runs_per_day
+            FROM crawler_target
+            WHERE is_active = 1
+            GROUP BY resource_type
+        """), {"min_interval": recrawl_policy.min_interval})).all()
+
+        resources = {}
+        for resource_type, targets, runs_per_day in rows:
+            runs_per_day = float(runs_per_day or 0)
+            resources[resource_type] = {
+                "targets": int(targets),
+                "runs_per_day": round(runs_per_day, 1),
+                "requests_per_day": round(runs_per_day * get_resource_request_cost(resource_type), 1),
+            }
+        return {
+            "resources": resources,
+            "total_runs_per_day": round(sum(r["runs_per_day"] for r in resources.values()), 1),
+            "total_requests_per_day": round(sum(r["requests_per_day"] for r in resources.values()), 1),
+        }
+
+    async def _report_daily_volume(self):
+        async with AsyncSessionLocal() as db:
+            try:
+                volume = await self.project_daily_volume(db)
+                logger.info(f" [Scheduler] 预估日调度量: {volume['total_runs_per_day']} 次任务 / "
+                            f"{volume['total_requests_per_day']} 次上游请求，明细: {volume['resources']}")
+            except Exception as e:
+                logger.error(f" [Scheduler] 调度容量预估失败: {str(e)}")
 
 
 scheduler_daemon = SchedulerDaemon()
\ No newline at end of file
@@ -2,9 +2,14 @@ from asynch.connection import Connection
 from asynch.cursors import DictCursor
 
 from data_collection_service.app.api.models.QueryModel import OperatorEnum,ComplexSearchRequest
+from data_collection_service.app.db.clickhouse import ClickHouseManager
+from data_collection_service.app.db.clickhouse_writer import clickhouse_batch_writer
 from data_collection_service.crawlers.utils.logger import logger
 
 class StorageService:
+    # 表结构缓存 (进程级)：table_name -> 按 position 排序的列名列表
+    _table_columns_cache: dict[str, list[str]] = {}
+
     def __init__(self, ch_client: Connection):
         self.ch = ch_client
 
@@ -12,11 +17,15 @@ class StorageService:
         """
         通用化 ClickHouse 批量写入方法
         利用 clickhouse-driver 的字典插入特性，只要字典 key 和列名一致即可自动映射
+        合批写入器运行中时，交由其与其他任务的同表写入合并落盘 (await 到整批写入完成)
         """
         if not data_list:
             logger.warning(f"[{table_name}] 接收到的写入数据为空，跳过写入")
             return False
 
+        if clickhouse_batch_writer.running:
+            return await clickhouse_batch_writer.write(table_name, data_list)
+
         try:
             # 此处可以根据需要决定是否在通用层做初步过滤
             # 动态获取字典的 keys，显式指定要插入的列名
@@ -33,6 +42,64 @@ class StorageService:
             logger.error(f"[ClickHouse] 写入 {table_name} 失败: {str(e)}", exc_info=True)
             return False
 
+    async def get_table_columns(self, table_name: str) -> list[str]:
+        """
+        从 system.columns 获取表的列名 (按建表顺序)，结果进程内缓存
+        :param table_name: 形如 ods.bilibili_video_comments，省略库名时取当前库
+        """
+        columns = self._table_columns_cache.get(table_name)
+        if columns is not None:
+            return columns
+
+        database, _, table = table_name.rpartition('.')
+        query = (
+            "SELECT name FROM system.columns "
+            "WHERE database = " + ("%(database)s" if database else "currentDatabase()") + " AND table = %(table)s "
+            "ORDER BY position"
+        )
+        async with self.ch.cursor() as cursor:
+            await cursor.execute(query, {"database": database, "table": table})
+            rows = await cursor.fetchall()
+        columns = [row[0] for row in rows]
+        if columns:
+            self._table_columns_cache[table_name] = columns
+        return columns
+
+    async def save_columns_to_clickhouse(self, table_name: str, columns: dict) -> bool:
+        """
+        列式批量写入：按列传入数组 (list 或 NumPy 数组)，驱动直接按列编码，省去逐行字典的内存与转置开销
+        适用于评论等大批量写入，批次本身已足够大，因此不经过合批写入器
+        :param columns: {列名: 列数组}，各列长度必须一致
+        """
+        if not columns:
+            logger.warning(f"[{table_name}] 接收到的列式写入数据为空，跳过写入")
+            return False
+
+        row_count = len(next(iter(columns.values())))
+        if row_count == 0:
+            logger.warning(f"[{table_name}] 接收到的写入数据为空，跳过写入")
+            return False
+
+        try:
+            table_columns = await self.get_table_columns(table_name)
+            unknown = [name for name in columns if name not in table_columns]
+            if not table_columns or unknown:
+                logger.error(f"[ClickHouse] 列式写入 {table_name} 失败: 表不存在或包含未知列 {unknown}")
+                return False
+            if any(len(values) != row_count for values in columns.values()):
+                logger.error(f"[ClickHouse] 列式写入 {table_name} 失败: 各列长度不一致")
+                return False
+
+            # NumPy 数组转为原生序列，驱动未开启 use_numpy 时按 Python 类型编码
+            column_data = [values.tolist() if hasattr(values, 'tolist') else values for values in columns.values()]
+            query = f"INSERT INTO {table_name}({', '.join(columns)}) VALUES"
+            await ClickHouseManager.insert_columnar(self.ch, query, column_data)
+            logger.info(f"[ClickHouse] 成功列式写入 {row_count} 条数据到 {table_name}")
+            return True
+        except Exception as e:
+            logger.error(f"[ClickHouse] 列式写入 {table_name} 失败: {str(e)}", exc_info=True)
+            return False
+
     async def query_clickhouse(self,query: str):
         try:
             async with self.ch.cursor(cursor=DictCursor) as cursor:
@@ -1,9 +1,9 @@
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # 导入项目中定义的模型和工具
-from data_collection_service.app.db.models import CrawlerTask
-from data_collection_service.app.services.kafka_service import kafka_producer
+from data_collection_service.app.db.models import CrawlerTask, TaskOutbox
+from data_collection_service.app.services.outbox_relay import outbox_relay
 from data_collection_service.crawlers.utils.logger import logger
 # 导入花算法生成器工具类
 from data_collection_service.crawlers.utils.snowflake import snowflake_gen
@@ -13,11 +13,12 @@ class TaskService:
     """
     爬虫任务调度服务 (支持批量快照与时序追踪)
     职责: 负责任务的持久化登记与 Kafka 异步下发，保证 MySQL 与 Kafka 的状态一致性
+    下发走发件箱 (Transactional Outbox)：任务记录与待投递消息在同一个本地事务中提交，由 OutboxRelay 批量投递到 Kafka
     """
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: AsyncSession):
         self.db = db_session
 
-    async def create_and_dispatch_task(
+    def stage_task(
             self,
             platform_type: int,
             resource_type: str,
@@ -26,12 +27,8 @@ class TaskService:
             params: dict = None
     ) -> str:
         """
-        创建并派发批量/时序任务
-        :param platform_type: 平台 (3=B站, 4=抖音)
-        :param resource_type: 资源维度 ('scrape_and_store_video_comments', 'scrape_and_store_user_info', 'scrape_and_store_user_relation')
-        :param resource_ids: 目标ID列表 (如 ['BV1xx', 'BV2xx'])
-        :param task_name: 任务备注名
-        :param params: 附加限制参数
+        在当前会话中登记一个任务及其待投递消息，但不提交事务
+        调用方可以连续登记多个任务后统一 commit (例如调度器一轮的全部批次)，提交后调用 outbox_relay.notify()
         :return: 返回生成的雪花算法批次号 (字符串格式)
         """
         # 1. 使用雪花算法生成全局唯一且趋势递增的纯数字 ID (用作 batch_id)
@@ -55,33 +52,50 @@ class TaskService:
             params=params
         )
 
-        try:
-            # 【本地事务防护】先将对象 add 到 Session 中，但先不 commit
-            # 使用 flush 将 SQL 推送到 MySQL 检查约束，但不提交事务
-            self.db.add(new_task)
-            self.db.flush()
-            # 3. 组装并向 Kafka 投递消息
-            # 注意：这里的结构必须与我们之前写的 kafka_consumer 中的 `_process_task` 解析逻辑完全对齐！
-            kafka_message = {
-                "task_id": task_id_str,  # 透传给消费者的批次号 (batch_id)
-                "task_name": task_name,
-                "platform_type": platform_type,
-                "resource_type": resource_type,
-                "resource_payload": {"ids": resource_ids},
-                "params": params or {},
-                "submit_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            # 使用单例 producer 发送消息
-            await kafka_producer.send_task_message(topic="crawler_task_queue", message=kafka_message)
-            # 4. 【关键步骤】只有当 Kafka 确定收到消息（没有抛出网络异常）后，我们才正式提交数据库事务
-            self.db.commit()
-            logger.info(
-                f"[TaskService] 批次 {task_id_str} 已成功入库并下发至 Kafka。包含 {len(resource_ids)} 个采集目标。")
-            return task_id_str
+        # 3. 组装待投递的 Kafka 消息，写入发件箱
+        # 注意：这里的结构必须与我们之前写的 kafka_consumer 中的 `_process_task` 解析逻辑完全对齐！
+        kafka_message = {
+            "task_id": task_id_str,  # 透传给消费者的批次号 (batch_id)
+            "task_name": task_name,
+            "platform_type": platform_type,
+            "resource_type": resource_type,
+            "resource_payload": {"ids": resource_ids},
+            "params": params or {},
+            "submit_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.db.add(new_task)
+        self.db.add(TaskOutbox(topic="crawler_task_queue", payload=kafka_message))
+        return task_id_str
 
+    async def create_and_dispatch_task(
+            self,
+            platform_type: int,
+            resource_type: str,
+            resource_ids: list,
+            task_name: str = "未命名时序任务",
+            params: dict = None
+    ) -> str:
+        """
+        创建并派发批量/时序任务 (单个任务，登记后立即提交)
+        :param platform_type: 平台 (3=B站, 4=抖音)
+        :param resource_type: 资源维度 ('scrape_and_store_video_comments', 'scrape_and_store_user_info', 'scrape_and_store_user_relation')
+        :param resource_ids: 目标ID列表 (如 ['BV1xx', 'BV2xx'])
+        :param task_name: 任务备注名
+        :param params: 附加限制参数
+        :return: 返回生成的雪花算法批次号 (字符串格式)
+        """
+        try:
+            task_id_str = self.stage_task(platform_type, resource_type, resource_ids, task_name, params)
+            # 任务记录与发件箱消息一次本地提交，不再在事务内等待 Kafka 回执
+            # 提交成功即保证消息最终会被投递，彻底杜绝“幽灵待执行任务”
+            await self.db.commit()
         except Exception as e:
-            # 5. 异常回滚：如果 Kafka 宕机或网络异常，回滚 MySQL 事务
-            # 彻底防止数据库里产生永远不会被消费者读取到的“幽灵待执行任务”
-            self.db.rollback()
+            # 异常回滚：任务与消息要么都落库，要么都不落库
+            await self.db.rollback()
             logger.error(f"[TaskService] 任务创建失败，事务已回滚。原因: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
+
+        outbox_relay.notify()
+        logger.info(
+            f"[TaskService] 批次 {task_id_str} 已成功入库并写入发件箱。包含 {len(resource_ids)} 个采集目标。")
+        return task_id_str
@@ -1,7 +1,5 @@
 import os
-import aiofiles
 import asyncio
-import httpx
 import tempfile
 import subprocess
 import glob
@@ -13,40 +11,29 @@ from typing import Optional
 from data_collection_service.crawlers.utils.logger import logger
 from data_collection_service.app.services.storage_video_service import minio_video_client
 from data_collection_service.app.services.coze_service import coze_client
+from data_collection_service.app.services.range_downloader import range_downloader
 
 
 class VideoProcessorService:
     @staticmethod
-    async def fetch_data_stream(url: str, request: Request = None, headers: dict = None, file_path: str = None) -> bool:
-        """流式下载文件到本地临时目录"""
-        default_headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/91.0.4472.124 Safari/537.36'
-        }
-        headers = headers or default_headers
-
-        try:
-            async with httpx.AsyncClient() as client:
-                async with client.stream("GET", url, headers=headers) as response:
-                    response.raise_for_status()
-                    async with aiofiles.open(file_path, 'wb') as out_file:
-                        async for chunk in response.aiter_bytes():
-                            # 仅当 Request 存在时才检查断开连接 (兼容后台任务无 Request 的场景)
-                            if request and await request.is_disconnected():
-                                logger.warning(f"[VideoProcessor] Client disconnected, cleaning up: {file_path}")
-                                return False
-                            await out_file.write(chunk)
-            return True
-        except Exception as e:
-            logger.error(f"[VideoProcessor] Stream download failed: {e}")
-            return False
+    async def fetch_data_stream(url: str, request: Request = None, headers: dict = None, file_path: str = None,
+                                backup_urls: Optional[list[str]] = None) -> bool:
+        """
+        下载文件到本地临时目录 (多连接分段下载，失败分段续传并轮换到 backup_urls 镜像)
+        """
+        return await range_downloader.download([url, *(backup_urls or [])], file_path, headers=headers, request=request)
 
     @staticmethod
-    async def download_bilibili_streams(video_url: str, audio_url: str, video_path: str, audio_path: str, headers: dict) -> Optional[bool]:
+    async def download_bilibili_streams(video_url: str, audio_url: str, video_path: str, audio_path: str, headers: dict,
+                                        video_backup_urls: Optional[list[str]] = None,
+                                        audio_backup_urls: Optional[list[str]] = None) -> Optional[bool]:
         try:
             logger.info(f"[VideoProcessor] 并发下载 m4v 和 m4a 分离流到本地...")
             # 并发执行两个下载任务
-            v_task = VideoProcessorService.fetch_data_stream(video_url, headers=headers, file_path=video_path)
-            a_task = VideoProcessorService.fetch_data_stream(audio_url, headers=headers, file_path=audio_path)
+            v_task = VideoProcessorService.fetch_data_stream(video_url, headers=headers, file_path=video_path,
+                                                             backup_urls=video_backup_urls)
+            a_task = VideoProcessorService.fetch_data_stream(audio_url, headers=headers, file_path=audio_path,
+                                                             backup_urls=audio_backup_urls)
 
             results = await asyncio.gather(v_task, a_task)
 
@@ -116,7 +103,9 @@ class VideoProcessorService:
 
             # 1. 并发下载分离流 (I/O 密集型)
             success = await VideoProcessorService.download_bilibili_streams(
-                video_url, audio_url, local_m4v_path, local_m4a_path, headers
+                video_url, audio_url, local_m4v_path, local_m4a_path, headers,
+                video_backup_urls=video_data.get('nwm_video_backup_urls'),
+                audio_backup_urls=video_data.get('audio_backup_urls')
             )
             if not success:
                 logger.error(f"[VideoProcessor] 下载环节失败: {platform}_{video_id}")
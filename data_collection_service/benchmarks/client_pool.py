@@ -0,0 +1,79 @@
+"""
+爬虫客户端基准：每次调用新建 BaseCrawler (旧实现) vs 进程级长连接客户端池 (CrawlerClientPool)
+
+在本地起一个返回 B站风格 JSON 的 HTTP 服务，--handshake-ms 为每个新连接注入的握手耗时 (模拟 TCP + TLS 往返)，
+以 --concurrency 个协程共发出 --requests 次 fetch_get_json，输出吞吐与延迟分位
+
+用法 (在仓库根目录执行):
+    python -m data_collection_service.benchmarks.client_pool --requests 2000 --concurrency 20 --handshake-ms 30
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+from data_collection_service.crawlers.base_crawler import BaseCrawler
+from data_collection_service.crawlers.utils.client_pool import CrawlerClientPool
+from data_collection_service.benchmarks.local_server import LocalServer
+
+HEADERS = {"user-agent": "bench", "cookie": "SESSDATA=bench"}
+
+
+async def _per_call(url: str) -> dict:
+    async with BaseCrawler(proxies=None, crawler_headers=HEADERS) as crawler:
+        return await crawler.fetch_get_json(url)
+
+
+def _pooled(pool: CrawlerClientPool):
+    async def call(url: str) -> dict:
+        async with pool.acquire(proxies=None, headers=HEADERS, identity="bench") as crawler:
+            return await crawler.fetch_get_json(url)
+    return call
+
+
+async def _drive(call, url: str, requests: int, concurrency: int) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await call(url)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+
+def _report(name: str, elapsed: float, latencies: list[float]):
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<12}{len(latencies) / elapsed:>10.0f}{statistics.median(latencies) * 1000:>10.1f}{p99 * 1000:>10.1f}")
+
+
+async def run(args):
+    with LocalServer(handshake_ms=args.handshake_ms) as server:
+        url = server.url("/x/web-interface/view?bvid=BV1bench")
+        print(f"{args.requests} 次请求, 并发 {args.concurrency}, 新连接握手 {args.handshake_ms}ms")
+        print(f"{'模式':<12}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+
+        _report("per-call", *await _drive(_per_call, url, args.requests, args.concurrency))
+
+        pool = CrawlerClientPool()
+        try:
+            _report("pooled", *await _drive(_pooled(pool), url, args.requests, args.concurrency))
+        finally:
+            await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+评论写入基准：逐行字典 (clean_bilibili_video_comments + save_data_to_clickhouse)
+           vs 列式数组 (clean_bilibili_video_comments_columnar + save_columns_to_clickhouse)
+
+默认只测清洗与组装阶段 (无需 ClickHouse)；传入 --ch-host 时额外测端到端写入：
+在目标表旁建一张 ENGINE = Null 的同结构表 (数据直接丢弃，只衡量客户端编码与网络发送)，测完删除
+每种模式在独立的子进程中运行，内存指标为进程峰值 RSS (getrusage ru_maxrss，包含驱动编码与 C 层缓冲)，
+增量为峰值减去模式开始前 (已完成导入与造数) 的峰值
+
+用法 (在仓库根目录执行):
+    python -m data_collection_service.benchmarks.columnar_insert --rows 200000
+    python -m data_collection_service.benchmarks.columnar_insert --rows 200000 --ch-host 127.0.0.1 --ch-port 9000 \\
+        --ch-user default --ch-password '' --table ods.bilibili_video_comments
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import subprocess
+
+from data_collection_service.app.db.clickhouse import ClickHouseManager
+from data_collection_service.app.services.data_cleaning_service import DataCleaningService
+from data_collection_service.app.services.storage_service import StorageService
+
+BVID, OID, BATCH_ID = "BV1bench", 114514, "1234567890123456789"
+CLEAN_MODES = ("clean: row dicts", "clean: columnar")
+INSERT_MODES = ("clean+insert: row dicts", "clean+insert: columnar")
+
+
+def _fake_comments(rows: int, replies_per_comment: int = 3) -> list[dict]:
+    """生成与 B站评论接口结构一致的原始评论 (主评论 + 楼中楼)"""
+    rnd = random.Random(42)
+
+    def comment(rpid: int, root: int) -> dict:
+        return {
+            "rpid": rpid, "root": root, "parent": root, "dialog": root, "state": 0,
+            "like": rnd.randint(0, 10000), "count": rnd.randint(0, 50), "rcount": rnd.randint(0, 50),
+            "ctime": 1700000000 + rnd.randint(0, 10 ** 7),
+            "member": {
+                "mid": rnd.randint(1, 10 ** 9), "uname": f"用户{rpid}", "sign": "签名" * rnd.randint(0, 10), "sex": "保密",
+                "level_info": {"current_level": rnd.randint(0, 6)}, "vip": {"vipType": rnd.randint(0, 2)},
+                "fans_detail": {"uid": 1, "medal_id": 2, "medal_name": "粉丝牌", "level": 3, "guard_level": 0},
+            },
+            "content": {
+                "message": "这是一条评论内容" * rnd.randint(1, 8),
+                "members": [{"mid": str(rnd.randint(1, 10 ** 9))}] if rnd.random() < 0.1 else [],
+                "jump_url": {},
+            },
+        }
+
+    raw, rpid = [], 1
+    per_item = replies_per_comment + 1
+    for _ in range(max(1, rows // per_item)):
+        root = comment(rpid, 0)
+        root["replies"] = [comment(rpid + i, rpid) for i in range(1, per_item)]
+        raw.append(root)
+        rpid += per_item
+    return raw
+
+
+def _max_rss_mib() -> float:
+    # Linux 下 ru_maxrss 单位为 KiB，macOS 下为字节
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2 ** 20 if sys.platform == "darwin" else max_rss / 2 ** 10
+
+
+def _bench_table(args) -> str:
+    return f"{args.table}_bench_null"
+
+
+async def _run_mode(args) -> dict:
+    """子进程入口：造数后执行单一模式，返回吞吐与内存指标"""
+    raw = _fake_comments(args.rows)
+    batch = args.batch
+
+    async def clean_rows():
+        return len(DataCleaningService.clean_bilibili_video_comments(raw, BVID, OID, BATCH_ID))
+
+    async def clean_columns():
+        columns = DataCleaningService.clean_bilibili_video_comments_columnar(raw, BVID, OID, BATCH_ID)
+        return len(columns["rpid"])
+
+    async def insert_rows(storage: StorageService):
+        data = DataCleaningService.clean_bilibili_video_comments(raw, BVID, OID, BATCH_ID)
+        for i in range(0, len(data), batch):
+            if not await storage.save_data_to_clickhouse(_bench_table(args), data[i:i + batch]):
+                raise RuntimeError("逐行写入失败")
+        return len(data)
+
+    async def insert_columns(storage: StorageService):
+        columns = DataCleaningService.clean_bilibili_video_comments_columnar(raw, BVID, OID, BATCH_ID)
+        rows = len(columns["rpid"])
+        for i in range(0, rows, batch):
+            chunk = {name: values[i:i + batch] for name, values in columns.items()}
+            if not await storage.save_columns_to_clickhouse(_bench_table(args), chunk):
+                raise RuntimeError("列式写入失败")
+        return rows
+
+    if args.mode in CLEAN_MODES:
+        baseline = _max_rss_mib()
+        started = time.perf_counter()
+        rows = await (clean_rows() if args.mode == CLEAN_MODES[0] else clean_columns())
+    else:
+        await ClickHouseManager.init_db(args.ch_host, args.ch_port, args.ch_user, args.ch_password, args.ch_database)
+        try:
+            async with ClickHouseManager.pool.connection() as conn:
+                storage = StorageService(ch_client=conn)
+                baseline = _max_rss_mib()
+                started = time.perf_counter()
+                rows = await (insert_rows(storage) if args.mode == INSERT_MODES[0] else insert_columns(storage))
+        finally:
+            await ClickHouseManager.close_db()
+    elapsed = time.perf_counter() - started
+    peak = _max_rss_mib()
+    return {"rows": rows, "elapsed": elapsed, "peak": peak, "delta": peak - baseline}
+
+
+async def _execute_ddl(args, query: str):
+    await ClickHouseManager.init_db(args.ch_host, args.ch_port, args.ch_user, args.ch_password, args.ch_database)
+    try:
+        async with ClickHouseManager.pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query)
+    finally:
+        await ClickHouseManager.close_db()
+
+
+def _spawn(mode: str, argv: list[str]) -> dict:
+    """每种模式一个全新的子进程，互不继承内存峰值"""
+    cmd = [sys.executable, "-m", __spec__.name, *argv, "--mode", mode]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(args, argv: list[str]):
+    print(f"约 {args.rows} 行评论，每种模式独立子进程")
+    print(f"{'模式':<28}{'rows/s':>12}{'耗时(s)':>10}{'峰值RSS(MiB)':>14}{'增量(MiB)':>12}")
+    modes = list(CLEAN_MODES)
+    if args.ch_host:
+        asyncio.run(_execute_ddl(args, f"CREATE TABLE IF NOT EXISTS {_bench_table(args)} AS {args.table} ENGINE = Null"))
+        modes += INSERT_MODES
+    try:
+        for mode in modes:
+            result = _spawn(mode, argv)
+            print(f"{mode:<28}{result['rows'] / result['elapsed']:>12.0f}{result['elapsed']:>10.2f}"
+                  f"{result['peak']:>14.1f}{result['delta']:>12.1f}")
+    finally:
+        if args.ch_host:
+            asyncio.run(_execute_ddl(args, f"DROP TABLE IF EXISTS {_bench_table(args)}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=20000)
+    parser.add_argument("--ch-host")
+    parser.add_argument("--ch-port", type=int, default=9000)
+    parser.add_argument("--ch-user", default="default")
+    parser.add_argument("--ch-password", default="")
+    parser.add_argument("--ch-database", default="ods")
+    parser.add_argument("--table", default="ods.bilibili_video_comments")
+    # 内部参数：由父进程为每种模式启动子进程时传入
+    parser.add_argument("--mode", choices=CLEAN_MODES + INSERT_MODES, help=argparse.SUPPRESS)
+    argv = sys.argv[1:]
+    args = parser.parse_args(argv)
+    if args.mode:
+        print(json.dumps(asyncio.run(_run_mode(args))))
+    else:
+        run(args, argv)
+
+
+if __name__ == "__main__":
+    main()
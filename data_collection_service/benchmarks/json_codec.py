@@ -0,0 +1,75 @@
+"""
+JSON 编解码基准：标准库 json (旧实现) vs json_codec (orjson 优先)
+
+- decode: 评论页响应体 bytes -> dict (旧: response.json()，即 json.loads(text))
+- encode: Kafka 消息 dict -> UTF-8 bytes (旧: json.dumps(...).encode())
+- fallback: JSONP / HTML 包裹的响应体中提取 JSON (旧: 贪婪正则 r"\\{.*\\}" + json.loads；新: extract_json_object)
+- fallback-error-page: 含大量 '{' 但没有合法 JSON 的错误页 (贪婪正则在此类文本上回溯放大)
+
+用法 (在仓库根目录执行):
+    python -m data_collection_service.benchmarks.json_codec --comments 20 --repeat 5
+"""
+import re
+import json
+import timeit
+import argparse
+
+from data_collection_service.crawlers.utils import json_codec
+
+
+def _comment_page(comments: int) -> dict:
+    def comment(rpid: int) -> dict:
+        return {
+            "rpid": rpid, "rpid_str": str(rpid), "oid": 114514, "type": 1, "like": rpid % 997, "ctime": 1700000000 + rpid,
+            "member": {"mid": str(rpid * 7), "uname": f"用户{rpid}", "sign": "这个人很懒，什么都没有写",
+                       "level_info": {"current_level": 5}, "vip": {"vipType": 1, "vipStatus": 1}},
+            "content": {"message": "前排围观，这期视频做得太好了！" * 3, "members": [], "emote": {}, "jump_url": {}},
+            "reply_control": {"time_desc": "3天前发布", "location": "IP属地：上海"},
+        }
+    replies = [dict(comment(i), replies=[comment(i * 100 + j) for j in range(3)]) for i in range(1, comments + 1)]
+    return {"code": 0, "message": "0", "ttl": 1,
+            "data": {"cursor": {"is_end": False, "next": 2, "all_count": 12345}, "replies": replies}}
+
+
+def _old_fallback(text: str):
+    match = re.search(r"\{.*\}", text)
+    return json.loads(match.group()) if match else None
+
+
+def _bench(name: str, old, new, repeat: int):
+    old_t = min(timeit.repeat(old, number=1, repeat=repeat))
+    new_t = min(timeit.repeat(new, number=1, repeat=repeat))
+    print(f"{name:<22}{old_t * 1e6:>12.1f}{new_t * 1e6:>12.1f}{old_t / new_t:>9.1f}x")
+
+
+def run(args):
+    page = _comment_page(args.comments)
+    body = json.dumps(page, ensure_ascii=False).encode("utf-8")
+    text = body.decode("utf-8")
+    jsonp = f"__jp3({text});\n<script>window.__INITIAL_STATE__={{}}</script>"
+    error_page = "<html><style>" + "a{color:red" * args.error_braces + "</style></html>"
+    message = {"task_id": "1790000000000000000", "platform_type": 3, "resource_type": "scrape_and_store_video_comments",
+               "resource_payload": {"ids": [f"BV1{i:09d}" for i in range(50)]}, "params": {"备注": "定时调度"}}
+
+    assert json_codec.loads(body) == json.loads(text)
+    assert json_codec.extract_json_object(jsonp) == _old_fallback(jsonp)
+
+    print(f"orjson: {'已启用' if json_codec.ORJSON_AVAILABLE else '未安装 (退回标准库)'}, 响应体 {len(body) / 1024:.0f} KiB")
+    print(f"{'场景':<22}{'旧(us)':>12}{'新(us)':>12}{'加速':>10}")
+    _bench("decode", lambda: json.loads(body.decode("utf-8")), lambda: json_codec.loads(body), args.repeat)
+    _bench("encode", lambda: json.dumps(message).encode("utf-8"), lambda: json_codec.dumps_bytes(message), args.repeat)
+    _bench("fallback", lambda: _old_fallback(jsonp), lambda: json_codec.extract_json_object(jsonp), args.repeat)
+    _bench("fallback-error-page", lambda: re.search(r"\{.*\}", error_page),
+           lambda: json_codec.extract_json_object(error_page), args.repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=20)
+    parser.add_argument("--error-braces", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import re
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+_WRITE_CHUNK = 256 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    /blob: 返回固定的随机字节 (支持 Range: bytes=a-b，可按连接限速模拟 CDN 单连接带宽)
+    其他路径: 返回一个小 JSON (模拟 B站 API 响应)
+    """
+    protocol_version = "HTTP/1.1"
+    server: "LocalServer"
+
+    def setup(self):
+        # 每个新连接先等待 handshake_ms，模拟真实网络下 TCP + TLS 握手的往返耗时
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._send_blob(head=True) if self.path.startswith("/blob") else self._send_json(head=True)
+
+    def do_GET(self):
+        self._send_blob() if self.path.startswith("/blob") else self._send_json()
+
+    def _send_json(self, head: bool = False):
+        body = self.server.json_body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_blob(self, head: bool = False):
+        blob = self.server.blob
+        start, end, status = 0, len(blob) - 1, 200
+        match = _RANGE_RE.fullmatch((self.headers.get("Range") or "").strip())
+        if match and self.server.range_support:
+            start = int(match[1])
+            end = min(int(match[2]) if match[2] else len(blob) - 1, len(blob) - 1)
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(blob)}")
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if head:
+            return
+
+        view = memoryview(blob)[start:end + 1]
+        rate = self.server.per_conn_bytes_per_sec
+        for i in range(0, len(view), _WRITE_CHUNK):
+            chunk = view[i:i + _WRITE_CHUNK]
+            started = time.monotonic()
+            self.wfile.write(chunk)
+            if rate:
+                delay = len(chunk) / rate - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+
+class LocalServer(ThreadingHTTPServer):
+    """
+    基准测试用的本地 HTTP 服务 (每个连接一个线程，HTTP/1.1 长连接)
+    用法:
+        with LocalServer(blob_size=64 << 20, per_conn_mibps=20) as server:
+            url = server.url("/blob")
+    """
+    daemon_threads = True
+
+    def __init__(self, blob_size: int = 0, per_conn_mibps: float = 0, range_support: bool = True,
+                 json_payload: Optional[dict] = None, handshake_ms: float = 0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.blob = os.urandom(blob_size)
+        self.per_conn_bytes_per_sec = per_conn_mibps * 1024 * 1024
+        self.range_support = range_support
+        self.handshake_delay = handshake_ms / 1000
+        self.json_body = json.dumps(json_payload or {"code": 0, "message": "0", "data": {}}).encode()
+        self._thread: Optional[threading.Thread] = None
+
+    def url(self, path: str) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self) -> "LocalServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,81 @@
+"""
+分段下载基准：单连接流式下载 vs 多连接 Range 分段下载 (SegmentedDownloader)
+
+在本地起一个支持 Range 的 HTTP 服务，下载同一个随机文件并校验 sha256。
+--per-conn-mibps 为每个连接限速，用来模拟 CDN 的单连接带宽上限 (0 表示不限速，只受本机收发能力限制)
+
+用法 (在仓库根目录执行):
+    python -m data_collection_service.benchmarks.range_downloader --size-mib 40 --repeat 3
+    python -m data_collection_service.benchmarks.range_downloader --size-mib 40 --per-conn-mibps 10 --concurrency 2 4 8
+"""
+import os
+import time
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import statistics
+
+from data_collection_service.app.services.range_downloader import SegmentedDownloader
+from data_collection_service.benchmarks.local_server import LocalServer
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+async def _timed(download) -> float:
+    started = time.perf_counter()
+    ok = await download()
+    elapsed = time.perf_counter() - started
+    if not ok:
+        raise RuntimeError("下载失败")
+    return elapsed
+
+
+async def run(args):
+    size = args.size_mib * 1024 * 1024
+    with LocalServer(blob_size=size, per_conn_mibps=args.per_conn_mibps) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        expected = hashlib.sha256(server.blob).hexdigest()
+        url = server.url("/blob")
+        file_path = os.path.join(tmp, "stream.m4s")
+        headers = {"User-Agent": "bench"}
+
+        cases = [("single", None)] + [(f"segmented x{c}", c) for c in args.concurrency]
+        print(f"文件 {args.size_mib} MiB, 单连接限速 {args.per_conn_mibps or '不限'} MiB/s, 每项 {args.repeat} 次取中位数")
+        print(f"{'模式':<16}{'MiB/s':>10}{'耗时(s)':>10}  校验")
+        for name, concurrency in cases:
+            downloader = SegmentedDownloader()
+            downloader.segment_size = args.segment_mib * 1024 * 1024
+            if concurrency:
+                downloader.concurrency = concurrency
+            try:
+                timings = []
+                for _ in range(args.repeat):
+                    if concurrency:
+                        download = lambda: downloader.download([url], file_path, headers=headers)
+                    else:
+                        download = lambda: downloader._download_single([url], file_path, headers, None)
+                    timings.append(await _timed(download))
+                    checksum_ok = _sha256(file_path) == expected
+                    os.remove(file_path)
+            finally:
+                await downloader.close()
+            median = statistics.median(timings)
+            print(f"{name:<16}{args.size_mib / median:>10.1f}{median:>10.2f}  {'ok' if checksum_ok else 'MISMATCH'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mib", type=int, default=40)
+    parser.add_argument("--segment-mib", type=int, default=4)
+    parser.add_argument("--per-conn-mibps", type=float, default=0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4])
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
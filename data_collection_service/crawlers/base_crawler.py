@@ -1,11 +1,16 @@
 import httpx
-import json
 import asyncio
-import re
 
 from httpx import Response
 
 from data_collection_service.crawlers.utils.logger import logger
+from data_collection_service.crawlers.utils import json_codec
+from data_collection_service.crawlers.utils.rate_limiter import endpoint_family
+from data_collection_service.crawlers.utils.resilience import (
+    backoff_delay,
+    RISK_CONTROL_API_CODES,
+    RISK_CONTROL_HTTP_STATUS,
+)
 from data_collection_service.crawlers.utils.api_exceptions import (
     APIError,
     APIConnectionError,
@@ -16,6 +21,7 @@ from data_collection_service.crawlers.utils.api_exceptions import (
     APINotFoundError,
     APIRateLimitError,
     APIRetryExhaustedError,
+    APIRiskControlError,
 )
 
 
@@ -32,6 +38,15 @@ class BaseCrawler:
             timeout: int = 10,
             max_tasks: int = 50,
             crawler_headers: dict = {},
+            http2: bool = False,
+            keepalive_expiry: float = 5.0,
+            rate_limiter=None,
+            rate_limit_platform: str = "default",
+            rate_limit_identity: str = None,
+            circuit_breaker=None,
+            risk_reporter=None,
+            backoff_base: float = 1.0,
+            backoff_cap: float = 30.0,
     ):
         if isinstance(proxies, dict):
             self.proxies = proxies
@@ -42,18 +57,40 @@ class BaseCrawler:
         # 爬虫请求头 / Crawler request header
         self.crawler_headers = crawler_headers or {}
 
+        # 共享限流器 (需实现 acquire(platform, family, identity)) / Shared rate limiter
+        # 每次发出请求前按 (平台, 接口族, 身份) 获取令牌 / Acquire a token per (platform, endpoint family, identity)
+        self.rate_limiter = rate_limiter
+        self.rate_limit_platform = rate_limit_platform
+        self.rate_limit_identity = rate_limit_identity
+
+        # 熔断器注册表 (需实现 check/record_success/record_risk_control) / Circuit breaker registry
+        # 命中风控 (HTTP 412, code -352/-412) 时打开熔断并通过 risk_reporter(identity) 上报
+        self.circuit_breaker = circuit_breaker
+        self.risk_reporter = risk_reporter
+
+        # 重试退避: 指数退避 + 全抖动 / Exponential backoff with full jitter
+        self._backoff_base = backoff_base
+        self._backoff_cap = backoff_cap
+
         # 异步的任务数 / Number of asynchronous tasks
         self._max_tasks = max_tasks
         self.semaphore = asyncio.Semaphore(max_tasks)
 
         # 限制最大连接数 / Limit the maximum number of connections
         self._max_connections = max_connections
-        self.limits = httpx.Limits(max_connections=max_connections)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
 
-        # 业务逻辑重试次数 / Business logic retry count
+        # 业务逻辑请求次数 (含首次请求)，至少为 1 / Business logic attempts (including the first one), at least 1
+        if max_retries < 1:
+            raise ValueError(f"max_retries 至少为 1 (包含首次请求)，当前为 {max_retries}")
         self._max_retries = max_retries
         # 底层连接重试次数 / Underlying connection retry count
-        self.atransport = httpx.AsyncHTTPTransport(retries=max_retries)
+        # 注意：显式传入 transport 时 httpx 会忽略 Client 上的 limits/http2，必须挂在 transport 上才生效
+        self.atransport = httpx.AsyncHTTPTransport(retries=max_retries, limits=self.limits, http2=http2)
 
         # 超时等待时间 / Timeout waiting time
         self._timeout = timeout
@@ -64,6 +101,7 @@ class BaseCrawler:
             proxies=self.proxies,
             timeout=self.timeout,
             limits=self.limits,
+            http2=http2,
             transport=self.atransport,
         )
 
@@ -76,7 +114,10 @@ class BaseCrawler:
         Returns:
             Response: 原始响应对象 (Raw response object)
         """
-        return await self.get_fetch_data(endpoint)
+        response = await self.get_fetch_data(endpoint)
+        # 原始响应不经过业务码检查，拿到成功响应即视为通过 (关闭 half-open 熔断)
+        self.record_success(endpoint)
+        return response
 
     async def fetch_get_json(self, endpoint: str) -> dict:
         """获取 JSON 数据 (Get JSON data)
@@ -88,7 +129,7 @@ class BaseCrawler:
             dict: 解析后的JSON数据 (Parsed JSON data)
         """
         response = await self.get_fetch_data(endpoint)
-        return self.parse_json(response)
+        return await self.check_api_code(endpoint, self.parse_json(response))
 
     async def fetch_post_json(self, endpoint: str, params: dict = {}, data=None) -> dict:
         """获取 JSON 数据 (Post JSON data)
@@ -100,7 +141,16 @@ class BaseCrawler:
             dict: 解析后的JSON数据 (Parsed JSON data)
         """
         response = await self.post_fetch_data(endpoint, params, data)
-        return self.parse_json(response)
+        return await self.check_api_code(endpoint, self.parse_json(response))
+
+    async def check_api_code(self, url: str, data: dict) -> dict:
+        """检查业务码中的风控信号 (Check the API code for risk-control signals)"""
+        code = data.get("code") if isinstance(data, dict) else None
+        if code in RISK_CONTROL_API_CODES:
+            await self.record_risk_control(url)
+            raise APIRiskControlError(f"接口返回风控码 {code}: {url}")
+        self.record_success(url)
+        return data
 
     def parse_json(self, response: Response) -> dict:
         """解析JSON响应对象 (Parse JSON response object)
@@ -117,15 +167,14 @@ class BaseCrawler:
                 and response.status_code == 200
         ):
             try:
-                return response.json()
-            except json.JSONDecodeError as e:
-                # 尝试使用正则表达式匹配response.text中的json数据
-                match = re.search(r"\{.*\}", response.text)
-                try:
-                    return json.loads(match.group())
-                except json.JSONDecodeError as e:
+                return json_codec.loads(response.content)
+            except json_codec.JSONDecodeError as e:
+                # 尝试从response.text中线性提取首个完整的json对象 (兼容 JSONP/HTML 包裹)
+                data = json_codec.extract_json_object(response.text)
+                if data is None:
                     logger.error("解析 {0} 接口 JSON 失败： {1}".format(response.url, e))
                     raise APIResponseError("解析JSON数据失败")
+                return data
 
         else:
             if isinstance(response, Response):
@@ -137,48 +186,101 @@ class BaseCrawler:
 
             raise APIResponseError("获取数据失败")
 
-    async def get_fetch_data(self, url: str):
-        """
-        获取GET端点数据 (Get GET endpoint data)
+    async def acquire_rate_limit(self, url: str):
+        """按接口族获取限流令牌 (Acquire a rate-limit token for the endpoint family)"""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(self.rate_limit_platform, endpoint_family(url), self.rate_limit_identity)
+
+    def check_circuit(self, url: str):
+        """熔断打开时快速失败 (Fail fast while the circuit is open)"""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.check(self.rate_limit_platform, endpoint_family(url), self.rate_limit_identity)
+
+    def record_success(self, url: str):
+        """记录请求成功，关闭 half-open 熔断 (Record a success and close a half-open circuit)"""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success(self.rate_limit_platform, endpoint_family(url), self.rate_limit_identity)
+
+    async def record_risk_control(self, url: str):
+        """记录风控命中并上报身份 (Record a risk-control hit and report the identity)"""
+        if self.circuit_breaker is not None:
+            await self.circuit_breaker.record_risk_control(
+                self.rate_limit_platform, endpoint_family(url), self.rate_limit_identity, self.risk_reporter
+            )
 
-        Args:
-            url (str): 端点URL (Endpoint URL)
+    async def _backoff(self, attempt: int):
+        await asyncio.sleep(backoff_delay(attempt, self._backoff_base, self._backoff_cap))
 
-        Returns:
-            response: 响应内容 (Response content)
+    async def _request_with_retry(self, method: str, url: str, **kwargs) -> Response:
+        """
+        带熔断、限流与退避重试的请求 (Request with circuit breaker, rate limit and backoff retry)
+
+        - 熔断只在逻辑请求开始前检查一次：half-open 状态下放行的探测请求在重试过程中不会被自己拦下
+        - 网络异常 / 429 / 5xx / 空响应: 指数退避 + 全抖动后重试，次数用尽后抛出对应异常
+        - 风控 (HTTP 412): 打开熔断并上报身份，立即抛出 APIRiskControlError，不再重试
         """
+        self.check_circuit(url)
         for attempt in range(self._max_retries):
+            is_last = attempt == self._max_retries - 1
+            await self.acquire_rate_limit(url)
             try:
-                response = await self.aclient.get(url, follow_redirects=True)
-                if not response.text.strip() or not response.content:
-                    error_message = "第 {0} 次响应内容为空, 状态码: {1}, URL:{2}".format(attempt + 1,
-                                                                                         response.status_code,
-                                                                                         response.url)
-
-                    logger.warning(error_message)
-
-                    if attempt == self._max_retries - 1:
-                        raise APIRetryExhaustedError(
-                            "获取端点数据失败, 次数达到上限"
-                        )
-
-                    await asyncio.sleep(self._timeout)
-                    continue
+                response = await self.aclient.request(method, url, follow_redirects=True, **kwargs)
+            except httpx.RequestError as e:
+                if is_last:
+                    raise APIConnectionError("连接端点失败，检查网络环境或代理：{0} 代理：{1} 类名：{2}"
+                                             .format(url, self.proxies, self.__class__.__name__)
+                                             )
+                logger.warning("第 {0} 次连接端点失败: {1}, URL:{2}".format(attempt + 1, e, url))
+                await self._backoff(attempt)
+                continue
+
+            if response.status_code in RISK_CONTROL_HTTP_STATUS:
+                await self.record_risk_control(url)
+                raise APIRiskControlError(f"HTTP Status Code {response.status_code}")
+
+            if response.status_code == 429 and not is_last:
+                logger.warning("第 {0} 次请求被限流 (429), URL:{1}".format(attempt + 1, url))
+                await self._backoff(attempt)
+                continue
+
+            if response.status_code >= 500 and not is_last:
+                logger.warning("第 {0} 次请求服务端错误 ({1}), URL:{2}".format(attempt + 1, response.status_code, url))
+                await self._backoff(attempt)
+                continue
+
+            if not response.text.strip() or not response.content:
+                error_message = "第 {0} 次响应内容为空, 状态码: {1}, URL:{2}".format(attempt + 1,
+                                                                                     response.status_code,
+                                                                                     response.url)
+
+                logger.warning(error_message)
+
+                if is_last:
+                    raise APIRetryExhaustedError(
+                        "获取端点数据失败, 次数达到上限"
+                    )
+
+                await self._backoff(attempt)
+                continue
 
+            try:
                 # logger.info("响应状态码: {0}".format(response.status_code))
                 response.raise_for_status()
-                return response
-
-            except httpx.RequestError:
-                raise APIConnectionError("连接端点失败，检查网络环境或代理：{0} 代理：{1} 类名：{2}"
-                                         .format(url, self.proxies, self.__class__.__name__)
-                                         )
-
             except httpx.HTTPStatusError as http_error:
                 self.handle_http_status_error(http_error, url, attempt + 1)
+            return response
+
+    async def get_fetch_data(self, url: str):
+        """
+        获取GET端点数据 (Get GET endpoint data)
 
-            except APIError as e:
-                e.display_error()
+        Args:
+            url (str): 端点URL (Endpoint URL)
+
+        Returns:
+            response: 响应内容 (Response content)
+        """
+        return await self._request_with_retry("GET", url)
 
     async def post_fetch_data(self, url: str, params: dict = {}, data=None):
         """
@@ -191,44 +293,12 @@ class BaseCrawler:
         Returns:
             response: 响应内容 (Response content)
         """
-        for attempt in range(self._max_retries):
-            try:
-                response = await self.aclient.post(
-                    url,
-                    json=None if not params else dict(params),
-                    data=None if not data else data,
-                    follow_redirects=True
-                )
-                if not response.text.strip() or not response.content:
-                    error_message = "第 {0} 次响应内容为空, 状态码: {1}, URL:{2}".format(attempt + 1,
-                                                                                         response.status_code,
-                                                                                         response.url)
-
-                    logger.warning(error_message)
-
-                    if attempt == self._max_retries - 1:
-                        raise APIRetryExhaustedError(
-                            "获取端点数据失败, 次数达到上限"
-                        )
-
-                    await asyncio.sleep(self._timeout)
-                    continue
-
-                # logger.info("响应状态码: {0}".format(response.status_code))
-                response.raise_for_status()
-                return response
-
-            except httpx.RequestError:
-                raise APIConnectionError(
-                    "连接端点失败，检查网络环境或代理：{0} 代理：{1} 类名：{2}".format(url, self.proxies,
-                                                                                   self.__class__.__name__)
-                )
-
-            except httpx.HTTPStatusError as http_error:
-                self.handle_http_status_error(http_error, url, attempt + 1)
-
-            except APIError as e:
-                e.display_error()
+        return await self._request_with_retry(
+            "POST",
+            url,
+            json=None if not params else dict(params),
+            data=None if not data else data,
+        )
 
     async def head_fetch_data(self, url: str):
         """
@@ -241,9 +311,12 @@ class BaseCrawler:
             response: 响应内容 (Response content)
         """
         try:
+            self.check_circuit(url)
+            await self.acquire_rate_limit(url)
             response = await self.aclient.head(url)
             # logger.info("响应状态码: {0}".format(response.status_code))
             response.raise_for_status()
+            self.record_success(url)
             return response
 
         except httpx.RequestError:
@@ -0,0 +1,81 @@
+import os
+import time
+import asyncio
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from data_collection_service.crawlers.bilibili.web_crawler import BilibiliWebCrawler
+
+
+class _Lease:
+    """一次身份租约：browser_id + 组装好的请求头 + 用量"""
+    __slots__ = ("browser_id", "kwargs", "used", "leased_at")
+
+    def __init__(self, browser_id: str, kwargs: dict):
+        self.browser_id = browser_id
+        self.kwargs = kwargs
+        self.used = 0
+        self.leased_at = time.monotonic()
+
+
+class CrawlSession:
+    """
+    B站采集会话
+    职责:
+    1. 一次长链路采集 (如单视频 300 页评论) 只向 Cookie 池租用固定数量的 browser_id，请求头在进程内缓存复用，
+       不再每个请求都执行一次调度 Lua + HGET
+    2. 租约按请求次数 (max_requests) 或时长 (ttl) 到期，到期后自动归还并换租新身份；
+       身份触发风控 (熔断打开) 时立即归还并换租，不再把请求继续派给被拦截的身份
+    3. 会话结束时归还全部租约，冷却时间按实际用量计算
+    用法:
+        async with crawler.crawl_session(identities=2) as session:
+            await crawler.fetch_video_comments_new(bvid, pn, aid=aid, session=session)
+    """
+
+    def __init__(self, crawler: "BilibiliWebCrawler", identities: int = 1,
+                 max_requests: Optional[int] = None, ttl: Optional[float] = None):
+        self.crawler = crawler
+        self.identities = max(1, identities)
+        self.max_requests = max_requests or int(os.getenv("CRAWL_SESSION_MAX_REQUESTS", 200))
+        self.ttl = ttl or float(os.getenv("CRAWL_SESSION_TTL", 300))
+        self._leases: list[_Lease] = []
+        self._cursor = 0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "CrawlSession":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _is_expired(self, lease: _Lease) -> bool:
+        return (
+            lease.used >= self.max_requests
+            or time.monotonic() - lease.leased_at >= self.ttl
+            or self.crawler.is_identity_tripped(lease.browser_id)
+        )
+
+    async def get_headers(self) -> dict:
+        """
+        取一份请求头 (与 get_bilibili_headers 的返回结构一致)，多个身份之间轮转使用
+        """
+        async with self._lock:
+            expired = [lease for lease in self._leases if self._is_expired(lease)]
+            for lease in expired:
+                self._leases.remove(lease)
+                await self.crawler.release_identity(lease.browser_id, lease.used)
+            while len(self._leases) < self.identities:
+                browser_id, kwargs = await self.crawler.lease_identity(int(self.ttl))
+                self._leases.append(_Lease(browser_id, kwargs))
+
+            lease = self._leases[self._cursor % len(self._leases)]
+            self._cursor += 1
+            lease.used += 1
+            return lease.kwargs
+
+    async def close(self):
+        """归还会话持有的全部租约"""
+        async with self._lock:
+            leases, self._leases = self._leases, []
+        for lease in leases:
+            await self.crawler.release_identity(lease.browser_id, lease.used)
@@ -1,5 +1,5 @@
 from urllib.parse import urlencode
-from data_collection_service.crawlers.bilibili import wrid
+from data_collection_service.crawlers.bilibili.wbi_signer import wbi_signer
 from data_collection_service.crawlers.utils.logger import logger
 from data_collection_service.crawlers.bilibili.endpoints import BilibiliAPIEndpoints
 
@@ -58,44 +58,29 @@ class EndpointGenerator:
 class WridManager:
     @classmethod
     async def get_encode_query(cls, params: dict) -> str:
-        params['wts'] = params['wts'] + "ea1db124af3c7062474693fa704f4ff8"
-        params = dict(sorted(params.items()))  # 按照 key 重排参数
-        # 过滤 value 中的 "!'()*" 字符
-        params = {
-            k: ''.join(filter(lambda chr: chr not in "!'()*", str(v)))
-            for k, v
-            in params.items()
-        }
-        query = urlencode(params)  # 序列化参数
-        return query
+        # wts 拼接 mixin key、按 key 重排、过滤 value 中的 "!'()*" 字符后序列化 (见 wbi_signer)
+        return wbi_signer.encode_query(params)
 
     @classmethod
     async def wrid_model_endpoint(cls, params: dict) -> str:
-        wts = params["wts"]
-        encode_query = await cls.get_encode_query(params)
-        # 获取w_rid参数
-        w_rid = wrid.get_wrid(e=encode_query)
-        params["wts"] = wts
-        params["w_rid"] = w_rid
-        return "&".join(f"{k}={v}" for k, v in params.items())
+        # 获取w_rid参数 (hashlib 实现，与 wrid.get_wrid 结果一致)
+        return wbi_signer.sign(params)
+
+# BV号转为对应av号 (2024 年后的新算法，兼容 aid 超过 2^32 的新稿件，老稿件结果与旧算法一致)
+_BV_XOR_CODE = 23442827791579
+_BV_MASK_CODE = 2251799813685247
+_BV_ALPHABET = "FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf"
+_BV_INDEX = {c: i for i, c in enumerate(_BV_ALPHABET)}
+
 
-# BV号转为对应av号
 async def bv2av(bv_id: str) -> int:
-    table = "fZodR9XQDSUm21yCkr6zBqiveYah8bt4xsWpHnJE7jL5VG3guMTKNPAwcF"
-    s = [11, 10, 3, 8, 4, 6, 2, 9, 5, 7]
-    xor = 177451812
-    add_105 = 8728348608
-    add_all = 8728348608 - (2 ** 31 - 1) - 1
-    tr = [0] * 128
-    for i in range(58):
-        tr[ord(table[i])] = i
-    r = 0
-    for i in range(6):
-        r += tr[ord(bv_id[s[i]])] * (58 ** i)
-    add = add_105
-    if r < add:
-        add = add_all
-    aid = (r - add) ^ xor
+    bv = list(bv_id)
+    bv[3], bv[9] = bv[9], bv[3]
+    bv[4], bv[7] = bv[7], bv[4]
+    tmp = 0
+    for c in bv[3:]:
+        tmp = tmp * 58 + _BV_INDEX[c]
+    aid = (tmp & _BV_MASK_CODE) ^ _BV_XOR_CODE
     return aid
 
 # 响应分析
@@ -2,14 +2,20 @@ import asyncio  # 异步I/O
 import os  # 系统操作
 import time  # 时间操作
 import yaml  # 配置文件
+from contextlib import asynccontextmanager
+from typing import Optional
 
-# 基础爬虫客户端和哔哩哔哩API端点
-from data_collection_service.crawlers.base_crawler import BaseCrawler
+# 哔哩哔哩API端点及爬虫基础设施 (客户端池、限流器)
 from data_collection_service.crawlers.bilibili.endpoints import BilibiliAPIEndpoints
 from data_collection_service.app.db.redis_client import redis_client_mgr
 from data_collection_service.app.db.cookie_scheduler import cookie_scheduler_mgr
+from data_collection_service.crawlers.utils.client_pool import crawler_client_pool
+from data_collection_service.app.db.rate_limiter import redis_rate_limiter
+from data_collection_service.crawlers.utils.resilience import circuit_breakers
+from data_collection_service.crawlers.utils.logger import logger
 # 哔哩哔哩工具类
 from data_collection_service.crawlers.bilibili.utils import EndpointGenerator, bv2av, ResponseAnalyzer
+from data_collection_service.crawlers.bilibili.crawl_session import CrawlSession
 # 数据请求模型
 from data_collection_service.crawlers.bilibili.models import UserPostVideos, UserProfile, UserRelation, ComPopular, UserDynamic, PlayUrl
 
@@ -38,28 +44,42 @@ class BilibiliWebCrawler:
         return redis_client_mgr.pool
 
     # 优先从Redis获取cookie，如无法获取再从配置文件读取哔哩哔哩请求头
-    async def get_bilibili_headers(self):
-        bili_config = config['TokenManager']['bilibili']
+    async def get_bilibili_headers(self, session: Optional[CrawlSession] = None):
+        # 采集会话内直接复用已租用身份的请求头，不再逐请求调度 Cookie
+        if session is not None:
+            return await session.get_headers()
+
         current_cookie = None
+        browser_id = None
         # 1. 尝试从 Redis 获取最新的 Cookie
         try:
-            self.current_browser_id = await cookie_scheduler_mgr.get_optimal_browser_id(
+            browser_id = await cookie_scheduler_mgr.get_optimal_browser_id(
                 redis_pool=self.redis,
                 platform=self.platform,
                 base_cooldown=10
             )
-            if self.current_browser_id:
-                hash_key = f"cookie_info:{self.platform}:{self.current_browser_id}"
-                cookie_bytes = await self.redis.hget(hash_key, "cookie_str")
-                if cookie_bytes:
-                    current_cookie = cookie_bytes.decode('utf-8') if isinstance(cookie_bytes, bytes) else cookie_bytes
+            self.current_browser_id = browser_id
+            if browser_id:
+                current_cookie = await self._get_cookie(browser_id)
             else:
                 # Redis 没数据，使用配置文件的默认值
-                current_cookie = bili_config["headers"]["cookie"]
+                current_cookie = config['TokenManager']['bilibili']["headers"]["cookie"]
         except Exception as e:
             print(f"Redis 读取失败，降级使用本地配置: {e}")
-            current_cookie = bili_config["headers"]["cookie"]
+            current_cookie = config['TokenManager']['bilibili']["headers"]["cookie"]
 
+        return self._build_headers(current_cookie, browser_id)
+
+    async def _get_cookie(self, browser_id: str) -> Optional[str]:
+        hash_key = f"cookie_info:{self.platform}:{browser_id}"
+        cookie_bytes = await self.redis.hget(hash_key, "cookie_str")
+        if cookie_bytes:
+            return cookie_bytes.decode('utf-8') if isinstance(cookie_bytes, bytes) else cookie_bytes
+        return None
+
+    @staticmethod
+    def _build_headers(current_cookie: Optional[str], browser_id: Optional[str]) -> dict:
+        bili_config = config['TokenManager']['bilibili']
         kwargs = {
             "headers": {
                 "accept-language": bili_config["headers"]["accept-language"],
@@ -69,18 +89,85 @@ class BilibiliWebCrawler:
                 "cookie": current_cookie,
             },
             "proxies": {"http://": bili_config["proxies"]["http"], "https://": bili_config["proxies"]["https"]},
+            # 随请求头一起返回本次调度到的身份，避免并发请求时共享 self.current_browser_id 串号
+            "browser_id": browser_id or "local_config",
         }
         return kwargs
 
+    def crawl_session(self, identities: int = 1, max_requests: Optional[int] = None,
+                      ttl: Optional[float] = None) -> CrawlSession:
+        """
+        创建采集会话：租用 identities 个身份，按请求预算/时长轮换，退出上下文时归还
+        """
+        return CrawlSession(self, identities=identities, max_requests=max_requests, ttl=ttl)
+
+    async def lease_identity(self, lease_ttl: int) -> tuple[str, dict]:
+        """
+        为采集会话租用一个身份并组装请求头，Redis 不可用或池为空时降级为本地配置
+        """
+        bili_config = config['TokenManager']['bilibili']
+        try:
+            browser_id = await cookie_scheduler_mgr.lease_browser_id(
+                redis_pool=self.redis,
+                platform=self.platform,
+                base_cooldown=10,
+                lease_ttl=lease_ttl
+            )
+            if browser_id:
+                current_cookie = await self._get_cookie(browser_id)
+                return browser_id, self._build_headers(current_cookie, browser_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis 租用身份失败，降级使用本地配置: {e}")
+        return "local_config", self._build_headers(bili_config["headers"]["cookie"], None)
+
+    async def release_identity(self, browser_id: str, used_requests: int):
+        """归还会话租用的身份，冷却时间按本次租期的请求数计算，并按风控失败次数放大"""
+        try:
+            await cookie_scheduler_mgr.release_browser_id(
+                redis_pool=self.redis,
+                platform=self.platform,
+                browser_id=browser_id,
+                used_requests=used_requests,
+                base_cooldown=10,
+                cooldown_per_request=float(os.getenv("CRAWL_SESSION_COOLDOWN_PER_REQUEST", 0.5))
+            )
+        except Exception as e:
+            logger.error(f"❌ Redis 归还身份失败: {e}")
+
+    def is_identity_tripped(self, browser_id: str) -> bool:
+        """该身份是否因风控处于熔断中 (采集会话据此提前归还并换租)"""
+        return circuit_breakers.is_identity_open(self.platform, browser_id)
+
+    @asynccontextmanager
+    async def _pooled_crawler(self, kwargs: dict):
+        """
+        从进程级客户端池借用长连接爬虫对象，按 (代理, browser_id) 复用 TCP/TLS 连接
+        客户端每次发请求前都会向 Redis 分布式令牌桶申请 (平台, 接口族, browser_id) 维度的令牌，
+        并在同一粒度上熔断：命中风控后该身份在熔断期内快速失败
+        """
+        async with crawler_client_pool.acquire(
+            proxies=kwargs["proxies"],
+            headers=kwargs["headers"],
+            identity=kwargs.get("browser_id"),
+            rate_limiter=redis_rate_limiter,
+            platform=self.platform,
+            circuit_breaker=circuit_breakers,
+            risk_reporter=self._report_risk_control,
+        ) as crawler:
+            yield crawler
+
+    async def _report_risk_control(self, browser_id: str):
+        """熔断器命中风控时回调：累加该身份的 fail_count，调度 Lua 会按 2^fail_count 放大其冷却时间"""
+        await cookie_scheduler_mgr.report_failure(self.redis, self.platform, browser_id)
+
     "-------------------------------------------------------handler接口列表-------------------------------------------------------"
 
     # 获取单个视频详情信息
-    async def fetch_one_video(self, bv_id: str) -> dict:
+    async def fetch_one_video(self, bv_id: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.POST_DETAIL}?bvid={bv_id}"
             # 发送请求，获取请求响应结果
@@ -88,12 +175,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取视频流地址
-    async def fetch_video_playurl(self, bv_id: str, cid: str, qn: str = "64") -> dict:
+    async def fetch_video_playurl(self, bv_id: str, cid: str, qn: str = "64", session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 通过模型生成基本请求参数
             params = PlayUrl(bvid=bv_id, cid=cid, qn=qn)
             # 创建请求endpoint
@@ -104,17 +190,16 @@ class BilibiliWebCrawler:
         return response
 
     # 获取用户发布视频作品数据
-    async def fetch_user_post_videos(self, uid: str, pn: int) -> dict:
+    async def fetch_user_post_videos(self, uid: str, pn: int, session: Optional[CrawlSession] = None) -> dict:
         """
         :param uid: 用户uid
         :param pn: 页码
         :return:
         """
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 通过模型生成基本请求参数
             params = UserPostVideos(mid=uid, pn=pn)
             # 创建请求endpoint
@@ -125,12 +210,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取用户所有收藏夹信息
-    async def fetch_collect_folders(self, uid: str) -> dict:
+    async def fetch_collect_folders(self, uid: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.COLLECT_FOLDERS}?up_mid={uid}"
             # 发送请求，获取请求响应结果
@@ -140,29 +224,27 @@ class BilibiliWebCrawler:
         return result_dict
 
     # 获取指定收藏夹内视频数据
-    async def fetch_folder_videos(self, folder_id: str, pn: int) -> dict:
+    async def fetch_folder_videos(self, folder_id: str, pn: int, session: Optional[CrawlSession] = None) -> dict:
         """
         :param folder_id: 收藏夹id-- 可从<获取用户所有收藏夹信息>获得
         :param pn: 页码
         :return:
         """
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
         # 发送请求，获取请求响应结果
-        async with base_crawler as crawler:
+        async with self._pooled_crawler(kwargs) as crawler:
             endpoint = f"{BilibiliAPIEndpoints.COLLECT_VIDEOS}?media_id={folder_id}&pn={pn}&ps=20&keyword=&order=mtime&type=0&tid=0&platform=web"
             response = await crawler.fetch_get_json(endpoint)
         return response
 
     # 获取指定用户的信息
-    async def fetch_user_profile(self, uid: str) -> dict:
+    async def fetch_user_profile(self, uid: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 通过模型生成基本请求参数
             params = UserProfile(mid=uid)
             # 创建请求endpoint
@@ -173,12 +255,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取综合热门视频信息
-    async def fetch_com_popular(self, pn: int) -> dict:
+    async def fetch_com_popular(self, pn: int, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 通过模型生成基本请求参数
             params = ComPopular(pn=pn)
             # 创建请求endpoint
@@ -189,14 +270,13 @@ class BilibiliWebCrawler:
         return response
 
     # 获取指定视频的评论
-    async def fetch_video_comments(self, bv_id: str, pn: int) -> dict:
+    async def fetch_video_comments(self, bv_id: str, pn: int, session: Optional[CrawlSession] = None) -> dict:
         # 评论排序 -- 1:按点赞数排序. 0:按时间顺序排序
         sort = 1
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.VIDEO_COMMENTS}?type=1&oid={bv_id}&sort={sort}&nohot=0&ps=20&pn={pn}"
             # 发送请求，获取请求响应结果
@@ -204,7 +284,7 @@ class BilibiliWebCrawler:
         return response
 
     # 获取指定视频评论：新方法
-    async def fetch_video_comments_new(self, bv_id: str, pn: int, aid: int = None) -> dict:
+    async def fetch_video_comments_new(self, bv_id: str, pn: int, aid: int = None, session: Optional[CrawlSession] = None) -> dict:
         # 如果未传入aid，则自动转换（减少重复转换开销）
         if not aid:
             aid = await self.bv_to_aid(bv_id)
@@ -212,16 +292,15 @@ class BilibiliWebCrawler:
         # 评论排序 -- 1:按点赞数排序. 0:按时间顺序排序
         sort = 0  # 采集全量评论建议用时间排序，防止漏数据
 
-        kwargs = await self.get_bilibili_headers()
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        async with self._pooled_crawler(kwargs) as crawler:
             # 注意：oid 必须赋值为 aid
             endpoint = f"{BilibiliAPIEndpoints.VIDEO_COMMENTS}?type=1&oid={aid}&sort={sort}&nohot=0&ps=20&pn={pn}"
             response = await crawler.fetch_get_json(endpoint)
         return response
 
     # 获取视频下指定评论的回复
-    async def fetch_comment_reply(self, bv_id: str, pn: int, rpid: str) -> dict:
+    async def fetch_comment_reply(self, bv_id: str, pn: int, rpid: str, session: Optional[CrawlSession] = None) -> dict:
         """
         :param bv_id: 目标视频bv号
         :param pn: 页码
@@ -229,10 +308,9 @@ class BilibiliWebCrawler:
         :return:
         """
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.COMMENT_REPLY}?type=1&oid={bv_id}&root={rpid}&&ps=20&pn={pn}"
             # 发送请求，获取请求响应结果
@@ -240,25 +318,23 @@ class BilibiliWebCrawler:
             return response
 
         # 获取视频下指定评论的回复:新方法
-    async def fetch_comment_reply_new(self, bv_id: str, pn: int, rpid: str, aid: int = None) -> dict:
+    async def fetch_comment_reply_new(self, bv_id: str, pn: int, rpid: str, aid: int = None, session: Optional[CrawlSession] = None) -> dict:
         if not aid:
             aid = await self.bv_to_aid(bv_id)
 
-        kwargs = await self.get_bilibili_headers()
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        async with self._pooled_crawler(kwargs) as crawler:
             # oid 必须赋值为 aid
             endpoint = f"{BilibiliAPIEndpoints.COMMENT_REPLY}?type=1&oid={aid}&root={rpid}&ps=20&pn={pn}"
             response = await crawler.fetch_get_json(endpoint)
             return response
 
     # 获取指定用户动态
-    async def fetch_user_dynamic(self, uid: str, offset: str) -> dict:
+    async def fetch_user_dynamic(self, uid: str, offset: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 通过模型生成基本请求参数
             params = UserDynamic(host_mid=uid, offset=offset)
             # 创建请求endpoint
@@ -270,12 +346,11 @@ class BilibiliWebCrawler:
         return response
 
         # 获取指定用户的关系信息
-    async def fetch_user_relation(self, uid: str) -> dict:
+    async def fetch_user_relation(self, uid: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 通过模型生成基本请求参数
             params = UserRelation(vmid=uid)
             # 创建请求endpoint
@@ -286,12 +361,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取视频实时弹幕
-    async def fetch_video_danmaku(self, cid: str):
+    async def fetch_video_danmaku(self, cid: str, session: Optional[CrawlSession] = None):
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"https://comment.bilibili.com/{cid}.xml"
             # 发送请求，获取请求响应结果
@@ -299,12 +373,11 @@ class BilibiliWebCrawler:
         return response.text
 
     # 获取指定直播间信息
-    async def fetch_live_room_detail(self, room_id: str) -> dict:
+    async def fetch_live_room_detail(self, room_id: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.LIVEROOM_DETAIL}?room_id={room_id}"
             # 发送请求，获取请求响应结果
@@ -312,12 +385,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取指定直播间视频流
-    async def fetch_live_videos(self, room_id: str) -> dict:
+    async def fetch_live_videos(self, room_id: str, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.LIVE_VIDEOS}?cid={room_id}&quality=4"
             # 发送请求，获取请求响应结果
@@ -325,12 +397,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取指定分区正在直播的主播
-    async def fetch_live_streamers(self, area_id: str, pn: int):
+    async def fetch_live_streamers(self, area_id: str, pn: int, session: Optional[CrawlSession] = None):
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.LIVE_STREAMER}?platform=web&parent_area_id={area_id}&page={pn}"
             # 发送请求，获取请求响应结果
@@ -376,12 +447,11 @@ class BilibiliWebCrawler:
         return aid
 
     # 通过bv号获得视频分p信息
-    async def fetch_video_parts(self, bv_id: str) -> str:
+    async def fetch_video_parts(self, bv_id: str, session: Optional[CrawlSession] = None) -> str:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = f"{BilibiliAPIEndpoints.VIDEO_PARTS}?bvid={bv_id}"
             # 发送请求，获取请求响应结果
@@ -389,12 +459,11 @@ class BilibiliWebCrawler:
         return response
 
     # 获取所有直播分区列表
-    async def fetch_all_live_areas(self) -> dict:
+    async def fetch_all_live_areas(self, session: Optional[CrawlSession] = None) -> dict:
         # 获取请求头信息
-        kwargs = await self.get_bilibili_headers()
-        # 创建基础爬虫对象
-        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-        async with base_crawler as crawler:
+        kwargs = await self.get_bilibili_headers(session)
+        # 从客户端池借用长连接爬虫对象
+        async with self._pooled_crawler(kwargs) as crawler:
             # 创建请求endpoint
             endpoint = BilibiliAPIEndpoints.LIVE_AREAS
             # 发送请求，获取请求响应结果
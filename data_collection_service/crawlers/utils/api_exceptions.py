@@ -67,4 +67,17 @@ class APIRetryExhaustedError(APIError):
     """当API请求重试次数用尽时抛出"""
 
     def display_error(self):
-        return f"API Retry Exhausted Error: {self.args[0]}."
\ No newline at end of file
+        return f"API Retry Exhausted Error: {self.args[0]}."
+
+class APIRiskControlError(APIError):
+    """当目标平台触发风控 (如 HTTP 412、B站 code -352/-412) 时抛出"""
+
+    def display_error(self):
+        return f"API Risk Control Error: {self.args[0]}."
+
+
+class APICircuitOpenError(APIError):
+    """当 (接口族, 身份) 的熔断器处于打开状态、请求被快速失败时抛出"""
+
+    def display_error(self):
+        return f"API Circuit Open Error: {self.args[0]}."
@@ -0,0 +1,173 @@
+import os
+import copy
+import time
+import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Optional, AsyncIterator
+
+from data_collection_service.crawlers.base_crawler import BaseCrawler
+from data_collection_service.crawlers.utils.logger import logger
+
+# HTTP/2 依赖 h2 包，未安装时自动退回 HTTP/1.1 Keep-Alive
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class _PooledCrawler:
+    """池内条目：长连接爬虫客户端 + 使用状态"""
+    __slots__ = ("crawler", "in_use", "last_used")
+
+    def __init__(self, crawler: BaseCrawler):
+        self.crawler = crawler
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class CrawlerClientPool:
+    """
+    进程级爬虫 HTTP 客户端池
+    职责:
+    1. 按 (代理, 身份标识 browser_id, 请求头) 复用长连接的 BaseCrawler，避免每次接口调用都重新做 TCP/TLS 握手；
+       请求头参与池 key，池内客户端的请求头创建后不再修改，并发借用者之间不会互相覆盖 Cookie
+    2. 限流器 / 熔断器 / 风控上报等调用方设置只绑定在每次借用的浅拷贝上 (共享底层连接)，不写回池内客户端
+    3. 客户端数达到 CRAWLER_CLIENT_MAX 且全部在用时，新 key 的借用等待空闲客户端被淘汰，
+       超过 CRAWLER_CLIENT_ACQUIRE_TIMEOUT 仍无空位则抛出异常，池大小不会越过上限
+    4. 后台定时回收空闲超时的客户端，防止失效 Cookie 对应的连接常驻内存
+    5. 生命周期挂载到 main.py 的 lifespan，停机时统一关闭所有连接
+    """
+
+    def __init__(self):
+        self.idle_ttl = float(os.getenv("CRAWLER_CLIENT_IDLE_TTL", 300))
+        self.sweep_interval = float(os.getenv("CRAWLER_CLIENT_SWEEP_INTERVAL", 60))
+        self.max_clients = int(os.getenv("CRAWLER_CLIENT_MAX", 64))
+        self.max_connections = int(os.getenv("CRAWLER_CLIENT_MAX_CONNECTIONS", 20))
+        self.keepalive_expiry = float(os.getenv("CRAWLER_CLIENT_KEEPALIVE", 30))
+        self.acquire_timeout = float(os.getenv("CRAWLER_CLIENT_ACQUIRE_TIMEOUT", 30))
+        self.http2 = _HTTP2_AVAILABLE and os.getenv("CRAWLER_HTTP2", "True").lower() in ("true", "1", "t")
+
+        self._clients: dict[tuple, _PooledCrawler] = {}
+        self._lock = asyncio.Lock()
+        # 有客户端归还为空闲时通知等待空位的借用者 (与 _lock 共用同一把锁)
+        self._released = asyncio.Condition(self._lock)
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _make_key(proxies: Optional[dict], identity: Optional[str], headers: Optional[dict]) -> tuple:
+        proxy_key = tuple(sorted((k, str(v)) for k, v in (proxies or {}).items()))
+        # HTTP 头名大小写不敏感，统一小写后排序，保证同一组请求头得到同一个 key
+        header_key = tuple(sorted((k.lower(), str(v)) for k, v in (headers or {}).items()))
+        return proxy_key, identity or "local_config", header_key
+
+    async def start(self):
+        """启动空闲连接回收协程"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+            logger.info(f"🔌 [ClientPool] 爬虫客户端池已启动 (HTTP/2: {self.http2}, 空闲回收: {self.idle_ttl}s)")
+
+    async def close(self):
+        """停止回收协程并关闭所有长连接"""
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+        async with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+        for entry in entries:
+            await entry.crawler.close()
+        logger.info(f"🛑 [ClientPool] 已关闭 {len(entries)} 个爬虫长连接客户端")
+
+    @asynccontextmanager
+    async def acquire(self, proxies: Optional[dict], headers: dict, identity: Optional[str] = None,
+                      rate_limiter=None, platform: str = "default", circuit_breaker=None,
+                      risk_reporter=None) -> AsyncIterator[BaseCrawler]:
+        """
+        借用一个长连接爬虫客户端，退出上下文后自动归还 (不关闭连接)
+        返回的是池内客户端的浅拷贝：与其他借用者共享 httpx 连接池，限流/熔断等设置只作用于本次借用
+        :param proxies: 代理配置
+        :param headers: 请求头 (参与池 key；同一身份的 Cookie 刷新后会借到新的客户端，旧客户端由空闲回收关闭)
+        :param identity: 身份标识，通常为 browser_id
+        :param rate_limiter: 共享限流器，客户端每次发请求前按 (platform, 接口族, identity) 获取令牌
+        :param platform: 平台名称，用于限流 key
+        :param circuit_breaker: 熔断器注册表，按 (platform, 接口族, identity) 熔断
+        :param risk_reporter: 命中风控时的身份上报回调
+        """
+        key = self._make_key(proxies, identity, headers)
+        async with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                await self._reserve_slot_locked()
+                entry = _PooledCrawler(BaseCrawler(
+                    proxies=proxies,
+                    crawler_headers=headers,
+                    max_connections=self.max_connections,
+                    http2=self.http2,
+                    keepalive_expiry=self.keepalive_expiry,
+                    rate_limit_identity=identity or "local_config",
+                ))
+                self._clients[key] = entry
+            entry.in_use += 1
+
+        borrowed = copy.copy(entry.crawler)
+        borrowed.rate_limiter = rate_limiter
+        borrowed.rate_limit_platform = platform
+        borrowed.circuit_breaker = circuit_breaker
+        borrowed.risk_reporter = risk_reporter
+        try:
+            yield borrowed
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            if entry.in_use == 0:
+                async with self._lock:
+                    self._released.notify_all()
+
+    async def _reserve_slot_locked(self):
+        """
+        为新客户端腾出位置 (调用方需持有锁)：未满直接返回；已满时淘汰最久未使用的空闲客户端，
+        全部在用则等待有客户端归还，超时抛出 RuntimeError
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while len(self._clients) >= self.max_clients and not await self._evict_lru_locked():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"[ClientPool] 爬虫客户端池已满 ({self.max_clients} 个均在使用中)，等待 {self.acquire_timeout}s 仍无空位")
+            try:
+                await asyncio.wait_for(self._released.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _evict_lru_locked(self) -> bool:
+        """淘汰最久未使用的空闲客户端 (调用方需持有锁)，没有空闲客户端时返回 False"""
+        idle = [(k, e) for k, e in self._clients.items() if e.in_use == 0]
+        if not idle:
+            return False
+        key, entry = min(idle, key=lambda item: item[1].last_used)
+        del self._clients[key]
+        await entry.crawler.close()
+        return True
+
+    async def _sweep_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.sweep_interval)
+                await self.evict_idle()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ [ClientPool] 空闲连接回收异常: {e}")
+
+    async def evict_idle(self) -> int:
+        """回收超过 idle_ttl 未被使用的客户端，返回回收数量"""
+        now = time.monotonic()
+        async with self._lock:
+            expired = [k for k, e in self._clients.items() if e.in_use == 0 and now - e.last_used > self.idle_ttl]
+            entries = [self._clients.pop(k) for k in expired]
+        for entry in entries:
+            await entry.crawler.close()
+        if entries:
+            logger.info(f"♻️ [ClientPool] 回收 {len(entries)} 个空闲爬虫客户端，当前池大小: {len(self._clients)}")
+        return len(entries)
+
+
+# 导出单例，交由 main.py 管理其生命周期
+crawler_client_pool = CrawlerClientPool()
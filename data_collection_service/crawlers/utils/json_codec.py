@@ -0,0 +1,59 @@
+import json
+from typing import Any, Optional, Union
+
+# orjson 为可选依赖：安装后自动启用 (解析/序列化快数倍)，未安装时退回标准库 json
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于部署环境
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，调用方统一捕获这一个异常即可
+JSONDecodeError = json.JSONDecodeError
+
+_decoder = json.JSONDecoder()
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """反序列化 JSON (str 或 UTF-8 bytes)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """序列化为 UTF-8 字节流 (不转义中文)，用于 Kafka 消息体等二进制通道"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson 不支持的类型 (如 int 超过 64 位) 交给标准库兜底
+            pass
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def dumps(obj: Any) -> str:
+    """序列化为字符串 (不转义中文)"""
+    if orjson is not None:
+        return dumps_bytes(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def extract_json_object(text: str, max_attempts: int = 3) -> Optional[Any]:
+    """
+    从混杂文本 (如 JSONP、HTML 包裹) 中提取第一个完整的 JSON 对象
+    从 '{' 处用 raw_decode 单次线性扫描，失败时只向后尝试 max_attempts 个起点，
+    替代贪婪正则 r"\\{.*\\}" 在大响应体上的回溯开销
+    :return: 解析出的对象，找不到时返回 None
+    """
+    start = text.find('{')
+    attempts = 0
+    while start != -1 and attempts < max_attempts:
+        try:
+            obj, _ = _decoder.raw_decode(text, start)
+            return obj
+        except json.JSONDecodeError:
+            attempts += 1
+            start = text.find('{', start + 1)
+    return None
@@ -0,0 +1,67 @@
+import time
+import asyncio
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    异步令牌桶
+    以 rate 个/秒 的速度补充令牌，最多积攒 capacity 个 (允许的突发量)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """获取令牌，不足时挂起等待 (持锁等待保证先到先得)"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class LocalRateLimiter:
+    """
+    进程内限流器：按 key (如 平台:browser_id) 维护独立的令牌桶
+    用于替代散落在业务代码中的固定 asyncio.sleep 防封延时
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: dict[str, TokenBucket] = {}
+
+    async def acquire(self, key: str, tokens: float = 1.0, rate: Optional[float] = None, capacity: Optional[float] = None):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets.setdefault(key, TokenBucket(rate or self.rate, capacity or self.capacity))
+        await bucket.acquire(tokens)
+
+
+def endpoint_family(url: str) -> str:
+    """
+    提取接口族，用作限流/熔断的粒度
+    例: /x/v2/reply/reply -> reply, /x/space/wbi/acc/info -> space, /room/v1/Room/get_info -> room
+    """
+    for segment in urlparse(url).path.split("/"):
+        if not segment or segment in ("x", "wbi"):
+            continue
+        # 跳过 v1/v2/v3 之类的版本号
+        if segment[0] == "v" and segment[1:].isdigit():
+            continue
+        return segment
+    return "default"
+
@@ -0,0 +1,149 @@
+import os
+import time
+import random
+from typing import Awaitable, Callable, Optional
+
+from data_collection_service.crawlers.utils.logger import logger
+from data_collection_service.crawlers.utils.api_exceptions import APICircuitOpenError
+
+# 风控信号：HTTP 412 (请求被拦截)；B站业务码 -352 (风控校验失败) / -412 (请求被拦截)
+RISK_CONTROL_HTTP_STATUS = frozenset({412})
+RISK_CONTROL_API_CODES = frozenset({-352, -412})
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """
+    指数退避 + 全抖动 (Full Jitter)：在 [0, min(cap, base * 2^attempt)] 内均匀取值
+    多个 worker 同时失败时重试时间被打散，不会齐步冲击上游
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    单个 (平台, 接口族, 身份) 的熔断器
+    closed: 正常放行；open: 快速失败直到冷却结束；half-open: 冷却结束后放行一个探测请求，
+    探测成功则关闭，再次触发风控则以翻倍的冷却时间重新打开
+    """
+
+    def __init__(self, open_seconds: float, max_open_seconds: float):
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.open_seconds = open_seconds
+        self.opened_until = 0.0
+        self.trips = 0
+        # half-open 探测请求的发出时间 (0 表示没有在途探测)
+        self.probe_started = 0.0
+        # 最近一次被检查或记录结果的时间，注册表据此回收长期不用的熔断器
+        self.last_used = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_until > time.monotonic()
+
+    def allow(self) -> bool:
+        self.last_used = time.monotonic()
+        if self.trips == 0:
+            return True
+        if self.is_open:
+            return False
+        # 冷却结束进入 half-open：同一时刻只放行一个探测请求 (探测无结论超过一个冷却周期则允许重新探测)
+        now = time.monotonic()
+        if self.probe_started and now - self.probe_started < self.open_seconds:
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        self.last_used = time.monotonic()
+        if self.trips:
+            self.trips = 0
+            self.open_seconds = self.base_open_seconds
+        self.probe_started = 0.0
+
+    def record_risk_control(self):
+        self.last_used = time.monotonic()
+        if self.trips:
+            self.open_seconds = min(self.max_open_seconds, self.open_seconds * 2)
+        self.trips += 1
+        self.probe_started = 0.0
+        self.opened_until = time.monotonic() + self.open_seconds
+
+
+class CircuitBreakerRegistry:
+    """
+    进程级熔断器注册表：按 (平台, 接口族, 身份) 维护熔断器
+    风控触发时打开熔断并回调上报 (如 cookie_scheduler_mgr.report_failure)，
+    打开期间该身份在该接口族上的请求直接快速失败，不再消耗等待时间与请求配额
+    身份 (browser_id) 会轮换，未处于熔断打开状态且超过 CIRCUIT_IDLE_TTL 秒未使用的熔断器会被定期回收，
+    注册表大小不随历史身份数增长
+    """
+
+    def __init__(self):
+        self.open_seconds = float(os.getenv("CIRCUIT_OPEN_SECONDS", 60))
+        self.max_open_seconds = float(os.getenv("CIRCUIT_MAX_OPEN_SECONDS", 900))
+        self.idle_ttl = float(os.getenv("CIRCUIT_IDLE_TTL", 3600))
+        self._breakers: dict[tuple, CircuitBreaker] = {}
+        # (平台, 身份) -> 该身份最近一次熔断的结束时间 (任一接口族)，供采集会话判断是否需要换租身份
+        self._identity_open_until: dict[tuple, float] = {}
+        self._last_sweep = time.monotonic()
+
+    def _get(self, key: tuple) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            self._maybe_sweep()
+            breaker = self._breakers[key] = CircuitBreaker(self.open_seconds, self.max_open_seconds)
+        return breaker
+
+    def _maybe_sweep(self):
+        """新建熔断器时顺带回收：每 idle_ttl / 2 秒最多扫描一次"""
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_ttl / 2:
+            return
+        self._last_sweep = now
+        self.evict_idle(now)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """回收未处于熔断打开状态、且超过 idle_ttl 未使用的熔断器，以及已结束的身份熔断记录，返回回收数量"""
+        now = time.monotonic() if now is None else now
+        expired = [key for key, breaker in self._breakers.items()
+                   if breaker.opened_until <= now and now - breaker.last_used > self.idle_ttl]
+        for key in expired:
+            del self._breakers[key]
+        for key in [key for key, until in self._identity_open_until.items() if until <= now]:
+            del self._identity_open_until[key]
+        return len(expired)
+
+    def check(self, platform: str, family: str, identity: Optional[str]):
+        """请求前检查，熔断打开时抛出 APICircuitOpenError"""
+        if not self._get((platform, family, identity)).allow():
+            raise APICircuitOpenError(f"{platform}:{family}:{identity} 熔断中，请求被快速失败")
+
+    def is_identity_open(self, platform: str, identity: Optional[str]) -> bool:
+        """该身份在任一接口族上是否处于熔断中"""
+        return self._identity_open_until.get((platform, identity), 0.0) > time.monotonic()
+
+    def record_success(self, platform: str, family: str, identity: Optional[str]):
+        breaker = self._breakers.get((platform, family, identity))
+        if breaker is not None:
+            breaker.record_success()
+
+    async def record_risk_control(self, platform: str, family: str, identity: Optional[str],
+                                  reporter: Optional[Callable[[str], Awaitable[None]]] = None):
+        """记录风控命中：打开熔断，并通过 reporter 上报该身份"""
+        breaker = self._get((platform, family, identity))
+        if breaker.is_open:
+            # 同一身份的并发在途请求先后命中风控，只计一次，避免冷却时间被连续翻倍、重复上报
+            return
+        breaker.record_risk_control()
+        self._identity_open_until[(platform, identity)] = breaker.opened_until
+        logger.warning(f"🚨 [CircuitBreaker] {platform}:{family}:{identity} 触发风控，熔断 {breaker.open_seconds:.0f}s")
+        if reporter is not None:
+            try:
+                await reporter(identity)
+            except Exception as e:
+                logger.error(f"❌ [CircuitBreaker] 风控上报失败: {e}")
+
+
+# 导出单例，与令牌桶一样由爬虫客户端池注入到 BaseCrawler
+circuit_breakers = CircuitBreakerRegistry()
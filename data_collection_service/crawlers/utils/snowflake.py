@@ -47,6 +47,14 @@ class SnowflakeGenerator:
         # 位运算拼接出 64 位整型纯数字 ID
         return ((timestamp - self.TWepoch) << self.timestamp_left_shift) | (self.datacenter_id << self.datacenter_id_shift) | (self.worker_id << self.worker_id_shift) | self.sequence
 
+    def timestamp_ms_of(self, snowflake_id: int) -> int:
+        """反解雪花 ID 的生成时间 (毫秒时间戳)，可用于把 batch_id 还原为快照时间"""
+        return (int(snowflake_id) >> self.timestamp_left_shift) + self.TWepoch
+
+    def min_id_at(self, timestamp_ms: int) -> int:
+        """指定毫秒时间戳对应的最小雪花 ID，可用于按 batch_id 做时间范围过滤"""
+        return max(0, int(timestamp_ms) - self.TWepoch) << self.timestamp_left_shift
+
 
 # 单例实例化，假设机器号都为1 (生产环境中通过环境变量注入 Pod IP 计算)
 snowflake_gen = SnowflakeGenerator(datacenter_id=1, worker_id=1)
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 与 Dockerfile 的 PYTHONPATH=/app 一致：把仓库根目录加入导入路径，保证能以 data_collection_service.* 导入
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
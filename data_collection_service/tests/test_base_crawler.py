@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+import pytest
+
+from data_collection_service.crawlers.base_crawler import BaseCrawler
+
+
+def _crawler(max_retries: int, handler) -> BaseCrawler:
+    crawler = BaseCrawler(max_retries=max_retries, backoff_base=0)
+    crawler.aclient = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return crawler
+
+
+def test_max_retries_below_one_is_rejected():
+    with pytest.raises(ValueError):
+        BaseCrawler(max_retries=0)
+
+
+@pytest.mark.parametrize("max_retries", [1, 3])
+def test_every_attempt_budget_sends_requests(max_retries):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        # 最后一次之前都返回 5xx，验证重试次数恰好为 max_retries
+        status = 200 if len(calls) == max_retries else 503
+        return httpx.Response(status, json={"code": 0, "data": {}})
+
+    async def run():
+        crawler = _crawler(max_retries, handler)
+        try:
+            return await crawler.get_fetch_data("https://api.bilibili.com/x/web-interface/nav")
+        finally:
+            await crawler.close()
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == max_retries
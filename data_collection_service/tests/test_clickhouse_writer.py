@@ -0,0 +1,83 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from asynch.errors import NetworkError, TypeMismatchError
+
+from data_collection_service.app.db.clickhouse import ClickHouseManager
+from data_collection_service.app.db.clickhouse_writer import ClickHouseBatchWriter
+
+
+class _FakePool:
+    """模拟 ClickHouse：含 bad 字段的行触发类型错误，前 network_failures 次写入触发网络错误"""
+
+    def __init__(self, network_failures: int = 0):
+        self.network_failures = network_failures
+        self.inserts: list[list] = []
+        self.attempts = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        yield self
+
+    @asynccontextmanager
+    async def cursor(self):
+        yield self
+
+    async def execute(self, query: str, rows: list):
+        self.attempts += 1
+        if self.network_failures:
+            self.network_failures -= 1
+            raise NetworkError("Connection reset by peer")
+        if any(row.get("bad") for row in rows):
+            raise TypeMismatchError("Type mismatch in VALUES section")
+        self.inserts.append(list(rows))
+
+
+@pytest.fixture
+def writer():
+    writer = ClickHouseBatchWriter()
+    writer.max_rows = 10 ** 6
+    writer.retry_backoff = 0.001
+    return writer
+
+
+async def _write_together(writer: ClickHouseBatchWriter, batches: list[list[dict]]) -> list[bool]:
+    # 各调用方先把行放进同一个缓冲区，再统一刷出
+    calls = [asyncio.create_task(writer.write("ods.t", rows)) for rows in batches]
+    await asyncio.sleep(0)
+    await writer.close()
+    return await asyncio.gather(*calls)
+
+
+def test_bad_rows_only_fail_their_own_caller(writer, monkeypatch):
+    pool = _FakePool()
+    monkeypatch.setattr(ClickHouseManager, "pool", pool)
+    batches = [[{"id": 1, "bad": 0}], [{"id": 2, "bad": 1}], [{"id": 3, "bad": 0}, {"id": 4, "bad": 0}]]
+
+    results = asyncio.run(_write_together(writer, batches))
+
+    assert results == [True, False, True]
+    assert sorted(row["id"] for rows in pool.inserts for row in rows) == [1, 3, 4]
+    # 合批一次 + 拆开后每个调用方一次，确定性错误不做退避重试
+    assert pool.attempts == 1 + len(batches)
+
+
+def test_network_errors_are_retried_for_the_whole_batch(writer, monkeypatch):
+    pool = _FakePool(network_failures=writer.max_retries - 1)
+    monkeypatch.setattr(ClickHouseManager, "pool", pool)
+
+    results = asyncio.run(_write_together(writer, [[{"id": 1, "bad": 0}], [{"id": 2, "bad": 0}]]))
+
+    assert results == [True, True]
+    assert pool.inserts == [[{"id": 1, "bad": 0}, {"id": 2, "bad": 0}]]
+
+
+def test_exhausted_network_retries_fail_every_caller(writer, monkeypatch):
+    pool = _FakePool(network_failures=writer.max_retries)
+    monkeypatch.setattr(ClickHouseManager, "pool", pool)
+
+    results = asyncio.run(_write_together(writer, [[{"id": 1, "bad": 0}], [{"id": 2, "bad": 0}]]))
+
+    assert results == [False, False]
+    assert pool.attempts == writer.max_retries
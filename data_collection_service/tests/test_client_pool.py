@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from data_collection_service.crawlers.utils.client_pool import CrawlerClientPool
+
+HEADERS = {"user-agent": "test"}
+
+
+@pytest.fixture
+def pool():
+    pool = CrawlerClientPool()
+    pool.max_clients = 1
+    pool.acquire_timeout = 0.2
+    return pool
+
+
+def test_borrowers_keep_their_own_settings(pool):
+    breaker_a, breaker_b = object(), object()
+
+    async def run():
+        async with pool.acquire(None, HEADERS, "b1", platform="bilibili", circuit_breaker=breaker_a) as a:
+            async with pool.acquire(None, HEADERS, "b1", platform="douyin", circuit_breaker=breaker_b) as b:
+                # 共享同一个长连接客户端，但设置互不覆盖
+                assert a.aclient is b.aclient
+                assert (a.circuit_breaker, a.rate_limit_platform) == (breaker_a, "bilibili")
+                assert (b.circuit_breaker, b.rate_limit_platform) == (breaker_b, "douyin")
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_full_pool_waits_for_an_idle_client(pool):
+    async def run():
+        order = []
+
+        async def holder(release: asyncio.Event):
+            async with pool.acquire(None, HEADERS, "b1"):
+                order.append("b1")
+                await release.wait()
+
+        release = asyncio.Event()
+        held = asyncio.create_task(holder(release))
+        await asyncio.sleep(0)
+
+        async def second():
+            async with pool.acquire(None, HEADERS, "b2"):
+                order.append("b2")
+                assert len(pool._clients) == 1
+
+        waiting = asyncio.create_task(second())
+        await asyncio.sleep(0.05)
+        # 池已满且唯一的客户端在用：新 key 只能等待，不能越过上限
+        assert order == ["b1"] and len(pool._clients) == 1
+        release.set()
+        await asyncio.gather(held, waiting)
+        assert order == ["b1", "b2"]
+        await pool.close()
+
+    asyncio.run(run())
+
+
+def test_full_pool_raises_after_acquire_timeout(pool):
+    async def run():
+        async with pool.acquire(None, HEADERS, "b1"):
+            with pytest.raises(RuntimeError, match="客户端池已满"):
+                async with pool.acquire(None, HEADERS, "b2"):
+                    pass
+            assert len(pool._clients) == 1
+        await pool.close()
+
+    asyncio.run(run())
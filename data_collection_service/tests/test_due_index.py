@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from data_collection_service.app.db.due_index import TargetDueIndex
+from data_collection_service.app.db.redis_client import redis_client_mgr
+
+
+@pytest.fixture
+def redis_pool(monkeypatch):
+    pool = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client_mgr, "pool", pool)
+    return pool
+
+
+async def _claimer(index: TargetDueIndex, now_ts: float, limit: int, claimed: list):
+    while True:
+        ids = await index.pop_due(now_ts, limit)
+        if not ids:
+            return
+        claimed.extend(ids)
+        # 让出事件循环，使各认领者的弹出交错执行
+        await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize("claimers, limit", [(2, 50), (16, 7), (32, 1)])
+def test_concurrent_claimers_never_pop_the_same_member(redis_pool, claimers, limit):
+    async def run():
+        now_ts = time.time()
+        # 每个副本各自持有一个索引实例 (各自注册脚本)，共用同一个 ZSET
+        replicas = [TargetDueIndex() for _ in range(claimers)]
+        due = {str(pk): now_ts - pk for pk in range(1, 1001)}
+        not_due = {str(pk): now_ts + 3600 for pk in range(1001, 1101)}
+        await redis_pool.zadd(replicas[0].key, {**due, **not_due})
+
+        results = [[] for _ in replicas]
+        await asyncio.gather(*(
+            _claimer(index, now_ts, limit, claimed) for index, claimed in zip(replicas, results)
+        ))
+
+        popped = [pk for claimed in results for pk in claimed]
+        assert len(popped) == len(set(popped)), "同一成员被多个认领者弹出"
+        assert set(popped) == {int(pk) for pk in due}
+        assert await redis_pool.zcard(replicas[0].key) == len(not_due)
+        # 多个认领者都分到了目标，确实发生了并发弹出
+        assert sum(1 for claimed in results if claimed) > 1
+
+    asyncio.run(run())
+
+
+def test_pop_due_returns_earliest_first(redis_pool):
+    async def run():
+        index = TargetDueIndex()
+        now_ts = time.time()
+        await redis_pool.zadd(index.key, {"3": now_ts - 1, "1": now_ts - 30, "2": now_ts - 10})
+        assert await index.pop_due(now_ts, 2) == [1, 2]
+        assert await index.pop_due(now_ts, 2) == [3]
+        assert await index.pop_due(now_ts, 2) == []
+
+    asyncio.run(run())
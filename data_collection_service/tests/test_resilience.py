@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from data_collection_service.crawlers.utils import resilience
+from data_collection_service.crawlers.utils.resilience import CircuitBreakerRegistry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_idle_breakers_of_rotated_identities_are_evicted(clock):
+    registry = CircuitBreakerRegistry()
+    registry.idle_ttl = 60
+    registry.open_seconds = registry.max_open_seconds = 600
+
+    for i in range(100):
+        registry.check("bilibili", "reply", f"browser-{i}")
+    asyncio.run(registry.record_risk_control("bilibili", "reply", "browser-0"))
+    assert len(registry._breakers) == 100
+
+    # 身份轮换：旧身份不再被使用，新身份的第一次检查顺带触发回收
+    clock.now += 120
+    registry.check("bilibili", "reply", "browser-new")
+
+    # 仍处于熔断打开状态的身份保留 (冷却与翻倍状态不丢失)，其余空闲熔断器被回收
+    assert set(registry._breakers) == {("bilibili", "reply", "browser-0"), ("bilibili", "reply", "browser-new")}
+    assert registry.is_identity_open("bilibili", "browser-0")
+
+    clock.now += 1200
+    assert registry.evict_idle() == 2
+    assert not registry._breakers and not registry._identity_open_until
@@ -0,0 +1,67 @@
+import pytest
+
+from data_collection_service.crawlers.bilibili import wrid
+from data_collection_service.crawlers.bilibili.wbi_signer import DEFAULT_MIXIN_KEY, WbiSigner, get_mixin_key, _md5_hex
+
+# 固定的 nav 接口 img_key / sub_key (重排后即为当前使用的 DEFAULT_MIXIN_KEY)
+IMG_KEY = "7cd084941338484aae1ad9425b84077c"
+SUB_KEY = "4932caff0ff746eab6f01bf08b70ac45"
+
+# 黄金向量：(参数, 待签名串, w_rid, 签名后的查询串)，由旧实现 (WridManager + wrid.get_wrid) 生成
+GOLDEN_VECTORS = [
+    (
+        {"mid": "946974", "ps": 30, "pn": 1, "order": "pubdate", "wts": "1702204169"},
+        "mid=946974&order=pubdate&pn=1&ps=30&wts=1702204169ea1db124af3c7062474693fa704f4ff8",
+        "7031da523fbf36234ce7079f069ed937",
+        "mid=946974&ps=30&pn=1&order=pubdate&wts=1702204169&w_rid=7031da523fbf36234ce7079f069ed937",
+    ),
+    (
+        {"foo": "114", "bar": "514", "zab": "1919810", "wts": "1702204169"},
+        "bar=514&foo=114&wts=1702204169ea1db124af3c7062474693fa704f4ff8&zab=1919810",
+        "c4f1925e234a744ae835992215766fa8",
+        "foo=114&bar=514&zab=1919810&wts=1702204169&w_rid=c4f1925e234a744ae835992215766fa8",
+    ),
+    (
+        {"keyword": "原神 (测试)!*", "mid": 2, "wts": "1700000000"},
+        "keyword=%E5%8E%9F%E7%A5%9E+%E6%B5%8B%E8%AF%95&mid=2&wts=1700000000ea1db124af3c7062474693fa704f4ff8",
+        "0d230ee6450d2626595e46f0e566e470",
+        "keyword=原神 (测试)!*&mid=2&wts=1700000000&w_rid=0d230ee6450d2626595e46f0e566e470",
+    ),
+]
+
+
+@pytest.fixture
+def signer() -> WbiSigner:
+    return WbiSigner.from_keys(IMG_KEY, SUB_KEY)
+
+
+def test_mixin_key_from_nav_keys():
+    assert get_mixin_key(IMG_KEY, SUB_KEY) == DEFAULT_MIXIN_KEY
+
+
+@pytest.mark.parametrize("params, query, w_rid, signed", GOLDEN_VECTORS)
+def test_golden_vectors(signer, params, query, w_rid, signed):
+    assert signer.encode_query(params) == query
+    assert signer.get_wrid(params) == w_rid
+    assert signer.sign(params) == signed
+
+
+@pytest.mark.parametrize("params, query, w_rid, signed", GOLDEN_VECTORS)
+def test_matches_legacy_wrid(signer, params, query, w_rid, signed):
+    assert wrid.get_wrid(e=signer.encode_query(params)) == signer.get_wrid(params)
+
+
+def test_sign_does_not_mutate_params(signer):
+    params = dict(GOLDEN_VECTORS[0][0])
+    signer.sign(params)
+    assert params == GOLDEN_VECTORS[0][0]
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "a",
+    "wts=1702204169" * 10,  # 跨多个 64 字节分组
+    "原神",                 # 非 ASCII：按 ord(c) & 255 截断参与摘要
+])
+def test_md5_matches_legacy(text):
+    assert _md5_hex(text) == wrid.get_wrid(e=text)
@@ -0,0 +1,68 @@
+-- 数据采集服务 MySQL 表结构 (与 data_collection_service/app/db/models.py 保持一致)
+
+-- 1. 采集任务总表
+CREATE TABLE IF NOT EXISTS crawler_target (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    platform_type SMALLINT NOT NULL DEFAULT 3,
+    uid VARCHAR(50) NOT NULL COMMENT '归属大V的UID',
+    resource_type VARCHAR(200) NOT NULL COMMENT '资源维度:  scrape_and_store_video_comments, scrape_and_store_user_info...',
+    target_id VARCHAR(50) NOT NULL COMMENT '具体的BV号、动态ID或UID等实体目标资源唯一ID',
+    cron_interval_minutes INT DEFAULT 720,
+    is_active TINYINT(1) DEFAULT 1,
+    last_run_time DATETIME NULL,
+    next_run_time DATETIME NULL,
+    create_time DATETIME NULL,
+    update_time DATETIME NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_target (platform_type, uid, resource_type, target_id),
+    KEY ix_crawler_target_uid (uid),
+    -- 调度器按 is_active + next_run_time 取到期目标 / 重建 Redis 到期索引
+    KEY idx_active_next_run (is_active, next_run_time)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
+
+-- 已有库升级：
+-- ALTER TABLE crawler_target ADD INDEX idx_active_next_run (is_active, next_run_time);
+
+-- 2. 采集任务快照表
+CREATE TABLE IF NOT EXISTS crawler_task (
+    id BIGINT NOT NULL AUTO_INCREMENT COMMENT '物理主键',
+    task_id VARCHAR(50) NOT NULL COMMENT '全局唯一批次/任务号',
+    task_name VARCHAR(100) NULL COMMENT '任务备注名',
+    platform_type SMALLINT DEFAULT 3 COMMENT '平台: 3=B站, 1=抖音, 2=Tiktok',
+    resource_type VARCHAR(200) NOT NULL COMMENT '资源维度:  scrape_and_store_video_comments, scrape_and_store_user_info...',
+    resource_payload JSON NOT NULL COMMENT '资源清单 (支持批量)',
+    task_status SMALLINT DEFAULT 0 COMMENT '状态: 0=待执行, 1=执行中, 2=成功, 3=失败',
+    params JSON NULL COMMENT '调度参数与限制',
+    error_msg TEXT NULL COMMENT '失败异常堆栈',
+    lease_owner VARCHAR(100) NULL COMMENT '当前执行者 (主机名:进程号)',
+    lease_expire_time DATETIME NULL COMMENT '执行租约到期时间',
+    create_time DATETIME NULL COMMENT '批次创建时间',
+    update_time DATETIME NULL COMMENT '状态更新时间',
+    PRIMARY KEY (id),
+    UNIQUE KEY ix_crawler_task_task_id (task_id),
+    KEY ix_crawler_task_task_status (task_status)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
+
+-- 已有库升级：
+-- ALTER TABLE crawler_task ADD COLUMN lease_owner VARCHAR(100) NULL COMMENT '当前执行者 (主机名:进程号)' AFTER error_msg,
+--     ADD COLUMN lease_expire_time DATETIME NULL COMMENT '执行租约到期时间' AFTER lease_owner;
+
+-- 3. 任务消息发件箱 (与 crawler_task 同事务写入，由 OutboxRelay 批量投递到 Kafka)
+CREATE TABLE IF NOT EXISTS task_outbox (
+    id BIGINT NOT NULL AUTO_INCREMENT COMMENT '物理主键 (同时决定投递顺序)',
+    topic VARCHAR(100) NOT NULL COMMENT '目标 Topic',
+    message_key VARCHAR(100) NULL COMMENT '消息 Key (决定分区)',
+    payload JSON NOT NULL COMMENT '消息体',
+    status SMALLINT DEFAULT 0 COMMENT '状态: 0=待投递, 1=已投递, 2=投递中, 3=投递失败 (死信)',
+    attempts INT DEFAULT 0 COMMENT '投递失败次数',
+    lease_expire_time DATETIME NULL COMMENT '租约到期 / 下次重试时间',
+    last_error VARCHAR(500) NULL COMMENT '最近一次投递失败原因',
+    create_time DATETIME NULL COMMENT '写入时间',
+    sent_time DATETIME NULL COMMENT '投递成功时间',
+    PRIMARY KEY (id),
+    KEY idx_status_id (status, id)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
+
+-- 已有库升级：
+-- ALTER TABLE task_outbox ADD COLUMN lease_expire_time DATETIME NULL COMMENT '租约到期 / 下次重试时间' AFTER attempts,
+--     ADD COLUMN last_error VARCHAR(500) NULL COMMENT '最近一次投递失败原因' AFTER lease_expire_time;